@@ -3,11 +3,16 @@ AI Chat API Endpoints
 Routes for AI interactions, code explanations, hints, etc.
 """
 
-from fastapi import APIRouter, Depends
+import asyncio
+import json
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from app.core.database import get_db
 from app.services.ai_service import AIService
+from app.services.ai_cache import ai_cache, ai_single_flight
 from pydantic import BaseModel
+from typing import Optional
 from datetime import datetime
 
 # Create router
@@ -16,6 +21,61 @@ router = APIRouter(prefix="/ai", tags=["ai"])
 # Initialize AI service
 ai_service = AIService()
 
+# How often a pending AI call checks whether the client is still there
+DISCONNECT_POLL_SECONDS = 0.5
+
+class ClientDisconnected(Exception):
+    """The HTTP client went away before the AI call finished"""
+
+async def run_until_disconnect(http_request: Request, coro):
+    """Await an AI call, cancelling it if the HTTP client disconnects"""
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await http_request.is_disconnected():
+                task.cancel()
+                raise ClientDisconnected()
+    finally:
+        if not task.done():
+            task.cancel()
+
+def sse_event(data: dict, event: Optional[str] = None) -> str:
+    """Format one server-sent event"""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+def sse_response(chunks, on_complete=None) -> StreamingResponse:
+    """
+    Forward AI text chunks to the client as server-sent events
+    
+    Each chunk is sent as a ``data: {"delta": ...}`` event as soon as it
+    arrives, followed by a ``done`` (or ``error``) event. ``on_complete``
+    is awaited with the full text once the stream has finished. When the
+    client disconnects the generator is closed, which cancels the
+    upstream call.
+    """
+    async def events():
+        parts = []
+        try:
+            async for text in chunks:
+                parts.append(text)
+                yield sse_event({"delta": text})
+            if on_complete is not None:
+                await on_complete("".join(parts))
+            yield sse_event({"timestamp": datetime.utcnow().isoformat()}, event="done")
+        except Exception as e:
+            print(f"❌ Error streaming AI response: {str(e)}")
+            yield sse_event({"error": str(e)}, event="error")
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # ==================== PYDANTIC MODELS ====================
 
 class ChatRequest(BaseModel):
@@ -23,6 +83,7 @@ class ChatRequest(BaseModel):
     message: str
     context: str = ""
     user_id: str = "demo_user"
+    session_id: str = "default"
 
 class ExplainCodeRequest(BaseModel):
     """Request to explain code"""
@@ -49,7 +110,11 @@ class LearnRequest(BaseModel):
 # ==================== ENDPOINTS ====================
 
 @router.post("/chat")
-async def ai_chat(request: ChatRequest, db: AsyncIOMotorDatabase = Depends(get_db)):
+async def ai_chat(
+    request: ChatRequest,
+    http_request: Request,
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
 
     """
     Chat with AI assistant using Google Gemini
@@ -58,6 +123,7 @@ async def ai_chat(request: ChatRequest, db: AsyncIOMotorDatabase = Depends(get_d
     - message: Your question or message
     - context: Optional context about what you're working on
     - user_id: Your user ID (default: demo_user)
+    - session_id: Conversation to continue (default: default)
     
     Example:
     {
@@ -70,16 +136,19 @@ async def ai_chat(request: ChatRequest, db: AsyncIOMotorDatabase = Depends(get_d
         print(f"🤖 Processing chat request from {request.user_id}")
         
         # Get AI response
-        result = await ai_service.chat(
+        result = await run_until_disconnect(http_request, ai_service.chat(
             request.message,
             request.user_id,
-            request.context
-        )
+            request.context,
+            session_id=request.session_id,
+            db=db
+        ))
         
         # Save to database if successful
         if result["success"]:
             await db["ai_chats"].insert_one({
                 "user_id": request.user_id,
+                "session_id": request.session_id,
                 "message": request.message,
                 "response": result["response"],
                 "context": request.context,
@@ -101,7 +170,11 @@ async def ai_chat(request: ChatRequest, db: AsyncIOMotorDatabase = Depends(get_d
 
 
 @router.post("/explain-code")
-async def explain_code(request: ExplainCodeRequest):
+async def explain_code(
+    request: ExplainCodeRequest,
+    http_request: Request,
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
     """
     Get explanation for a code snippet
     
@@ -118,10 +191,11 @@ async def explain_code(request: ExplainCodeRequest):
     try:
         print(f"📝 Explaining {request.language} code")
         
-        explanation = await ai_service.get_code_explanation(
+        explanation = await run_until_disconnect(http_request, ai_service.get_code_explanation(
             request.code,
-            request.language
-        )
+            request.language,
+            db=db
+        ))
         
         return {
             "success": True,
@@ -139,7 +213,11 @@ async def explain_code(request: ExplainCodeRequest):
 
 
 @router.post("/get-hint")
-async def get_hint(request: HintRequest):
+async def get_hint(
+    request: HintRequest,
+    http_request: Request,
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
     """
     Get a helpful hint for a problem
     
@@ -160,11 +238,12 @@ async def get_hint(request: HintRequest):
     try:
         print(f"💡 Generating hint for: {request.problem_title}")
         
-        hint = await ai_service.generate_hint(
+        hint = await run_until_disconnect(http_request, ai_service.generate_hint(
             request.problem_title,
             request.problem_description,
-            request.difficulty
-        )
+            request.difficulty,
+            db=db
+        ))
         
         return {
             "success": True,
@@ -183,7 +262,7 @@ async def get_hint(request: HintRequest):
 
 
 @router.post("/debug-code")
-async def debug_code(request: DebugRequest):
+async def debug_code(request: DebugRequest, http_request: Request):
     """
     Get help debugging code
     
@@ -202,11 +281,11 @@ async def debug_code(request: DebugRequest):
     try:
         print(f"🐛 Debugging {request.language} code")
         
-        advice = await ai_service.debug_code(
+        advice = await run_until_disconnect(http_request, ai_service.debug_code(
             request.code,
             request.error,
             request.language
-        )
+        ))
         
         return {
             "success": True,
@@ -225,7 +304,11 @@ async def debug_code(request: DebugRequest):
 
 
 @router.post("/learn-concept")
-async def learn_concept(request: LearnRequest):
+async def learn_concept(
+    request: LearnRequest,
+    http_request: Request,
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
     """
     Learn a programming concept
     
@@ -242,10 +325,11 @@ async def learn_concept(request: LearnRequest):
     try:
         print(f"📚 Teaching {request.concept} at {request.level} level")
         
-        content = await ai_service.learn_concept(
+        content = await run_until_disconnect(http_request, ai_service.learn_concept(
             request.concept,
-            request.level
-        )
+            request.level,
+            db=db
+        ))
         
         return {
             "success": True,
@@ -263,11 +347,75 @@ async def learn_concept(request: LearnRequest):
         }
 
 
+# ==================== STREAMING ENDPOINTS ====================
+
+@router.post("/chat/stream")
+async def ai_chat_stream(
+    request: ChatRequest,
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """
+    Chat with the AI assistant, streaming the response as server-sent events
+    
+    Same body as /ai/chat. The chat is saved to the database once the
+    stream has completed.
+    """
+    print(f"🤖 Streaming chat response to {request.user_id}")
+    
+    async def save_chat(response: str):
+        await db["ai_chats"].insert_one({
+            "user_id": request.user_id,
+            "session_id": request.session_id,
+            "message": request.message,
+            "response": response,
+            "context": request.context,
+            "tokens_used": len(request.message.split()) + len(response.split()),
+            "model": ai_service.model_name,
+            "timestamp": datetime.utcnow()
+        })
+    
+    return sse_response(
+        ai_service.chat_stream(
+            request.message,
+            request.user_id,
+            request.context,
+            session_id=request.session_id,
+            db=db
+        ),
+        on_complete=save_chat
+    )
+
+
+@router.post("/debug-code/stream")
+async def debug_code_stream(request: DebugRequest):
+    """Get help debugging code, streamed as server-sent events"""
+    print(f"🐛 Streaming debug advice for {request.language} code")
+    return sse_response(ai_service.debug_code_stream(
+        request.code,
+        request.error,
+        request.language
+    ))
+
+
+@router.post("/learn-concept/stream")
+async def learn_concept_stream(
+    request: LearnRequest,
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Learn a programming concept, streamed as server-sent events"""
+    print(f"📚 Streaming {request.concept} at {request.level} level")
+    return sse_response(ai_service.learn_concept_stream(
+        request.concept,
+        request.level,
+        db=db
+    ))
+
+
 @router.post("/clear-history")
-async def clear_chat_history():
-    """Clear the AI conversation history"""
+async def clear_chat_history(user_id: str = "demo_user", session_id: Optional[str] = None):
+    """Clear a user's AI conversation history (one session, or all of them)"""
     try:
-        ai_service.clear_history()
+        ai_service.clear_history(user_id, session_id)
         return {
             "success": True,
             "message": "Chat history cleared successfully"
@@ -279,6 +427,16 @@ async def clear_chat_history():
         }
 
 
+@router.get("/cache/stats")
+async def ai_cache_stats():
+    """Hit/miss counters for the AI response cache and coalesced requests"""
+    return {
+        "success": True,
+        "cache": ai_cache.get_stats(),
+        "single_flight": ai_single_flight.get_stats()
+    }
+
+
 @router.get("/health")
 async def ai_health():
     """Check if AI service is healthy"""
@@ -2,6 +2,8 @@ from fastapi import APIRouter, Depends
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from app.core.database import get_db
 from app.utils.level_system import get_level_from_xp, get_xp_progress
+from app.services.user_stats import user_stats
+from app.services.xp_event_service import XpEventService
 from datetime import datetime, timedelta
 from bson import ObjectId
 
@@ -15,8 +17,8 @@ async def get_user_analytics(
 ):
     """Get user analytics dashboard data"""
     try:
-        # Get user from database
-        user = await db["users"].find_one({"username": user_id})
+        # Get the user's stats snapshot
+        user = await user_stats.get_by_username(db, user_id)
         
         if not user:
             # Return default if user not found
@@ -48,7 +50,7 @@ async def get_user_analytics(
             "level": current_level,
             "current_streak": user.get("current_streak", 0),
             "longest_streak": user.get("longest_streak", 0),
-            "badges_earned": len(user.get("badges", [])),
+            "badges_earned": len(user.get("badge_ids", [])),
             "member_since": user.get("created_at").isoformat() if user.get("created_at") else None,
             "progress": {
                 "current_level": progress["current_level"],
@@ -106,19 +108,7 @@ async def get_monthly_leaderboard(
 ):
     """Get leaderboard for this month"""
     try:
-        # Get all users
-        users = await db["users"].find().sort("total_xp", -1).limit(limit).to_list(limit)
-        
-        leaderboard = []
-        for idx, user in enumerate(users):
-            leaderboard.append({
-                "rank": idx + 1,
-                "username": user.get("username"),
-                "level": get_level_from_xp(user.get("total_xp", 0)),
-                "total_xp": user.get("total_xp", 0),
-                "current_streak": user.get("current_streak", 0)
-            })
-        
-        return leaderboard
+        # XP earned this calendar month, from pre-aggregated buckets
+        return await XpEventService(db).get_window_leaderboard("monthly", limit)
     except Exception as e:
         return {"error": str(e)}
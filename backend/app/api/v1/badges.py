@@ -1,17 +1,18 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from app.core.database import get_db
+from app.core.http_cache import static_cache
 from app.services.badge_service import BadgeService
 
 router = APIRouter(prefix="/badges", tags=["badges"])
 
 @router.get("")
-async def get_all_badges(db: AsyncIOMotorDatabase = Depends(get_db)):
+async def get_all_badges(request: Request, db: AsyncIOMotorDatabase = Depends(get_db)):
     """Get all badges"""
     try:
         service = BadgeService(db)
-        badges = await service.get_all_badges()
-        return badges
+        # Badges live in MongoDB, so the cached body is refreshed on a TTL
+        return await static_cache.respond(request, "badges:all", service.get_all_badges)
     except Exception as e:
         return {"error": str(e)}
 
@@ -2,13 +2,18 @@
 Quest System API Endpoints
 """
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from app.core.database import get_db
+from app.api.deps import verify_admin
+from app.core.http_cache import static_cache
 from app.services.quest_system_service import QuestSystemService
 from app.services.gamification_service import GamificationService
+from app.services.user_stats import user_stats
+from app.utils.activity_bitmap import ActivityBitmap, BITS_FIELD, ORIGIN_FIELD
 from pydantic import BaseModel
-from datetime import datetime
+from datetime import datetime, timedelta
+from typing import Literal
 
 router = APIRouter(prefix="/quests-system", tags=["quest-system"])
 quest_service = QuestSystemService()
@@ -28,30 +33,37 @@ class CompleteTaskRequest(BaseModel):
 # ==================== QUEST ENDPOINTS ====================
 
 @router.get("/all")
-async def get_all_quests():
-    """Get all available quests"""
-    try:
-        quests = await quest_service.get_all_quests()
+async def get_all_quests(request: Request, fields: Literal["summary", "full"] = "full"):
+    """Get all available quests (``fields=summary`` leaves out task bodies)"""
+    async def build():
+        quests = await quest_service.get_all_quests(fields)
         return {
             "success": True,
             "quests": quests,
-            "total": len(quests)
+            "total": len(quests),
+            "catalog_version": quest_service.catalog.version
         }
+    
+    try:
+        return await static_cache.respond(request, f"quests:all:{fields}", build, version=quest_service.catalog.version)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/{quest_id}")
-async def get_quest(quest_id: str):
+async def get_quest(quest_id: str, request: Request):
     """Get specific quest with all tasks"""
-    try:
-        quest = await quest_service.get_quest(quest_id)
-        if not quest:
-            raise HTTPException(status_code=404, detail="Quest not found")
-        
+    quest = await quest_service.get_quest(quest_id)
+    if not quest:
+        raise HTTPException(status_code=404, detail="Quest not found")
+    
+    async def build():
         return {
             "success": True,
             "quest": quest
         }
+    
+    try:
+        return await static_cache.respond(request, f"quests:{quest_id}", build, version=quest_service.catalog.version)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -94,14 +106,20 @@ async def complete_task(
             req.task_id
         )
         
-        if result.get("success"):
-            # Check for new badges
-            new_badges = await gamification_service.check_new_badges(db, req.user_id)
-            result["new_badges"] = new_badges
-            
+        # A repeated completion moved nothing, so there is nothing to re-check
+        if result.get("success") and not result.get("already_completed"):
             # Update streak
             streak_result = await gamification_service.update_streak(db, req.user_id)
             result["streak"] = streak_result
+            
+            # Check for new badges, only on the stats this completion moved
+            changed = ["total_xp"]
+            if result.get("quest_completed"):
+                changed.append("quests_completed")
+            if streak_result.get("message") != "Already active today":
+                changed.append("current_streak")
+            new_badges = await gamification_service.check_new_badges(db, req.user_id, changed)
+            result["new_badges"] = new_badges
         
         return result
     except Exception as e:
@@ -150,11 +168,11 @@ async def get_user_gamification_stats(
 async def get_level_info(user_id: str, db: AsyncIOMotorDatabase = Depends(get_db)):
     """Get detailed level information"""
     try:
-        user = await db["users"].find_one({"_id": user_id})
-        if not user:
+        snapshot = await user_stats.get(db, user_id)
+        if not snapshot:
             return {"success": False, "error": "User not found"}
         
-        total_xp = user.get("total_xp", 0)
+        total_xp = snapshot.get("total_xp", 0)
         level_info = gamification_service.get_xp_progress_to_next_level(total_xp)
         
         return {"success": True, "level_info": level_info}
@@ -202,10 +220,64 @@ async def get_user_streak(
         if "_id" in streak:
             streak["_id"] = str(streak["_id"])
         
+        if streak.get(BITS_FIELD) is not None:
+            activity = ActivityBitmap.from_document(streak)
+            streak["current_streak"] = activity.current_streak()
+            streak["longest_streak"] = max(activity.longest_streak(), streak.get("longest_streak", 0))
+            streak["active_days_30"] = activity.active_days_last(30)
+        streak.pop(BITS_FIELD, None)
+        streak.pop(ORIGIN_FIELD, None)
+        
         return {"success": True, "streak": streak}
     except Exception as e:
         return {"success": False, "error": str(e)}
 
+@router.get("/user/{user_id}/activity")
+async def get_user_activity(
+    user_id: str,
+    days: int = Query(default=365, ge=1, le=3660),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Calendar heatmap of the user's active days (one 0/1 flag per day, oldest first)"""
+    try:
+        streak = await db["user_streaks"].find_one({"user_id": user_id}, {ORIGIN_FIELD: 1, BITS_FIELD: 1})
+        activity = ActivityBitmap.from_document(streak)
+        end = datetime.utcnow().date()
+        start = end - timedelta(days=days - 1)
+        
+        return {
+            "success": True,
+            "activity": {
+                "start": start.isoformat(),
+                "end": end.isoformat(),
+                "days": activity.heatmap(start, end),
+                "active_days": activity.active_days(start, end),
+                "current_streak": activity.current_streak(end),
+                "longest_streak": activity.longest_streak()
+            }
+        }
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+# ==================== ADMIN ENDPOINTS ====================
+
+@router.post("/admin/reload")
+async def reload_quest_catalog(
+    admin_id: str = Depends(verify_admin),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Reload quest content from its source without a restart (admin only)"""
+    try:
+        changed = await quest_service.catalog.reload(db)
+        return {
+            "success": True,
+            "changed": changed,
+            "catalog_version": quest_service.catalog.version,
+            "total_quests": len(quest_service.catalog.quests)
+        }
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
 @router.get("/health")
 async def quest_system_health():
     """Health check for quest system"""
@@ -213,5 +285,6 @@ async def quest_system_health():
         "status": "healthy",
         "service": "Quest System API",
         "total_quests": len(await quest_service.get_all_quests()),
+        "catalog_version": quest_service.catalog.version,
         "version": "1.0.0"
     }
@@ -4,13 +4,19 @@ from app.core.database import get_db
 from app.core.security import verify_token
 from typing import Optional
 from pydantic import BaseModel
+from app.api.deps import verify_admin
 from app.services.submission_service import SubmissionService
+from app.services.rejudge_service import RejudgeService
 
 class SubmissionCreate(BaseModel):
     task_id: str
     code: str
     language: str = "javascript"
 
+class RejudgeRequest(BaseModel):
+    task_id: str
+    dry_run: bool = True
+
 router = APIRouter(prefix="/submissions", tags=["submissions"])
 
 @router.post("")
@@ -70,7 +76,7 @@ async def evaluate_submission(
     authorization: Optional[str] = Header(None),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
-    """Evaluate submission"""
+    """Queue submission for evaluation; poll /{submission_id}/status for results"""
     if not authorization:
         return {"error": "Not authenticated"}
     
@@ -82,11 +88,33 @@ async def evaluate_submission(
     
     try:
         service = SubmissionService(db)
-        result = await service.evaluate_submission(submission_id)
+        result = await service.request_evaluation(submission_id)
         return result
     except Exception as e:
         return {"error": str(e)}
 
+@router.get("/{submission_id}/status")
+async def get_evaluation_status(
+    submission_id: str,
+    authorization: Optional[str] = Header(None),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Poll evaluation progress"""
+    if not authorization:
+        return {"error": "Not authenticated"}
+    
+    token = authorization.replace("Bearer ", "")
+    user_id = verify_token(token)
+    
+    if not user_id:
+        return {"error": "Invalid token"}
+    
+    try:
+        service = SubmissionService(db)
+        return await service.get_evaluation_status(submission_id)
+    except Exception as e:
+        return {"error": str(e)}
+
 @router.get("/user/me")
 async def get_my_submissions(
     authorization: Optional[str] = Header(None),
@@ -109,3 +137,57 @@ async def get_my_submissions(
         return submissions
     except Exception as e:
         return {"error": str(e)}
+
+@router.post("/admin/rejudge")
+async def start_rejudge(
+    request: RejudgeRequest,
+    admin_id: str = Depends(verify_admin),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Re-grade every submission of a task (admin only; dry run by default)"""
+    try:
+        service = RejudgeService(db)
+        return await service.start(request.task_id, dry_run=request.dry_run, requested_by=admin_id)
+    except Exception as e:
+        return {"error": str(e)}
+
+@router.get("/admin/rejudge/{run_id}")
+async def get_rejudge_progress(
+    run_id: str,
+    admin_id: str = Depends(verify_admin),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Progress of a re-judge run"""
+    try:
+        service = RejudgeService(db)
+        return await service.get_progress(run_id)
+    except Exception as e:
+        return {"error": str(e)}
+
+@router.post("/admin/rejudge/{run_id}/resume")
+async def resume_rejudge(
+    run_id: str,
+    admin_id: str = Depends(verify_admin),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Retry applying a re-judge run whose apply step failed"""
+    try:
+        service = RejudgeService(db)
+        return await service.resume(run_id)
+    except Exception as e:
+        return {"error": str(e)}
+
+@router.get("/admin/rejudge/{run_id}/diff")
+async def get_rejudge_diff(
+    run_id: str,
+    admin_id: str = Depends(verify_admin),
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    limit: int = 100,
+    skip: int = 0
+):
+    """Submissions whose status or XP a re-judge run changes"""
+    try:
+        service = RejudgeService(db)
+        return await service.get_diff(run_id, limit=limit, skip=skip)
+    except Exception as e:
+        return {"error": str(e)}
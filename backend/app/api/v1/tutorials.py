@@ -1,7 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from datetime import datetime
+from typing import Literal
 from app.core.database import get_db
+from app.core.http_cache import static_cache
 from app.services.tutorial_service import TutorialService
 from pydantic import BaseModel
 
@@ -14,26 +16,32 @@ class CompleteTutorialRequest(BaseModel):
     user_id: str
 
 @router.get("/list")
-async def get_tutorials():
-    """Get all available tutorials"""
-    tutorials = await tutorial_service.get_all_tutorials()
-    return {
-        "success": True,
-        "tutorials": tutorials
-    }
+async def get_tutorials(request: Request, fields: Literal["summary", "full"] = "full"):
+    """Get all available tutorials (``fields=summary`` leaves out content and quizzes)"""
+    async def build():
+        tutorials = await tutorial_service.get_all_tutorials(fields)
+        return {
+            "success": True,
+            "tutorials": tutorials
+        }
+    
+    return await static_cache.respond(request, f"tutorials:list:{fields}", build, version=tutorial_service.TUTORIALS_VERSION)
 
 @router.get("/{tutorial_id}")
-async def get_tutorial(tutorial_id: str):
+async def get_tutorial(tutorial_id: str, request: Request):
     """Get a specific tutorial by ID"""
     tutorial = await tutorial_service.get_tutorial(tutorial_id)
     
     if not tutorial:
         raise HTTPException(status_code=404, detail="Tutorial not found")
     
-    return {
-        "success": True,
-        "tutorial": tutorial
-    }
+    async def build():
+        return {
+            "success": True,
+            "tutorial": tutorial
+        }
+    
+    return await static_cache.respond(request, f"tutorials:{tutorial_id}", build, version=tutorial_service.TUTORIALS_VERSION)
 
 @router.get("/user/{user_id}/progress")
 async def get_user_progress(user_id: str, db: AsyncIOMotorDatabase = Depends(get_db)):
@@ -31,6 +31,66 @@ class Settings(BaseSettings):
     GEMINI_MODEL: str | None = "models/gemini-2.5-flash-lite-preview-09-2025"
     GEMINI_MAX_TOKENS: int | None = 1000
     GEMINI_TEMPERATURE: float | None = 0.7
+    GEMINI_MAX_CONCURRENCY: int = 8
+    GEMINI_TIMEOUT_SECONDS: float = 30.0
+    
+    # AI response cache
+    AI_CACHE_MAX_ENTRIES: int = 2000
+    AI_CACHE_TTL_SECONDS: int = 7 * 24 * 3600
+    
+    # AI conversation memory
+    AI_MAX_SESSIONS: int = 5000
+    AI_SESSION_MAX_TURNS: int = 10
+    AI_SESSION_IDLE_SECONDS: int = 1800
+    AI_HISTORY_TOKEN_BUDGET: int = 1500
+    
+    # XP ledger
+    XP_LEDGER_FLUSH_INTERVAL: float = 0.25
+    XP_LEDGER_BATCH_SIZE: int = 500
+    
+    # Code judge (per test case limits)
+    JUDGE_CPU_SECONDS: int = 2
+    JUDGE_WALL_SECONDS: float = 5.0
+    JUDGE_MEMORY_MB: int = 256
+    JUDGE_OUTPUT_BYTES: int = 64 * 1024
+    JUDGE_MAX_PROCESSES: int = 32  # RLIMIT_NPROC, shared by everything running as the sandbox uid
+    # Dedicated unprivileged account submissions run as (-1 = don't switch,
+    # only for development: the code then runs with the API's own rights)
+    JUDGE_SANDBOX_UID: int = 65534
+    JUDGE_SANDBOX_GID: int = 65534
+    JUDGE_ISOLATE_NETWORK: bool = True  # private network namespace per run
+    JUDGE_MAX_CONCURRENCY: int = 4
+    JUDGE_PYTHON_BINARY: str = "python3"
+    JUDGE_NODE_BINARY: str = "node"
+    JUDGE_WARM_POOL: bool = True
+    JUDGE_POOL_SIZE: int = 0  # 0 = one zygote per CPU
+    JUDGE_POOL_MAX_JOBS: int = 200
+    JUDGE_POOL_MAX_RSS_MB: int = 128
+    JUDGE_RESULT_TTL_SECONDS: int = 30 * 24 * 3600
+    
+    # Judge queue and workers
+    JUDGE_QUEUE_LEASE_SECONDS: int = 60
+    JUDGE_QUEUE_MAX_ATTEMPTS: int = 3
+    JUDGE_QUEUE_POLL_SECONDS: float = 0.5
+    JUDGE_WORKER_CONCURRENCY: int = 4
+    JUDGE_WEBHOOK_URL: str = ""
+    
+    # Quest catalog
+    QUEST_CATALOG_SOURCE: str = "file"  # "file" or "mongodb"
+    QUEST_CATALOG_PATH: str = ""  # "" = app/data/quests.json
+    QUEST_CATALOG_RELOAD_SECONDS: float = 5.0  # 0 disables hot reload
+    
+    # Levels: "linear" (1000 XP per level, up to 100), "table" or "exponential"
+    LEVEL_CURVE: str = "linear"
+    
+    # Cross-worker cache invalidation
+    CACHE_SYNC_MODE: str = "auto"  # "auto", "change_stream", "poll" or "off"
+    CACHE_SYNC_POLL_SECONDS: float = 1.0
+    USER_STATS_CACHE_SIZE: int = 10000
+    
+    # Static catalog responses (ETag / 304)
+    STATIC_CACHE_MAX_AGE: int = 0  # 0 = always revalidate with If-None-Match
+    STATIC_CACHE_TTL_SECONDS: float = 60.0  # for database-backed catalogs (badges)
     
     # CORS
     CORS_ORIGINS: List[str] = ["http://localhost:5173", "http://localhost:3000", "http://localhost:8000"]
@@ -0,0 +1,138 @@
+"""
+HTTP caching for static catalog responses
+Bodies are serialized and compressed once per content version, served
+with a strong ETag, and answered with 304 when the client already has them
+"""
+
+import gzip
+import hashlib
+import json
+import time
+from typing import Awaitable, Callable, Optional
+from fastapi import Request, Response
+from app.core.config import settings
+from app.utils.json_encoder import MongoJSONEncoder
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+
+def accepted_encodings(header: str) -> set:
+    """Codings from an Accept-Encoding header, minus the ``q=0`` ones"""
+    accepted = set()
+    for part in (header or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            accepted.add(coding)
+    return accepted
+
+
+def etag_matches(header: str, etag: str) -> bool:
+    """If-None-Match check (weak comparison, as RFC 9110 requires for it)"""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+class StaticResponseCache:
+    """
+    Pre-serialized, pre-compressed JSON bodies keyed by endpoint
+
+    An entry is rebuilt when its content ``version`` changes or, for
+    content without a version (database-backed), once it is older than
+    ``ttl_seconds``.
+    """
+
+    def __init__(self, max_age: int = settings.STATIC_CACHE_MAX_AGE, ttl_seconds: float = settings.STATIC_CACHE_TTL_SECONDS):
+        self.max_age = max_age
+        self.ttl_seconds = ttl_seconds
+        self.entries = {}
+        self.stats = {"builds": 0, "hits": 0, "not_modified": 0}
+
+    @staticmethod
+    def build_entry(payload, version: Optional[str] = None) -> dict:
+        body = json.dumps(payload, cls=MongoJSONEncoder, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        digest = hashlib.sha256(body).hexdigest()[:16]
+        bodies = {"identity": body, "gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            bodies["br"] = brotli.compress(body, quality=11)
+        tag = f"{version}-{digest}" if version else digest
+        return {
+            "version": version,
+            # Each content-coding is its own representation, with its own
+            # strong validator (RFC 9110 8.8.3)
+            "etags": {
+                encoding: f'"{tag}"' if encoding == "identity" else f'"{tag}-{encoding}"'
+                for encoding in bodies
+            },
+            "bodies": bodies,
+            "built_at": time.monotonic(),
+        }
+
+    def _fresh(self, entry: Optional[dict], version: Optional[str]) -> bool:
+        if entry is None:
+            return False
+        if version is not None:
+            return entry["version"] == version
+        return time.monotonic() - entry["built_at"] < self.ttl_seconds
+
+    async def get_entry(self, key: str, version: Optional[str], build: Callable[[], Awaitable]) -> dict:
+        entry = self.entries.get(key)
+        if self._fresh(entry, version):
+            self.stats["hits"] += 1
+            return entry
+        entry = self.build_entry(await build(), version)
+        self.entries[key] = entry
+        self.stats["builds"] += 1
+        return entry
+
+    async def respond(
+        self,
+        request: Request,
+        key: str,
+        build: Callable[[], Awaitable],
+        version: Optional[str] = None
+    ) -> Response:
+        """
+        Cached JSON response for ``key``: the best pre-compressed body the
+        client accepts, or 304 when If-None-Match matches that body's ETag
+        """
+        entry = await self.get_entry(key, version, build)
+        accepted = accepted_encodings(request.headers.get("accept-encoding"))
+        encoding = next(
+            (encoding for encoding in ("br", "gzip") if encoding in entry["bodies"] and encoding in accepted),
+            "identity"
+        )
+        headers = {
+            "ETag": entry["etags"][encoding],
+            "Cache-Control": f"public, max-age={self.max_age}, must-revalidate",
+            "Vary": "Accept-Encoding",
+        }
+        if etag_matches(request.headers.get("if-none-match"), entry["etags"][encoding]):
+            self.stats["not_modified"] += 1
+            return Response(status_code=304, headers=headers)
+
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(entry["bodies"][encoding], media_type="application/json", headers=headers)
+
+    def get_stats(self) -> dict:
+        return {**self.stats, "entries": len(self.entries), "brotli": brotli is not None}
+
+
+static_cache = StaticResponseCache()
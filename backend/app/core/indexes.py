@@ -0,0 +1,178 @@
+"""
+Index Registry
+Declarative index definitions for every collection the services query,
+applied idempotently at startup, plus a query-plan audit
+"""
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import IndexModel, ASCENDING, DESCENDING
+from app.core.config import settings
+
+INDEXES = {
+    "users": [
+        IndexModel([("email", ASCENDING)], unique=True),
+        IndexModel([("username", ASCENDING)], unique=True),
+        IndexModel([("is_active", ASCENDING), ("total_xp", DESCENDING)]),
+        IndexModel([("updated_at", ASCENDING), ("_id", ASCENDING)]),
+    ],
+    "quests": [
+        IndexModel([("title", ASCENDING)]),
+    ],
+    "user_quest_progress": [
+        IndexModel([("user_id", ASCENDING), ("quest_id", ASCENDING)]),
+        IndexModel([("user_id", ASCENDING), ("status", ASCENDING)]),
+        IndexModel([("updated_at", ASCENDING), ("_id", ASCENDING)]),
+    ],
+    "user_badges": [
+        IndexModel([("user_id", ASCENDING), ("badge_id", ASCENDING)], unique=True),
+        IndexModel([("earned_at", ASCENDING), ("_id", ASCENDING)]),
+    ],
+    "user_streaks": [
+        # One streak record per user (scripts/dedupe_user_streaks.py merges older duplicates)
+        IndexModel([("user_id", ASCENDING)], unique=True),
+        IndexModel([("last_activity", ASCENDING), ("_id", ASCENDING)]),
+    ],
+    "code_submissions": [
+        IndexModel([("user_id", ASCENDING), ("timestamp", DESCENDING)]),
+    ],
+    "submissions": [
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)]),
+        IndexModel([("user_id", ASCENDING), ("task_id", ASCENDING), ("created_at", DESCENDING)]),
+        IndexModel([("task_id", ASCENDING)]),
+    ],
+    "notifications": [
+        IndexModel([("user_id", ASCENDING), ("is_read", ASCENDING), ("created_at", DESCENDING)]),
+    ],
+    "tutorial_progress": [
+        IndexModel([("user_id", ASCENDING)]),
+    ],
+    "xp_events": [
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)]),
+    ],
+    "xp_windows": [
+        IndexModel([("window", ASCENDING), ("period", ASCENDING), ("user_id", ASCENDING)], unique=True),
+        IndexModel([("window", ASCENDING), ("period", ASCENDING), ("xp", DESCENDING)]),
+    ],
+    "user_stats": [
+        IndexModel([("username", ASCENDING)]),
+        IndexModel([("updated_at", ASCENDING), ("_id", ASCENDING)]),
+    ],
+    "user_workflows": [
+        IndexModel([("user_id", ASCENDING)]),
+    ],
+    "ai_help_requests": [
+        IndexModel([("user_id", ASCENDING)]),
+    ],
+    "ai_chats": [
+        IndexModel([("user_id", ASCENDING), ("session_id", ASCENDING), ("timestamp", DESCENDING)]),
+    ],
+    "judge_jobs": [
+        IndexModel([("status", ASCENDING), ("priority", ASCENDING), ("created_at", ASCENDING)]),
+        IndexModel([("status", ASCENDING), ("lease_expires_at", ASCENDING)]),
+        IndexModel([("submission_id", ASCENDING), ("created_at", DESCENDING)]),
+        # One active evaluation job per submission (run_id is null for those),
+        # one per submission and run for re-judge jobs
+        IndexModel(
+            [("submission_id", ASCENDING), ("run_id", ASCENDING)],
+            unique=True,
+            partialFilterExpression={"status": {"$in": ["queued", "running"]}},
+            name="one_active_job_per_submission",
+        ),
+    ],
+    "rejudge_items": [
+        IndexModel([("run_id", ASCENDING), ("submission_id", ASCENDING)], unique=True),
+        IndexModel([("run_id", ASCENDING), ("changed", ASCENDING), ("submission_id", ASCENDING)]),
+    ],
+    "judge_results": [
+        IndexModel([("task_id", ASCENDING), ("suite_version", ASCENDING)]),
+        IndexModel([("created_at", ASCENDING)], expireAfterSeconds=settings.JUDGE_RESULT_TTL_SECONDS),
+    ],
+    "ai_cache": [
+        IndexModel([("created_at", ASCENDING)], expireAfterSeconds=settings.AI_CACHE_TTL_SECONDS),
+    ],
+}
+
+# Representative service queries: (collection, filter, sort)
+QUERY_SHAPES = [
+    ("users", {"email": "a@example.com"}, None),
+    ("users", {"username": "demo_user"}, None),
+    ("users", {"is_active": True}, [("total_xp", DESCENDING)]),
+    ("users", {"is_active": True, "total_xp": {"$gt": 100}}, None),
+    ("user_quest_progress", {"user_id": "u", "quest_id": "q"}, None),
+    ("user_quest_progress", {"user_id": "u"}, None),
+    ("user_quest_progress", {"user_id": "u", "status": "in_progress"}, None),
+    ("user_badges", {"user_id": "u"}, None),
+    ("user_streaks", {"user_id": "u"}, None),
+    ("code_submissions", {"user_id": "u"}, [("timestamp", DESCENDING)]),
+    ("submissions", {"user_id": "u"}, [("created_at", DESCENDING)]),
+    ("submissions", {"user_id": "u", "task_id": "t"}, [("created_at", DESCENDING)]),
+    ("submissions", {"user_id": "u", "status": "passed"}, None),
+    ("notifications", {"user_id": "u"}, [("created_at", DESCENDING)]),
+    ("notifications", {"user_id": "u", "is_read": False}, [("created_at", DESCENDING)]),
+    ("tutorial_progress", {"user_id": "u"}, None),
+    ("xp_windows", {"window": "weekly", "period": "2026-W01"}, [("xp", DESCENDING)]),
+    ("xp_windows", {"window": "weekly", "period": "2026-W01", "user_id": "u"}, None),
+    ("xp_windows", {"window": "monthly", "period": "2026-01", "xp": {"$gt": 10}}, None),
+    ("user_stats", {"username": "demo_user"}, None),
+    ("users", {"updated_at": {"$gt": 0}}, [("updated_at", ASCENDING), ("_id", ASCENDING)]),
+    ("user_stats", {"updated_at": {"$gt": 0}}, [("updated_at", ASCENDING), ("_id", ASCENDING)]),
+    ("user_workflows", {"user_id": "u"}, None),
+    ("ai_help_requests", {"user_id": "u"}, None),
+    ("ai_chats", {"user_id": "u", "session_id": "default"}, [("timestamp", DESCENDING)]),
+    ("judge_jobs", {"status": "queued"}, [("priority", ASCENDING), ("created_at", ASCENDING)]),
+    ("judge_jobs", {"status": "running", "lease_expires_at": {"$lt": 0}}, None),
+    ("judge_jobs", {"submission_id": "s"}, [("created_at", DESCENDING)]),
+    ("judge_results", {"task_id": "t", "suite_version": {"$ne": "v"}}, None),
+    ("submissions", {"task_id": "t"}, None),
+    ("rejudge_items", {"run_id": "r"}, None),
+    ("rejudge_items", {"run_id": "r", "changed": True}, [("submission_id", ASCENDING)]),
+]
+
+
+async def ensure_indexes(db: AsyncIOMotorDatabase) -> dict:
+    """Create every registered index; safe to run repeatedly"""
+    created = {}
+    for collection_name, models in INDEXES.items():
+        names = created.setdefault(collection_name, [])
+        for model in models:
+            try:
+                names.extend(await db[collection_name].create_indexes([model]))
+            except Exception as e:
+                print(f"⚠️  Could not create index {model.document['name']} on {collection_name}: {e}")
+    return created
+
+
+def _plan_stages(plan) -> list:
+    """Flatten every ``stage`` name in an explain plan tree"""
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(_plan_stages(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            stages.extend(_plan_stages(item))
+    return stages
+
+
+async def audit_query_plans(db: AsyncIOMotorDatabase) -> list:
+    """
+    Explain every registered query shape
+
+    Returns:
+        List of (collection, filter, sort) shapes whose winning plan
+        contains a COLLSCAN stage
+    """
+    collection_scans = []
+    for collection_name, query, sort in QUERY_SHAPES:
+        command = {"find": collection_name, "filter": query}
+        if sort:
+            command["sort"] = dict(sort)
+
+        explain = await db.command("explain", command, verbosity="queryPlanner")
+        winning_plan = explain["queryPlanner"]["winningPlan"]
+        if "COLLSCAN" in _plan_stages(winning_plan):
+            collection_scans.append((collection_name, query, sort))
+
+    return collection_scans
@@ -0,0 +1,19 @@
+from app.judge.sandbox import SandboxLimits, run_sandboxed
+from app.judge.runners import Runner, PythonRunner, NodeRunner, register_runner, get_runner
+from app.judge.pool import WarmPythonPool, PoolError
+from app.judge.engine import JudgeEngine, judge_engine, normalize_test_cases
+
+__all__ = [
+    "SandboxLimits",
+    "run_sandboxed",
+    "Runner",
+    "PythonRunner",
+    "NodeRunner",
+    "register_runner",
+    "get_runner",
+    "WarmPythonPool",
+    "PoolError",
+    "JudgeEngine",
+    "judge_engine",
+    "normalize_test_cases",
+]
@@ -0,0 +1,162 @@
+"""
+Judge Engine
+Run submitted code against a task's test cases in the sandbox
+"""
+
+import asyncio
+import os
+import tempfile
+from typing import Optional
+from app.core.config import settings
+from app.judge.pool import PoolError, WarmPythonPool
+from app.judge.runners import get_runner
+from app.judge.sandbox import SandboxLimits, run_sandboxed
+
+# Per-case output kept on the result for feedback
+FEEDBACK_CHARS = 1000
+
+
+def normalize_test_cases(test_cases) -> list:
+    """
+    Turn a task's ``test_cases`` into a list of case dicts
+
+    Accepts ``{"cases": [...]}`` (the Task model field) or a bare list.
+    Each case has ``input`` (stdin) and ``expected_output``; a case
+    without an expected output only has to exit cleanly. A task without
+    test cases gets a single smoke case.
+    """
+    if isinstance(test_cases, dict):
+        test_cases = test_cases.get("cases", [])
+    cases = []
+    for index, case in enumerate(test_cases or []):
+        cases.append({
+            "name": case.get("name") or f"Test {index + 1}",
+            "input": case.get("input", ""),
+            "expected_output": case.get("expected_output"),
+        })
+    if not cases:
+        cases.append({"name": "Runs without errors", "input": "", "expected_output": None})
+    return cases
+
+
+def outputs_match(actual: str, expected: str) -> bool:
+    """Compare program output ignoring trailing whitespace and blank lines"""
+    def lines(text):
+        return [line.rstrip() for line in text.rstrip().splitlines()]
+    return lines(actual) == lines(expected)
+
+
+class JudgeEngine:
+    """Execute submissions case by case with bounded concurrency"""
+
+    def __init__(
+        self,
+        limits: Optional[SandboxLimits] = None,
+        max_concurrency: int = settings.JUDGE_MAX_CONCURRENCY
+    ):
+        self.limits = limits or SandboxLimits()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        # language -> warm pool used instead of a cold interpreter start
+        self.pools = {}
+
+    async def start_warm_pools(self):
+        """Start the warm Python pool (long-running judge processes only)"""
+        if "python" not in self.pools:
+            pool = WarmPythonPool(output_bytes=self.limits.output_bytes)
+            await pool.start()
+            self.pools["python"] = pool
+
+    async def stop_warm_pools(self):
+        pools, self.pools = self.pools, {}
+        for pool in pools.values():
+            await pool.stop()
+
+    async def _execute(self, runner, source_path: str, workdir: str, stdin: str) -> dict:
+        pool = self.pools.get(runner.language)
+        if pool is not None and pool.started:
+            try:
+                return await pool.run(source_path, stdin=stdin, limits=self.limits, cwd=workdir)
+            except PoolError as e:
+                print(f"⚠️  Warm {runner.language} pool failed, running cold: {e}")
+        return await run_sandboxed(
+            runner.command(source_path, self.limits),
+            stdin=stdin,
+            limits=self.limits,
+            cwd=workdir,
+            limit_address_space=runner.limit_address_space,
+        )
+
+    async def run_case(self, runner, source_path: str, workdir: str, case: dict) -> dict:
+        """Run one test case in its own working directory"""
+        os.makedirs(workdir)
+        self.limits.prepare_workdir(workdir, writable=True)
+        async with self._semaphore:
+            result = await self._execute(runner, source_path, workdir, case["input"])
+
+        status = result["status"]
+        if status == "ok":
+            expected = case["expected_output"]
+            status = "passed" if expected is None or outputs_match(result["stdout"], expected) else "failed"
+
+        case_result = {
+            "name": case["name"],
+            "status": status,
+            "time_ms": result["time_ms"],
+            "exit_code": result["exit_code"],
+        }
+        if status != "passed":
+            case_result["stdout"] = result["stdout"][:FEEDBACK_CHARS]
+            case_result["stderr"] = result["stderr"][-FEEDBACK_CHARS:]
+            if case["expected_output"] is not None:
+                case_result["expected_output"] = case["expected_output"][:FEEDBACK_CHARS]
+        return case_result
+
+    async def run(self, code: str, language: str, test_cases=None) -> dict:
+        """
+        Judge ``code`` against ``test_cases``
+
+        Returns:
+            dict with total_tests, passed, failed, all_passed, time_ms
+            and a per-case ``test_cases`` list
+        """
+        cases = normalize_test_cases(test_cases)
+        try:
+            runner = get_runner(language)
+            runner.resolve_binary()
+        except ValueError as e:
+            return {
+                "total_tests": len(cases),
+                "passed": 0,
+                "failed": len(cases),
+                "all_passed": False,
+                "time_ms": 0.0,
+                "error": str(e),
+                "test_cases": [],
+            }
+
+        with tempfile.TemporaryDirectory(prefix="judge-") as tmp:
+            source_path = os.path.join(tmp, runner.source_name)
+            with open(source_path, "w", encoding="utf-8") as f:
+                f.write(code)
+            # Readable, not writable, by the sandbox user
+            os.chmod(source_path, 0o644)
+            self.limits.prepare_workdir(tmp)
+
+            results = await asyncio.gather(*(
+                self.run_case(runner, source_path, os.path.join(tmp, f"case-{index}"), case)
+                for index, case in enumerate(cases)
+            ))
+
+        passed = sum(1 for r in results if r["status"] == "passed")
+        return {
+            "total_tests": len(results),
+            "passed": passed,
+            "failed": len(results) - passed,
+            "all_passed": passed == len(results),
+            "time_ms": round(sum(r["time_ms"] for r in results), 2),
+            "language": runner.language,
+            "test_cases": results,
+        }
+
+
+judge_engine = JudgeEngine()
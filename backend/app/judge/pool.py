@@ -0,0 +1,192 @@
+"""
+Warm Interpreter Pool
+Pre-started Python zygotes that fork per test case instead of paying
+interpreter startup and imports on every run
+"""
+
+import asyncio
+import json
+import os
+import shutil
+from typing import Optional
+from app.core.config import settings
+from app.judge.sandbox import SandboxLimits, classify_exit
+
+ZYGOTE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "zygote.py")
+
+# Extra time a zygote gets to report back beyond the case's wall limit
+PROTOCOL_GRACE_SECONDS = 5.0
+
+
+class PoolError(Exception):
+    """A zygote crashed or stopped answering; the run should go cold"""
+
+
+class _Zygote:
+    """One pre-imported interpreter and its request pipe"""
+
+    def __init__(self, binary: str, output_bytes: int):
+        self.binary = binary
+        # Replies carry stdout and stderr, JSON-escaped
+        self.line_limit = 16 * output_bytes + 65536
+        self.proc = None
+        self.jobs = 0
+        self.rss_kb = 0
+
+    async def start(self):
+        binary = shutil.which(self.binary)
+        if binary is None:
+            raise PoolError(f"python binary not found: {self.binary}")
+        self.proc = await asyncio.create_subprocess_exec(
+            binary, "-I", "-B", ZYGOTE_PATH,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+            env={"PATH": os.defpath, "LANG": "C.UTF-8"},
+            start_new_session=True,
+            limit=self.line_limit,
+        )
+        if not await self.proc.stdout.readline():
+            raise PoolError("zygote exited during startup")
+
+    async def request(self, payload: dict) -> dict:
+        self.proc.stdin.write((json.dumps(payload) + "\n").encode("utf-8"))
+        await self.proc.stdin.drain()
+        line = await self.proc.stdout.readline()
+        if not line:
+            raise PoolError("zygote exited")
+        reply = json.loads(line)
+        if "error" in reply:
+            raise PoolError(reply["error"])
+        self.jobs += 1
+        self.rss_kb = reply["rss_kb"]
+        return reply
+
+    async def stop(self):
+        if self.proc is not None and self.proc.returncode is None:
+            self.proc.kill()
+            await self.proc.wait()
+
+
+class WarmPythonPool:
+    """
+    Fixed-size pool of Python zygotes
+
+    Each run takes an idle zygote, which forks a child that applies the
+    sandbox rlimits and executes the submission, so every run starts
+    from the same clean, pre-imported state. Zygotes are replaced after
+    ``max_jobs`` runs, when their RSS grows past ``max_rss_mb``, or when
+    they fail.
+    """
+
+    def __init__(
+        self,
+        size: int = settings.JUDGE_POOL_SIZE,
+        max_jobs: int = settings.JUDGE_POOL_MAX_JOBS,
+        max_rss_mb: int = settings.JUDGE_POOL_MAX_RSS_MB,
+        binary: str = settings.JUDGE_PYTHON_BINARY,
+        output_bytes: int = settings.JUDGE_OUTPUT_BYTES
+    ):
+        self.size = size or os.cpu_count() or 1
+        self.max_jobs = max_jobs
+        self.max_rss_kb = max_rss_mb * 1024
+        self.binary = binary
+        self.output_bytes = output_bytes
+        self._idle: Optional[asyncio.Queue] = None
+        self._zygotes = set()
+        self.stats = {"runs": 0, "recycled": 0, "failures": 0}
+
+    @property
+    def started(self) -> bool:
+        return self._idle is not None
+
+    async def _spawn(self) -> _Zygote:
+        zygote = _Zygote(self.binary, self.output_bytes)
+        await zygote.start()
+        self._zygotes.add(zygote)
+        return zygote
+
+    async def start(self):
+        """Start every zygote"""
+        self._idle = asyncio.Queue()
+        for zygote in await asyncio.gather(*(self._spawn() for _ in range(self.size))):
+            self._idle.put_nowait(zygote)
+
+    async def stop(self):
+        """Kill every zygote"""
+        zygotes, self._zygotes = self._zygotes, set()
+        self._idle = None
+        await asyncio.gather(*(zygote.stop() for zygote in zygotes))
+
+    async def _replace(self, zygote: _Zygote):
+        self._zygotes.discard(zygote)
+        await zygote.stop()
+        if self._idle is None:
+            return
+        try:
+            self._idle.put_nowait(await self._spawn())
+        except Exception as e:
+            print(f"❌ Could not restart judge zygote: {e}")
+
+    def _needs_recycle(self, zygote: _Zygote) -> bool:
+        return zygote.jobs >= self.max_jobs or zygote.rss_kb > self.max_rss_kb
+
+    async def run(
+        self,
+        source_path: str,
+        stdin: str = "",
+        limits: Optional[SandboxLimits] = None,
+        cwd: Optional[str] = None
+    ) -> dict:
+        """Run a Python source file in a forked child; same result shape as run_sandboxed"""
+        if not self.started:
+            raise PoolError("pool is not started")
+        limits = limits or SandboxLimits()
+        zygote = await self._idle.get()
+
+        healthy = False
+        try:
+            reply = await asyncio.wait_for(
+                zygote.request({
+                    "source_path": source_path,
+                    "stdin": stdin,
+                    "cwd": cwd or os.path.dirname(source_path),
+                    "cpu_seconds": limits.cpu_seconds,
+                    "wall_seconds": limits.wall_seconds,
+                    "memory_bytes": limits.memory_mb * 1024 * 1024,
+                    "output_bytes": limits.output_bytes,
+                    "max_processes": limits.max_processes,
+                    "uid": limits.uid,
+                    "gid": limits.gid,
+                    "isolate_network": limits.isolate_network,
+                }),
+                timeout=limits.wall_seconds + PROTOCOL_GRACE_SECONDS,
+            )
+            healthy = True
+        except (asyncio.TimeoutError, ConnectionError, ValueError) as e:
+            raise PoolError(str(e) or type(e).__name__) from e
+        finally:
+            if not healthy:
+                self.stats["failures"] += 1
+            if healthy and self._idle is not None and not self._needs_recycle(zygote):
+                self._idle.put_nowait(zygote)
+            else:
+                if healthy:
+                    self.stats["recycled"] += 1
+                asyncio.ensure_future(self._replace(zygote))
+
+        self.stats["runs"] += 1
+        if reply["timed_out"]:
+            status = "timeout"
+        elif reply["stdout_overflow"] or reply["stderr_overflow"]:
+            status = "output_limit"
+        else:
+            status = classify_exit(reply["exit_code"], reply["stderr"])
+
+        return {
+            "status": status,
+            "exit_code": reply["exit_code"],
+            "stdout": reply["stdout"],
+            "stderr": reply["stderr"],
+            "time_ms": reply["time_ms"],
+        }
@@ -0,0 +1,73 @@
+"""
+Language Runners
+How to execute a submission's source file for each supported language
+"""
+
+import shutil
+from app.core.config import settings
+
+
+class Runner:
+    """Base runner: one language, one source file, one command line"""
+
+    language = None
+    source_name = None
+    # V8 reserves far more virtual memory than it uses, so runners whose
+    # interpreter cannot live under RLIMIT_AS cap memory themselves
+    limit_address_space = True
+
+    def __init__(self, binary: str):
+        self.binary = binary
+
+    def resolve_binary(self) -> str:
+        path = shutil.which(self.binary)
+        if path is None:
+            raise ValueError(f"{self.language} runner binary not found: {self.binary}")
+        return path
+
+    def command(self, source_path: str, limits) -> list:
+        raise NotImplementedError
+
+
+class PythonRunner(Runner):
+    language = "python"
+    source_name = "main.py"
+
+    def __init__(self, binary: str = settings.JUDGE_PYTHON_BINARY):
+        super().__init__(binary)
+
+    def command(self, source_path: str, limits) -> list:
+        # -I: ignore PYTHON* env vars and user site-packages, -B: no .pyc writes
+        return [self.resolve_binary(), "-I", "-B", source_path]
+
+
+class NodeRunner(Runner):
+    language = "javascript"
+    source_name = "main.js"
+    limit_address_space = False
+
+    def __init__(self, binary: str = settings.JUDGE_NODE_BINARY):
+        super().__init__(binary)
+
+    def command(self, source_path: str, limits) -> list:
+        return [self.resolve_binary(), f"--max-old-space-size={limits.memory_mb}", source_path]
+
+
+RUNNERS = {}
+
+
+def register_runner(runner: Runner, *aliases: str):
+    """Make ``runner`` available under its language name and any aliases"""
+    for name in (runner.language, *aliases):
+        RUNNERS[name.lower()] = runner
+
+
+def get_runner(language: str) -> Runner:
+    runner = RUNNERS.get((language or "").lower())
+    if runner is None:
+        raise ValueError(f"Unsupported language: {language}")
+    return runner
+
+
+register_runner(PythonRunner(), "py", "python3")
+register_runner(NodeRunner(), "js", "node", "nodejs")
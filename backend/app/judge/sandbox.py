@@ -0,0 +1,230 @@
+"""
+Sandbox
+Run an untrusted program in a resource-limited subprocess, as an
+unprivileged user and without network access
+"""
+
+import asyncio
+import ctypes
+import os
+import resource
+import signal
+import time
+from typing import Optional
+from app.core.config import settings
+
+READ_CHUNK_BYTES = 4096
+
+# unshare(2) flag for a private network namespace (only loopback, down)
+CLONE_NEWNET = 0x40000000
+
+
+def isolate(uid: int, gid: int, isolate_network: bool):
+    """
+    Drop the calling process into the sandbox identity (child side)
+
+    The network namespace needs root, so it is created before the uid
+    switch. Raises OSError when isolation is configured but not possible
+    (e.g. the judge does not run as root): the run fails rather than
+    executing the submission with the service's own rights.
+    """
+    if isolate_network:
+        libc = ctypes.CDLL(None, use_errno=True)
+        if libc.unshare(CLONE_NEWNET) != 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"network isolation failed: {os.strerror(errno)}")
+    if uid >= 0:
+        if os.geteuid() == 0:
+            os.setgroups([])
+            os.setgid(gid)
+            os.setuid(uid)
+        if os.getuid() != uid or os.geteuid() != uid:
+            raise PermissionError(f"cannot switch to sandbox uid {uid} (judge must start as root)")
+
+
+class SandboxLimits:
+    """Resource limits applied to one sandboxed process"""
+
+    def __init__(
+        self,
+        cpu_seconds: int = settings.JUDGE_CPU_SECONDS,
+        wall_seconds: float = settings.JUDGE_WALL_SECONDS,
+        memory_mb: int = settings.JUDGE_MEMORY_MB,
+        output_bytes: int = settings.JUDGE_OUTPUT_BYTES,
+        max_processes: int = settings.JUDGE_MAX_PROCESSES,
+        uid: int = settings.JUDGE_SANDBOX_UID,
+        gid: int = settings.JUDGE_SANDBOX_GID,
+        isolate_network: bool = settings.JUDGE_ISOLATE_NETWORK
+    ):
+        self.cpu_seconds = cpu_seconds
+        self.wall_seconds = wall_seconds
+        self.memory_mb = memory_mb
+        self.output_bytes = output_bytes
+        self.max_processes = max_processes
+        self.uid = uid
+        self.gid = gid
+        self.isolate_network = isolate_network
+
+    def prepare_workdir(self, path: str, writable: bool = False):
+        """Let the sandbox user reach ``path`` (and write to it if ``writable``)"""
+        if self.uid < 0 or os.geteuid() != 0:
+            return
+        if writable:
+            os.chown(path, self.uid, self.gid)
+            os.chmod(path, 0o700)
+        else:
+            os.chmod(path, 0o711)
+
+    def preexec(self, limit_address_space: bool = True):
+        """Build the child-side hook that installs the rlimits and drops privileges before exec"""
+        memory_bytes = self.memory_mb * 1024 * 1024
+
+        def apply_limits():
+            resource.setrlimit(resource.RLIMIT_CPU, (self.cpu_seconds, self.cpu_seconds + 1))
+            resource.setrlimit(resource.RLIMIT_FSIZE, (self.output_bytes, self.output_bytes))
+            resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+            resource.setrlimit(resource.RLIMIT_NOFILE, (64, 64))
+            resource.setrlimit(resource.RLIMIT_NPROC, (self.max_processes, self.max_processes))
+            if limit_address_space:
+                resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+            isolate(self.uid, self.gid, self.isolate_network)
+
+        return apply_limits
+
+
+def _kill_group(proc):
+    """Kill the sandboxed process and anything it spawned"""
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+async def _read_capped(stream, limit: int, on_overflow) -> tuple:
+    """Read a pipe until EOF or until more than ``limit`` bytes arrive"""
+    data = bytearray()
+    while True:
+        chunk = await stream.read(READ_CHUNK_BYTES)
+        if not chunk:
+            return bytes(data), False
+        data.extend(chunk)
+        if len(data) > limit:
+            on_overflow()
+            return bytes(data[:limit]), True
+
+
+async def _feed_stdin(proc, stdin: str):
+    try:
+        if stdin:
+            proc.stdin.write(stdin.encode("utf-8"))
+            await proc.stdin.drain()
+        proc.stdin.close()
+    except (BrokenPipeError, ConnectionResetError):
+        # The program exited without reading all of its input
+        pass
+
+
+def out_of_memory(returncode: int, stderr: str) -> bool:
+    """
+    Whether a failed run died of memory exhaustion
+
+    Only trusted when the exit itself says so: Python's uncaught-exception
+    exit (1) with a traceback ending in MemoryError, or node aborting on a
+    heap overflow. Printing the words from a run that exits otherwise is
+    just a runtime error.
+    """
+    if returncode == 1:
+        lines = stderr.rstrip().splitlines()
+        return (
+            bool(lines)
+            and "Traceback (most recent call last):" in lines
+            and (lines[-1] == "MemoryError" or lines[-1].startswith("MemoryError:"))
+        )
+    if returncode == -signal.SIGABRT:
+        return "JavaScript heap out of memory" in stderr
+    return False
+
+
+def classify_exit(returncode: int, stderr: str) -> str:
+    """Sandbox status for a process that exited on its own"""
+    if returncode == 0:
+        return "ok"
+    if returncode in (-signal.SIGXCPU, -signal.SIGKILL):
+        return "cpu_limit"
+    if returncode == -signal.SIGXFSZ:
+        return "output_limit"
+    if out_of_memory(returncode, stderr):
+        return "memory_limit"
+    return "runtime_error"
+
+
+async def run_sandboxed(
+    argv: list,
+    stdin: str = "",
+    limits: Optional[SandboxLimits] = None,
+    cwd: Optional[str] = None,
+    env: Optional[dict] = None,
+    limit_address_space: bool = True
+) -> dict:
+    """
+    Run ``argv`` under CPU, memory, wall-time and output limits
+
+    The process gets its own session (so the whole process group can be
+    killed), a minimal environment, rlimits (processes included), the
+    sandbox uid/gid and a private network namespace, applied before exec.
+
+    Returns:
+        dict with ``status`` (ok, timeout, cpu_limit, memory_limit,
+        output_limit, runtime_error), ``exit_code``, ``stdout``,
+        ``stderr`` and ``time_ms``
+    """
+    limits = limits or SandboxLimits()
+    started = time.perf_counter()
+    proc = await asyncio.create_subprocess_exec(
+        *argv,
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        cwd=cwd,
+        env=env if env is not None else {"PATH": os.defpath, "LANG": "C.UTF-8"},
+        start_new_session=True,
+        preexec_fn=limits.preexec(limit_address_space),
+    )
+
+    timed_out = False
+    try:
+        _, (stdout, stdout_overflow), (stderr, stderr_overflow), returncode = await asyncio.wait_for(
+            asyncio.gather(
+                _feed_stdin(proc, stdin),
+                _read_capped(proc.stdout, limits.output_bytes, lambda: _kill_group(proc)),
+                _read_capped(proc.stderr, limits.output_bytes, lambda: _kill_group(proc)),
+                proc.wait(),
+            ),
+            timeout=limits.wall_seconds,
+        )
+    except asyncio.TimeoutError:
+        timed_out = True
+        stdout, stdout_overflow, stderr, stderr_overflow = b"", False, b"", False
+    finally:
+        if proc.returncode is None:
+            _kill_group(proc)
+            await proc.wait()
+
+    elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+    stderr_text = stderr.decode("utf-8", errors="replace")
+
+    if timed_out:
+        status = "timeout"
+    elif stdout_overflow or stderr_overflow:
+        # Checked first: the overflowing process was SIGKILLed
+        status = "output_limit"
+    else:
+        status = classify_exit(proc.returncode, stderr_text)
+
+    return {
+        "status": status,
+        "exit_code": proc.returncode,
+        "stdout": stdout.decode("utf-8", errors="replace"),
+        "stderr": stderr_text,
+        "time_ms": elapsed_ms,
+    }
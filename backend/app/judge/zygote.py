@@ -0,0 +1,206 @@
+"""
+Zygote
+Pre-imported Python interpreter that forks one child per test case run.
+Started by WarmPythonPool with ``python -I -B zygote.py`` and driven by
+one JSON request/reply line at a time on stdin/stdout. Standard library
+only: it must not import the app.
+"""
+
+import builtins
+import ctypes
+import io
+import json
+import os
+import resource
+import select
+import shutil
+import signal
+import sys
+import tempfile
+import time
+import traceback
+
+# Modules beginner exercises commonly import, loaded once per zygote so
+# forked children get them for free
+import bisect  # noqa: F401
+import collections  # noqa: F401
+import functools  # noqa: F401
+import heapq  # noqa: F401
+import itertools  # noqa: F401
+import math  # noqa: F401
+import random
+import re  # noqa: F401
+import string  # noqa: F401
+
+MAX_FD = 1024
+
+# unshare(2) flag for a private network namespace
+CLONE_NEWNET = 0x40000000
+
+# Written by a child that could not be isolated; the run is then refused
+SETUP_ERROR_FILE = "setup_error"
+
+
+def _apply_limits(request: dict):
+    cpu = request["cpu_seconds"]
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+    # One byte over the cap, so a truncated write shows up as overflow
+    resource.setrlimit(resource.RLIMIT_FSIZE, (request["output_bytes"] + 1,) * 2)
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+    resource.setrlimit(resource.RLIMIT_NOFILE, (64, 64))
+    resource.setrlimit(resource.RLIMIT_NPROC, (request["max_processes"],) * 2)
+    resource.setrlimit(resource.RLIMIT_AS, (request["memory_bytes"],) * 2)
+
+
+def _isolate(request: dict):
+    """Same as app.judge.sandbox.isolate (this module cannot import the app)"""
+    if request["isolate_network"]:
+        libc = ctypes.CDLL(None, use_errno=True)
+        if libc.unshare(CLONE_NEWNET) != 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"network isolation failed: {os.strerror(errno)}")
+    uid = request["uid"]
+    if uid >= 0:
+        if os.geteuid() == 0:
+            os.setgroups([])
+            os.setgid(request["gid"])
+            os.setuid(uid)
+        if os.getuid() != uid or os.geteuid() != uid:
+            raise PermissionError(f"cannot switch to sandbox uid {uid} (judge must start as root)")
+
+
+def _run_child(request: dict, io_dir: str):
+    """Runs in the forked child; never returns"""
+    status = 1
+    try:
+        os.setsid()
+        os.chdir(request["cwd"])
+
+        # Submission stdio goes to files in io_dir; the protocol pipes
+        # and every other inherited descriptor are closed
+        os.dup2(os.open(os.path.join(io_dir, "stdin"), os.O_RDONLY), 0)
+        for fd, name in ((1, "stdout"), (2, "stderr")):
+            os.dup2(os.open(os.path.join(io_dir, name), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), fd)
+        os.closerange(3, MAX_FD)
+        sys.stdin = io.TextIOWrapper(io.FileIO(0, "r", closefd=False), encoding="utf-8")
+        sys.stdout = io.TextIOWrapper(io.FileIO(1, "w", closefd=False), encoding="utf-8")
+        sys.stderr = io.TextIOWrapper(io.FileIO(2, "w", closefd=False), encoding="utf-8")
+
+        try:
+            _apply_limits(request)
+            _isolate(request)
+        except Exception as e:
+            with open(os.path.join(io_dir, SETUP_ERROR_FILE), "w", encoding="utf-8") as f:
+                f.write(f"{type(e).__name__}: {e}")
+            raise
+        random.seed()
+        sys.argv = [request["source_path"]]
+
+        try:
+            with open(request["source_path"], encoding="utf-8") as f:
+                code = compile(f.read(), request["source_path"], "exec")
+            exec(code, {"__name__": "__main__", "__file__": request["source_path"], "__builtins__": builtins})
+            status = 0
+        except SystemExit as e:
+            if e.code is None or isinstance(e.code, int):
+                status = e.code or 0
+            else:
+                print(e.code, file=sys.stderr)
+                status = 1
+        except BaseException:
+            traceback.print_exc()
+            status = 1
+
+        sys.stdout.flush()
+        sys.stderr.flush()
+    finally:
+        os._exit(status)
+
+
+def _rss_kb() -> int:
+    # Current RSS: ru_maxrss would include the peak of whatever exec'd us
+    with open("/proc/self/statm") as f:
+        resident_pages = int(f.read().split()[1])
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") // 1024
+
+
+def _read_capped(path: str, limit: int) -> tuple:
+    with open(path, "rb") as f:
+        data = f.read(limit + 1)
+    return data[:limit].decode("utf-8", errors="replace"), len(data) > limit
+
+
+def handle(request: dict) -> dict:
+    """Fork, run one test case under limits, and collect the result"""
+    io_dir = tempfile.mkdtemp(prefix="zygote-io-")
+    try:
+        with open(os.path.join(io_dir, "stdin"), "w", encoding="utf-8") as f:
+            f.write(request["stdin"])
+
+        sys.stdout.flush()
+        started = time.perf_counter()
+        pid = os.fork()
+        if pid == 0:
+            _run_child(request, io_dir)
+
+        pidfd = os.pidfd_open(pid)
+        try:
+            ready, _, _ = select.select([pidfd], [], [], request["wall_seconds"])
+        finally:
+            os.close(pidfd)
+        timed_out = not ready
+        if timed_out:
+            os.kill(pid, signal.SIGKILL)
+        _, wait_status, usage = os.wait4(pid, 0)
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+
+        # Anything the submission spawned goes with it
+        try:
+            os.killpg(pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+        setup_error = os.path.join(io_dir, SETUP_ERROR_FILE)
+        if os.path.exists(setup_error):
+            with open(setup_error, encoding="utf-8") as f:
+                raise RuntimeError(f"sandbox setup failed: {f.read()}")
+
+        stdout, stdout_overflow = _read_capped(os.path.join(io_dir, "stdout"), request["output_bytes"])
+        stderr, stderr_overflow = _read_capped(os.path.join(io_dir, "stderr"), request["output_bytes"])
+        return {
+            "timed_out": timed_out,
+            "exit_code": os.waitstatus_to_exitcode(wait_status),
+            "stdout": stdout,
+            "stdout_overflow": stdout_overflow,
+            "stderr": stderr,
+            "stderr_overflow": stderr_overflow,
+            "time_ms": elapsed_ms,
+            "cpu_ms": round((usage.ru_utime + usage.ru_stime) * 1000, 2),
+            "rss_kb": _rss_kb(),
+        }
+    finally:
+        shutil.rmtree(io_dir, ignore_errors=True)
+
+
+def main():
+    # Keep the protocol pipes on private descriptors so nothing the
+    # zygote or its children print can corrupt them
+    proto_in = os.fdopen(os.dup(0), "r", encoding="utf-8")
+    proto_out = os.fdopen(os.dup(1), "w", encoding="utf-8")
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, 0)
+    os.dup2(devnull, 1)
+
+    proto_out.write(json.dumps({"ready": True}) + "\n")
+    proto_out.flush()
+    for line in proto_in:
+        try:
+            reply = handle(json.loads(line))
+        except Exception as e:
+            reply = {"error": f"{type(e).__name__}: {e}"}
+        proto_out.write(json.dumps(reply) + "\n")
+        proto_out.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -12,7 +12,13 @@ from app.api.v1 import workflow
 
 
 from app.core.database import db_client
+from app.core.indexes import ensure_indexes
 from app.api.v1 import router as api_router
+from app.services.cache_sync import cache_sync, register_cache_handlers
+from app.services.leaderboard_service import leaderboard_index
+from app.services.quest_catalog import quest_catalog
+from app.services.user_stats import user_stats
+from app.services.xp_ledger import xp_ledger
 from app.utils.json_encoder import MongoJSONEncoder
 import json
 
@@ -28,6 +34,17 @@ async def lifespan(app: FastAPI):
     
     await db_client.connect()
     print("✅ Connected to MongoDB")
+    await ensure_indexes(db_client.db)
+    print("✅ Indexes ensured")
+    ranked_users = await leaderboard_index.warm(db_client.db)
+    print(f"✅ Leaderboard index warmed ({ranked_users} users)")
+    xp_ledger.start(db_client.db)
+    await quest_catalog.start(db_client.db)
+    print(f"✅ Quest catalog loaded (version {quest_catalog.version})")
+    register_cache_handlers()
+    sync_mode = await cache_sync.start(db_client.db)
+    user_stats.enable_cache(sync_mode is not None)
+    print(f"✅ Cache sync: {sync_mode or 'off'}")
     print("✅ Application started successfully!")
     print("📖 API Docs: http://localhost:8000/docs")
     print("🔗 ReDoc: http://localhost:8000/redoc")
@@ -36,6 +53,10 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     print("\n🛑 Shutting down application...")
+    await cache_sync.stop()
+    user_stats.enable_cache(False)
+    await quest_catalog.stop()
+    await xp_ledger.stop()
     await db_client.disconnect()
     print("✅ Application shut down successfully!")
 
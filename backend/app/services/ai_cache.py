@@ -0,0 +1,153 @@
+"""
+AI Response Cache
+Content-addressed cache for deterministic AI endpoints: an in-process
+LRU in front of a MongoDB TTL collection, plus single-flight coalescing
+of identical in-flight prompts
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+from app.core.config import settings
+
+CACHE_COLLECTION = "ai_cache"
+
+
+def normalize_input(value):
+    """Drop whitespace that does not change meaning (trailing, blank edges)"""
+    if not isinstance(value, str):
+        return value
+    lines = [line.rstrip() for line in value.strip("\n").splitlines()]
+    return "\n".join(lines).strip()
+
+
+def cache_key(endpoint: str, model: str, inputs: dict, temperature: float = None) -> str:
+    """Stable hash of (endpoint, model, normalized inputs, temperature bucket)"""
+    payload = {
+        "endpoint": endpoint,
+        "model": model,
+        "inputs": {name: normalize_input(value) for name, value in inputs.items()},
+        "temperature": round(temperature or 0.0, 1),
+    }
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class AIResponseCache:
+    """Two-tier response cache with hit/miss counters"""
+
+    def __init__(
+        self,
+        max_entries: int = settings.AI_CACHE_MAX_ENTRIES,
+        ttl_seconds: int = settings.AI_CACHE_TTL_SECONDS
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self.stats = {"memory_hits": 0, "db_hits": 0, "misses": 0, "stores": 0}
+
+    def _remember(self, key: str, value: str):
+        self._entries[key] = (value, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get(self, db, key: str) -> Optional[str]:
+        """Look a response up in memory, then in MongoDB"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, stored_at = entry
+            if time.monotonic() - stored_at < self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return value
+            del self._entries[key]
+
+        if db is not None:
+            doc = await db[CACHE_COLLECTION].find_one({"_id": key}, {"response": 1})
+            if doc:
+                self._remember(key, doc["response"])
+                self.stats["db_hits"] += 1
+                return doc["response"]
+
+        self.stats["misses"] += 1
+        return None
+
+    async def set(self, db, key: str, endpoint: str, value: str):
+        """Store a response in both tiers"""
+        self._remember(key, value)
+        self.stats["stores"] += 1
+        if db is not None:
+            await db[CACHE_COLLECTION].update_one(
+                {"_id": key},
+                {"$set": {
+                    "endpoint": endpoint,
+                    "response": value,
+                    "created_at": datetime.utcnow()
+                }},
+                upsert=True
+            )
+
+    def get_stats(self) -> dict:
+        lookups = self.stats["memory_hits"] + self.stats["db_hits"] + self.stats["misses"]
+        hits = self.stats["memory_hits"] + self.stats["db_hits"]
+        return {
+            **self.stats,
+            "entries": len(self._entries),
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key into one upstream call
+
+    The first caller for a key starts the work; callers arriving while it
+    is still running await the same task and share its result (or
+    exception). The work is only cancelled once every waiter has gone.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self.stats = {"leaders": 0, "coalesced": 0}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: str, factory):
+        """Run ``factory()`` for ``key`` unless an identical call is already in flight"""
+        call = self._calls.get(key)
+        if call is None:
+            task = asyncio.ensure_future(factory())
+            call = {"task": task, "waiters": 0}
+            self._calls[key] = call
+
+            def forget(_):
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+
+            task.add_done_callback(forget)
+            self.stats["leaders"] += 1
+        else:
+            self.stats["coalesced"] += 1
+
+        call["waiters"] += 1
+        try:
+            return await asyncio.shield(call["task"])
+        except asyncio.CancelledError:
+            if call["waiters"] == 1 and not call["task"].done():
+                call["task"].cancel()
+            raise
+        finally:
+            call["waiters"] -= 1
+
+    def get_stats(self) -> dict:
+        return {**self.stats, "in_flight": len(self._calls)}
+
+
+ai_cache = AIResponseCache()
+ai_single_flight = SingleFlight()
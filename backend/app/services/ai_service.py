@@ -5,9 +5,12 @@ Handles AI conversations, code explanations, and hints
 
 import os
 import json
+import asyncio
 from datetime import datetime
 import google.generativeai as genai
 from app.core.config import settings
+from app.services.ai_cache import ai_cache, ai_single_flight, cache_key
+from app.services.conversation_store import conversation_store, DEFAULT_SESSION
 
 # Configure Gemini API
 genai.configure(api_key=settings.GEMINI_API_KEY)
@@ -24,26 +27,98 @@ class AIService:
         # Initialize the model
         self.model = genai.GenerativeModel(self.model_name)
         
-        # Store conversation history
-        self.conversation_history = []
+        # Bound concurrent upstream calls and how long each may take
+        self.timeout = settings.GEMINI_TIMEOUT_SECONDS
+        self._semaphore = asyncio.Semaphore(settings.GEMINI_MAX_CONCURRENCY)
+        
+        # Per-user, per-session conversation memory
+        self.conversations = conversation_store
         
         print(f"✅ Gemini AI Service initialized with model: {self.model_name}")
     
-    async def chat(self, user_message: str, user_id: str, context: str = "") -> dict:
+    async def _generate(self, prompt: str, generation_config=None) -> str:
         """
-        Chat with AI assistant using Gemini
+        Run one Gemini completion without blocking the event loop
         
-        Args:
-            user_message (str): The user's question/message
-            user_id (str): ID of the user asking
-            context (str): Additional context (topic, problem details)
+        Uses the SDK's async client, limited to GEMINI_MAX_CONCURRENCY
+        in-flight calls and GEMINI_TIMEOUT_SECONDS per call. Cancelling
+        the awaiting task cancels the upstream request.
+        """
+        async with self._semaphore:
+            response = await asyncio.wait_for(
+                self.model.generate_content_async(
+                    prompt,
+                    generation_config=generation_config,
+                    request_options={"timeout": self.timeout},
+                ),
+                timeout=self.timeout,
+            )
+        return response.text
+    
+    async def _generate_stream(self, prompt: str, generation_config=None):
+        """
+        Stream one Gemini completion, yielding text chunks as they arrive
         
-        Returns:
-            dict: Response from AI
+        Same concurrency limit as ``_generate``; the timeout applies to
+        the wait for each chunk rather than the whole completion. Closing
+        the generator (e.g. on client disconnect) cancels the upstream
+        request.
         """
-        try:
-            # Build the system prompt
-            system_prompt = """You are CodeQuest AI Assistant, a friendly and helpful coding tutor.
+        async with self._semaphore:
+            response = await asyncio.wait_for(
+                self.model.generate_content_async(
+                    prompt,
+                    generation_config=generation_config,
+                    stream=True,
+                    request_options={"timeout": self.timeout},
+                ),
+                timeout=self.timeout,
+            )
+            chunks = response.__aiter__()
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), timeout=self.timeout)
+                except StopAsyncIteration:
+                    break
+                if chunk.parts:
+                    yield chunk.text
+    
+    async def _cached_generate(self, db, endpoint: str, inputs: dict, prompt: str) -> str:
+        """
+        Serve a deterministic prompt from the response cache, generating
+        and storing it on a miss
+        
+        Concurrent misses for the same key share one Gemini call.
+        
+        Args:
+            db: Database for the shared cache tier (None for memory only)
+            endpoint: Endpoint name, part of the cache key
+            inputs: Normalized prompt inputs, part of the cache key
+            prompt: Full prompt sent to Gemini on a miss
+        """
+        key = cache_key(endpoint, self.model_name, inputs, self.temperature)
+        cached = await ai_cache.get(db, key)
+        if cached is not None:
+            return cached
+        
+        async def generate_and_store():
+            response = await self._generate(prompt)
+            await ai_cache.set(db, key, endpoint, response)
+            return response
+        
+        return await ai_single_flight.do(key, generate_and_store)
+    
+    async def _build_chat_prompt(
+        self,
+        user_message: str,
+        user_id: str,
+        context: str,
+        session_id: str,
+        db
+    ) -> str:
+        """Assemble the tutor system prompt, conversation history and question"""
+        # Build the system prompt
+        system_prompt = """You are CodeQuest AI Assistant, a friendly and helpful coding tutor.
 
 Your responsibilities:
 1. Answer programming questions clearly and concisely
@@ -60,16 +135,48 @@ Teaching Philosophy:
 - Guide them to discover solutions
 - Celebrate their learning journey
 - Make programming fun and accessible"""
-            
-            # Add context if provided
-            if context:
-                system_prompt += f"\n\nCurrent Context: {context}"
-            
-            # Create the full prompt
-            full_prompt = f"{system_prompt}\n\nUser Question: {user_message}"
+        
+        # Add context if provided
+        if context:
+            system_prompt += f"\n\nCurrent Context: {context}"
+        
+        # Include earlier turns of this conversation, within the token budget
+        turns = await self.conversations.get_turns(db, user_id, session_id)
+        history = self.conversations.build_history(turns)
+        if history:
+            system_prompt += f"\n\nConversation so far:\n{history}"
+        
+        # Create the full prompt
+        return f"{system_prompt}\n\nUser Question: {user_message}"
+    
+    async def chat(
+        self,
+        user_message: str,
+        user_id: str,
+        context: str = "",
+        session_id: str = DEFAULT_SESSION,
+        db=None
+    ) -> dict:
+        """
+        Chat with AI assistant using Gemini
+        
+        Args:
+            user_message (str): The user's question/message
+            user_id (str): ID of the user asking
+            context (str): Additional context (topic, problem details)
+            session_id (str): Conversation the message belongs to
+            db: Database to reload evicted conversations from ``ai_chats``
+        
+        Returns:
+            dict: Response from AI
+        """
+        try:
+            full_prompt = await self._build_chat_prompt(
+                user_message, user_id, context, session_id, db
+            )
             
             # Generate response using Gemini
-            response = self.model.generate_content(
+            ai_response = await self._generate(
                 full_prompt,
                 generation_config=genai.types.GenerationConfig(
                     max_output_tokens=self.max_tokens,
@@ -77,27 +184,11 @@ Teaching Philosophy:
                 )
             )
             
-            # Extract the AI response
-            ai_response = response.text
-            
             # Estimate tokens (rough calculation)
             tokens_used = len(user_message.split()) + len(ai_response.split())
             
-            # Add to conversation history
-            self.conversation_history.append({
-                "role": "user",
-                "content": user_message,
-                "timestamp": datetime.utcnow().isoformat()
-            })
-            self.conversation_history.append({
-                "role": "assistant",
-                "content": ai_response,
-                "timestamp": datetime.utcnow().isoformat()
-            })
-            
-            # Keep only last 10 exchanges (20 messages)
-            if len(self.conversation_history) > 20:
-                self.conversation_history = self.conversation_history[-20:]
+            # Add to this session's conversation history
+            self.conversations.append(user_id, user_message, ai_response, session_id)
             
             return {
                 "success": True,
@@ -105,6 +196,7 @@ Teaching Philosophy:
                 "timestamp": datetime.utcnow().isoformat(),
                 "tokens_used": tokens_used,
                 "user_id": user_id,
+                "session_id": session_id,
                 "model": self.model_name
             }
         
@@ -117,13 +209,45 @@ Teaching Philosophy:
                 "user_id": user_id
             }
     
-    async def get_code_explanation(self, code: str, language: str = "python") -> str:
+    async def chat_stream(
+        self,
+        user_message: str,
+        user_id: str,
+        context: str = "",
+        session_id: str = DEFAULT_SESSION,
+        db=None
+    ):
+        """
+        Streaming variant of ``chat``: yields response text as it arrives
+        
+        The exchange is added to the session history only once the
+        stream has completed.
+        """
+        full_prompt = await self._build_chat_prompt(
+            user_message, user_id, context, session_id, db
+        )
+        
+        parts = []
+        async for text in self._generate_stream(
+            full_prompt,
+            generation_config=genai.types.GenerationConfig(
+                max_output_tokens=self.max_tokens,
+                temperature=self.temperature,
+            )
+        ):
+            parts.append(text)
+            yield text
+        
+        self.conversations.append(user_id, user_message, "".join(parts), session_id)
+    
+    async def get_code_explanation(self, code: str, language: str = "python", db=None) -> str:
         """
         Explain a code snippet
         
         Args:
             code (str): The code to explain
             language (str): Programming language
+            db: Database for the shared response cache
         
         Returns:
             str: Explanation of the code
@@ -140,14 +264,24 @@ Please provide:
 
 Keep it concise and easy to understand for beginners."""
             
-            response = self.model.generate_content(prompt)
-            return response.text
+            return await self._cached_generate(
+                db,
+                "explain-code",
+                {"code": code, "language": language.lower()},
+                prompt
+            )
         
         except Exception as e:
             print(f"❌ Error explaining code: {str(e)}")
             return f"Error explaining code: {str(e)}"
     
-    async def generate_hint(self, problem_title: str, problem_description: str, difficulty: str = "beginner") -> str:
+    async def generate_hint(
+        self,
+        problem_title: str,
+        problem_description: str,
+        difficulty: str = "beginner",
+        db=None
+    ) -> str:
         """
         Generate a helpful hint for a coding problem
         
@@ -155,6 +289,7 @@ Keep it concise and easy to understand for beginners."""
             problem_title (str): Title of the problem
             problem_description (str): Full description of the problem
             difficulty (str): Difficulty level
+            db: Database for the shared response cache
         
         Returns:
             str: A helpful hint that doesn't give away the answer
@@ -184,27 +319,23 @@ Provide:
 
 Keep the hint encouraging and educational."""
             
-            response = self.model.generate_content(prompt)
-            return response.text
+            return await self._cached_generate(
+                db,
+                "get-hint",
+                {
+                    "problem_title": problem_title,
+                    "problem_description": problem_description,
+                    "difficulty": difficulty.lower()
+                },
+                prompt
+            )
         
         except Exception as e:
             print(f"❌ Error generating hint: {str(e)}")
             return f"Error generating hint: {str(e)}"
     
-    async def debug_code(self, code: str, error: str, language: str = "python") -> str:
-        """
-        Help debug code by explaining the error
-        
-        Args:
-            code (str): The buggy code
-            error (str): The error message
-            language (str): Programming language
-        
-        Returns:
-            str: Debugging advice
-        """
-        try:
-            prompt = f"""Help debug this {language} code:
+    def _debug_prompt(self, code: str, error: str, language: str) -> str:
+        return f"""Help debug this {language} code:
 
 
 Error: {error}
@@ -217,27 +348,36 @@ Please:
 5. Explain how to prevent this error
 
 Keep it educational and constructive."""
-            
-            response = self.model.generate_content(prompt)
-            return response.text
-        
-        except Exception as e:
-            print(f"❌ Error debugging code: {str(e)}")
-            return f"Error debugging: {str(e)}"
     
-    async def learn_concept(self, concept: str, level: str = "beginner") -> str:
+    async def debug_code(self, code: str, error: str, language: str = "python") -> str:
         """
-        Teach a programming concept
+        Help debug code by explaining the error
         
         Args:
-            concept (str): The concept to learn (e.g., "recursion")
-            level (str): Learning level
+            code (str): The buggy code
+            error (str): The error message
+            language (str): Programming language
         
         Returns:
-            str: Explanation with examples
+            str: Debugging advice
         """
         try:
-            prompt = f"""Teach me about {concept} at the {level} level.
+            return await self._generate(self._debug_prompt(code, error, language))
+        
+        except Exception as e:
+            print(f"❌ Error debugging code: {str(e)}")
+            return f"Error debugging: {str(e)}"
+    
+    async def debug_code_stream(self, code: str, error: str, language: str = "python"):
+        """Streaming variant of ``debug_code``"""
+        async for text in self._generate_stream(self._debug_prompt(code, error, language)):
+            yield text
+    
+    def _concept_inputs(self, concept: str, level: str) -> dict:
+        return {"concept": " ".join(concept.lower().split()), "level": level.lower()}
+    
+    def _concept_prompt(self, concept: str, level: str) -> str:
+        return f"""Teach me about {concept} at the {level} level.
 
 Please include:
 1. **Simple Definition**: What is {concept}?
@@ -248,19 +388,55 @@ Please include:
 6. **Practice Tip**: How to practice this concept
 
 Make it engaging, clear, and not overwhelming."""
-            
-            response = self.model.generate_content(prompt)
-            return response.text
+    
+    async def learn_concept(self, concept: str, level: str = "beginner", db=None) -> str:
+        """
+        Teach a programming concept
+        
+        Args:
+            concept (str): The concept to learn (e.g., "recursion")
+            level (str): Learning level
+            db: Database for the shared response cache
+        
+        Returns:
+            str: Explanation with examples
+        """
+        try:
+            return await self._cached_generate(
+                db,
+                "learn-concept",
+                self._concept_inputs(concept, level),
+                self._concept_prompt(concept, level)
+            )
         
         except Exception as e:
             print(f"❌ Error explaining concept: {str(e)}")
             return f"Error explaining concept: {str(e)}"
     
-    def clear_history(self):
-        """Clear conversation history"""
-        self.conversation_history = []
+    async def learn_concept_stream(self, concept: str, level: str = "beginner", db=None):
+        """
+        Streaming variant of ``learn_concept``
+        
+        A cached response is sent as a single chunk; on a miss the
+        completed stream is stored in the cache.
+        """
+        key = cache_key("learn-concept", self.model_name, self._concept_inputs(concept, level), self.temperature)
+        cached = await ai_cache.get(db, key)
+        if cached is not None:
+            yield cached
+            return
+        
+        parts = []
+        async for text in self._generate_stream(self._concept_prompt(concept, level)):
+            parts.append(text)
+            yield text
+        await ai_cache.set(db, key, "learn-concept", "".join(parts))
+    
+    def clear_history(self, user_id: str = None, session_id: str = None):
+        """Clear conversation history for a session, a user, or everyone"""
+        self.conversations.clear(user_id, session_id)
         print("✅ Conversation history cleared")
     
-    def get_history(self) -> list:
-        """Get conversation history"""
-        return self.conversation_history
+    def get_history(self, user_id: str, session_id: str = DEFAULT_SESSION) -> list:
+        """Get conversation history for a session"""
+        return self.conversations.get_history(user_id, session_id)
@@ -0,0 +1,187 @@
+"""
+Bulk Stats Recompute
+Offline recomputation of every user's level and quests_completed, and
+awarding of threshold badges they have earned but not been given (e.g.
+after a level curve or badge catalog change): users are streamed in large
+batches, evaluated column-wise with NumPy and written back with unordered
+bulk writes
+"""
+
+import time
+from datetime import datetime
+import numpy as np
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+from app.utils.badges import BADGES
+from app.utils.level_system import level_curve
+
+# Users read, evaluated and written per round trip
+BATCH_SIZE = 50_000
+
+USER_PROJECTION = {"total_xp": 1, "level": 1, "badges": 1, "quests_completed": 1}
+
+# Badge criteria types compute_columns has a column for
+COLUMNS = ("total_xp", "level", "streak_days", "quest_count")
+
+
+class BadgeMatrix:
+    """
+    Threshold badge rules as one sorted threshold array per stat
+
+    For a column of stat values, searchsorted gives how many of that
+    stat's badges each user has earned; the per-stat counts identify the
+    user's badge set, and users sharing a set share one list.
+
+    Badges whose criteria type has no column are skipped with a warning
+    and never awarded by the recompute.
+    """
+
+    def __init__(self, badges: dict = BADGES):
+        rules = {}
+        self.skipped = []
+        for badge_id, badge in badges.items():
+            criteria = badge.get("criteria")
+            if not criteria:
+                continue
+            if criteria.get("type") not in COLUMNS:
+                self.skipped.append(badge_id)
+                print(f"⚠️  Badge {badge_id}: no column for criteria type {criteria.get('type')!r}, left as is")
+                continue
+            rules.setdefault(criteria["type"], []).append((criteria["value"], badge_id))
+
+        self.stats = sorted(rules)
+        self.thresholds = {}
+        self.badge_ids = {}
+        for stat in self.stats:
+            ordered = sorted(rules[stat])
+            self.thresholds[stat] = np.array([value for value, _ in ordered], dtype=np.int64)
+            self.badge_ids[stat] = [badge_id for _, badge_id in ordered]
+
+    def earned_counts(self, columns: dict) -> np.ndarray:
+        """(users x stats) number of each stat's badges earned"""
+        return np.stack([
+            np.searchsorted(self.thresholds[stat], columns[stat], side="right")
+            for stat in self.stats
+        ], axis=1)
+
+    def badge_lists(self, columns: dict) -> list:
+        """Earned badge ids per user"""
+        counts = self.earned_counts(columns)
+        # One integer per badge set (mixed radix over the per-stat counts)
+        code = np.zeros(len(counts), dtype=np.int64)
+        for idx, stat in enumerate(self.stats):
+            code = code * (len(self.thresholds[stat]) + 1) + counts[:, idx]
+        _, first, inverse = np.unique(code, return_index=True, return_inverse=True)
+
+        lists = [
+            [badge_id for stat, n in zip(self.stats, counts[row]) for badge_id in self.badge_ids[stat][:n]]
+            for row in first
+        ]
+        return [lists[i] for i in inverse.tolist()]
+
+
+def compute_columns(total_xp: np.ndarray, streak_days: np.ndarray, quest_count: np.ndarray, matrix: BadgeMatrix) -> tuple:
+    """Levels and badge lists for columns of user stats"""
+    level = np.asarray(level_curve.levels_for(total_xp))
+    badges = matrix.badge_lists({
+        "total_xp": total_xp,
+        "level": level,
+        "streak_days": streak_days,
+        "quest_count": quest_count,
+    })
+    return level, badges
+
+
+def _column(users: list, field: str, default: int = 0) -> np.ndarray:
+    return np.fromiter((user.get(field) or default for user in users), dtype=np.int64, count=len(users))
+
+
+def _lookup(users: list, values: dict) -> np.ndarray:
+    return np.fromiter((values.get(str(user["_id"]), 0) for user in users), dtype=np.int64, count=len(users))
+
+
+def recompute_batch(users: list, quest_counts: dict, streaks: dict, matrix: BadgeMatrix, now: datetime = None) -> list:
+    """
+    Update operations for the users in a batch whose stats changed
+
+    Badges are only added: newly earned ones go in with $addToSet, so
+    badges awarded elsewhere (by hand, or by rules the recompute has no
+    column for) are never touched. updated_at, which the cache sync polls
+    on, is only bumped when the level or badges changed.
+    """
+    total_xp = _column(users, "total_xp")
+    quests = _lookup(users, quest_counts)
+    level, badges = compute_columns(total_xp, _lookup(users, streaks), quests, matrix)
+
+    level_moved = level != _column(users, "level", 1)
+    quests_moved = quests != _column(users, "quests_completed")
+    now = now or datetime.utcnow()
+    operations = []
+    for idx, user in enumerate(users):
+        old = set(user.get("badges") or [])
+        new_badges = [badge_id for badge_id in badges[idx] if badge_id not in old]
+        if not (level_moved[idx] or quests_moved[idx] or new_badges):
+            continue
+
+        update = {"$set": {"level": int(level[idx]), "quests_completed": int(quests[idx])}}
+        if level_moved[idx] or new_badges:
+            update["$set"]["updated_at"] = now
+        if new_badges:
+            update["$addToSet"] = {"badges": {"$each": new_badges}}
+        operations.append(UpdateOne({"_id": user["_id"]}, update))
+    return operations
+
+
+async def completed_quest_counts(db: AsyncIOMotorDatabase) -> dict:
+    """user_id (as a string) -> number of completed quests"""
+    counts = {}
+    async for row in db["user_quest_progress"].aggregate([
+        {"$match": {"status": "completed"}},
+        {"$group": {"_id": "$user_id", "count": {"$sum": 1}}},
+    ], allowDiskUse=True):
+        counts[str(row["_id"])] = counts.get(str(row["_id"]), 0) + row["count"]
+    return counts
+
+
+async def streak_lengths(db: AsyncIOMotorDatabase) -> dict:
+    """
+    user_id (as a string) -> longest streak reached
+
+    Streak badges are earned when the streak reaches the threshold, so a
+    streak that has since been broken still counts.
+    """
+    streaks = {}
+    async for row in db["user_streaks"].find({}, {"user_id": 1, "current_streak": 1, "longest_streak": 1}):
+        days = max(row.get("longest_streak") or 0, row.get("current_streak") or 0)
+        key = str(row["user_id"])
+        streaks[key] = max(streaks.get(key, 0), days)
+    return streaks
+
+
+async def recompute_all(db: AsyncIOMotorDatabase, batch_size: int = BATCH_SIZE, dry_run: bool = False) -> dict:
+    """Recompute every user's level and quests_completed and award earned badges"""
+    started = time.perf_counter()
+    matrix = BadgeMatrix()
+    quest_counts = await completed_quest_counts(db)
+    streaks = await streak_lengths(db)
+    report = {"users": 0, "changed": 0, "batches": 0, "dry_run": dry_run, "skipped_badges": matrix.skipped}
+
+    async def flush(batch: list):
+        operations = recompute_batch(batch, quest_counts, streaks, matrix)
+        report["users"] += len(batch)
+        report["changed"] += len(operations)
+        report["batches"] += 1
+        if operations and not dry_run:
+            await db["users"].bulk_write(operations, ordered=False)
+
+    batch = []
+    async for user in db["users"].find({}, USER_PROJECTION).batch_size(batch_size):
+        batch.append(user)
+        if len(batch) >= batch_size:
+            await flush(batch)
+            batch = []
+    if batch:
+        await flush(batch)
+
+    report["seconds"] = round(time.perf_counter() - started, 2)
+    return report
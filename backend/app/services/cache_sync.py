@@ -0,0 +1,250 @@
+"""
+Cache Sync
+Keeps process-local caches consistent across uvicorn workers: changes to
+the watched collections are read from a MongoDB change stream (or, where
+change streams are unavailable, polled by modification timestamp) and
+dispatched to the caches that hold copies of those documents
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+from bson.min_key import MinKey
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import OperationFailure, PyMongoError
+from app.core.config import settings
+from app.services.leaderboard_service import leaderboard_index
+from app.services.user_stats import user_stats
+from app.services.xp_ledger import xp_ledger
+
+# Collection -> field bumped on every write, used by the polling mode.
+# A standalone mongod has no oplog, so this is the timestamp to poll on;
+# deletes are not seen in that mode. Polls page on (field, _id), since bulk
+# writers stamp whole batches with one timestamp.
+POLL_FIELDS = {
+    "users": "updated_at",
+    "user_badges": "earned_at",
+    "user_quest_progress": "updated_at",
+    "user_streaks": "last_activity",
+    "user_stats": "updated_at",
+}
+
+# Documents read per collection per poll
+POLL_BATCH_SIZE = 500
+
+
+def change_user_id(change: dict) -> Optional[str]:
+    """User a change belongs to, when the event carries enough to tell"""
+    if change["collection"] in ("users", "user_stats"):
+        return str(change["document_key"])
+    document = change.get("document")
+    if document and document.get("user_id") is not None:
+        return str(document["user_id"])
+    return None
+
+
+class CacheSync:
+    """
+    Change feed for process-local caches
+
+    Caches ``subscribe`` a handler per collection; handlers get a change
+    dict with ``op`` (insert/update/replace/delete), ``collection``,
+    ``document_key`` and, when available, the full ``document``.
+    """
+
+    def __init__(
+        self,
+        mode: str = settings.CACHE_SYNC_MODE,
+        poll_seconds: float = settings.CACHE_SYNC_POLL_SECONDS
+    ):
+        self.mode = mode
+        self.poll_seconds = poll_seconds
+        self.active_mode: Optional[str] = None
+        self._handlers = {}
+        self._task: Optional[asyncio.Task] = None
+        self._resume_token = None
+        self._marks = {}
+        self.stats = {"changes": 0, "handler_errors": 0, "reconnects": 0}
+
+    def subscribe(self, collection: str, handler: Callable[[dict], None]):
+        self._handlers.setdefault(collection, []).append(handler)
+
+    @property
+    def collections(self) -> list:
+        return sorted(self._handlers)
+
+    def dispatch(self, change: dict):
+        self.stats["changes"] += 1
+        for handler in self._handlers.get(change["collection"], []):
+            try:
+                handler(change)
+            except Exception as e:
+                self.stats["handler_errors"] += 1
+                print(f"❌ Error applying {change['collection']} change to cache: {e}")
+
+    # ---- lifecycle ----
+
+    async def start(self, db: AsyncIOMotorDatabase) -> Optional[str]:
+        """Start following changes; returns the mode in use (None when off)"""
+        if self.mode == "off" or not self._handlers or self._task is not None:
+            return self.active_mode
+
+        self.active_mode = "poll"
+        if self.mode in ("auto", "change_stream"):
+            try:
+                stream = self._open_stream(db)
+                # Opening fails here on servers without change streams
+                first = await stream.try_next()
+                self.active_mode = "change_stream"
+                self._task = asyncio.create_task(self._follow_stream(db, stream, first))
+                return self.active_mode
+            except OperationFailure as e:
+                if self.mode == "change_stream":
+                    raise
+                print(f"⚠️  Change streams unavailable ({e.code}), polling for cache invalidation")
+
+        self._reset_marks()
+        self._task = asyncio.create_task(self._poll_loop(db))
+        return self.active_mode
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.active_mode = None
+
+    # ---- change stream mode ----
+
+    def _open_stream(self, db: AsyncIOMotorDatabase):
+        return db.watch(
+            [{"$match": {"ns.coll": {"$in": self.collections}}}],
+            full_document="updateLookup",
+            resume_after=self._resume_token
+        )
+
+    def _from_event(self, event: dict) -> Optional[dict]:
+        if event["operationType"] not in ("insert", "update", "replace", "delete"):
+            return None
+        return {
+            "op": event["operationType"],
+            "collection": event["ns"]["coll"],
+            "document_key": event["documentKey"]["_id"],
+            "document": event.get("fullDocument"),
+        }
+
+    async def _follow_stream(self, db: AsyncIOMotorDatabase, stream, event: Optional[dict] = None):
+        while True:
+            try:
+                async with stream:
+                    while stream.alive:
+                        if event is None:
+                            event = await stream.try_next()
+                            if event is None:
+                                await asyncio.sleep(self.poll_seconds / 10)
+                                continue
+                        self._resume_token = stream.resume_token
+                        change = self._from_event(event)
+                        event = None
+                        if change is not None:
+                            self.dispatch(change)
+            except PyMongoError as e:
+                print(f"❌ Cache sync change stream error: {e}")
+            # Resume where we left off after a short pause
+            self.stats["reconnects"] += 1
+            await asyncio.sleep(self.poll_seconds)
+            stream = self._open_stream(db)
+
+    # ---- polling mode ----
+
+    def _reset_marks(self):
+        # Writers stamp documents with their own clock; start a little back
+        start = datetime.utcnow() - timedelta(seconds=max(self.poll_seconds, 1.0))
+        self._marks = {collection: (start, MinKey()) for collection in self.collections if collection in POLL_FIELDS}
+
+    async def poll_once(self, db: AsyncIOMotorDatabase) -> int:
+        """Dispatch documents modified since the last poll; returns how many"""
+        dispatched = 0
+        for collection, (mark, last_id) in self._marks.items():
+            field = POLL_FIELDS[collection]
+            # Everything after the last (timestamp, _id) dispatched
+            docs = await db[collection].find(
+                {"$or": [{field: {"$gt": mark}}, {field: mark, "_id": {"$gt": last_id}}]}
+            ).sort([(field, 1), ("_id", 1)]).limit(POLL_BATCH_SIZE).to_list(POLL_BATCH_SIZE)
+
+            for doc in docs:
+                mark, last_id = doc[field], doc["_id"]
+                self.dispatch({
+                    "op": "update",
+                    "collection": collection,
+                    "document_key": doc["_id"],
+                    "document": doc,
+                })
+                dispatched += 1
+            self._marks[collection] = (mark, last_id)
+        return dispatched
+
+    async def _poll_loop(self, db: AsyncIOMotorDatabase):
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            try:
+                await self.poll_once(db)
+            except Exception as e:
+                print(f"❌ Error polling for cache invalidation: {e}")
+
+    def get_stats(self) -> dict:
+        return {**self.stats, "mode": self.active_mode, "collections": self.collections}
+
+
+cache_sync = CacheSync()
+
+
+# ---- handlers for the app's process-local caches ----
+
+def _sync_leaderboard_user(change: dict):
+    user_id = str(change["document_key"])
+    if change["op"] == "delete":
+        leaderboard_index.discard(user_id)
+        return
+    document = change.get("document")
+    # Unflushed local grants are newer than the stored total
+    if document is None or xp_ledger.projected_total(user_id, None) is not None:
+        return
+    # The streak comes from user_streaks (_sync_leaderboard_streak); the
+    # users row's copy is stale or missing
+    entry = leaderboard_index.get(user_id)
+    if entry is not None:
+        document = {**document, "current_streak": entry.get("current_streak", 0)}
+    leaderboard_index.upsert(document)
+
+
+def _sync_leaderboard_streak(change: dict):
+    document = change.get("document")
+    if document is None:
+        return
+    entry = leaderboard_index.get(str(document["user_id"]))
+    if entry is not None and entry.get("current_streak") != document.get("current_streak", 0):
+        leaderboard_index.upsert({**entry, "current_streak": document.get("current_streak", 0), "is_active": True})
+
+
+def _sync_user_stats(change: dict):
+    if change["collection"] == "user_stats" and change.get("document") is not None:
+        user_stats.patch(change["document"])
+        return
+    user_id = change_user_id(change)
+    if user_id is None:
+        # e.g. a badge delete, which only carries the badge document's _id
+        user_stats.clear_cache()
+    else:
+        user_stats.invalidate(user_id)
+
+
+def register_cache_handlers(sync: CacheSync = cache_sync):
+    """Subscribe the leaderboard index and user stats cache to their sources"""
+    sync.subscribe("users", _sync_leaderboard_user)
+    sync.subscribe("user_streaks", _sync_leaderboard_streak)
+    for collection in ("users", "user_badges", "user_quest_progress", "user_streaks", "user_stats"):
+        sync.subscribe(collection, _sync_user_stats)
@@ -0,0 +1,134 @@
+"""
+Conversation Store
+Bounded per-user, per-session chat memory for the AI assistant
+"""
+
+import time
+from collections import OrderedDict, deque
+from typing import Optional
+from app.core.config import settings
+
+DEFAULT_SESSION = "default"
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (same word-count heuristic as tokens_used)"""
+    return len(text.split())
+
+
+class ConversationStore:
+    """
+    LRU of conversation buffers keyed by (user_id, session_id)
+
+    Each buffer holds at most ``max_turns`` exchanges, idle sessions are
+    evicted and the total number of live sessions is capped, so memory
+    stays flat as concurrent users grow. Evicted sessions are reloaded
+    from ``ai_chats`` on the next message.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = settings.AI_MAX_SESSIONS,
+        max_turns: int = settings.AI_SESSION_MAX_TURNS,
+        idle_seconds: int = settings.AI_SESSION_IDLE_SECONDS,
+        token_budget: int = settings.AI_HISTORY_TOKEN_BUDGET
+    ):
+        self.max_sessions = max_sessions
+        self.max_turns = max_turns
+        self.idle_seconds = idle_seconds
+        self.token_budget = token_budget
+        self._sessions = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _evict(self):
+        now = time.monotonic()
+        while self._sessions:
+            _, session = next(iter(self._sessions.items()))
+            if len(self._sessions) <= self.max_sessions and now - session["last_used"] < self.idle_seconds:
+                break
+            self._sessions.popitem(last=False)
+
+    def _touch(self, key: tuple) -> dict:
+        session = self._sessions.get(key)
+        if session is None:
+            session = {"turns": deque(maxlen=self.max_turns), "last_used": 0.0}
+            self._sessions[key] = session
+        session["last_used"] = time.monotonic()
+        self._sessions.move_to_end(key)
+        return session
+
+    async def get_turns(self, db, user_id: str, session_id: str = DEFAULT_SESSION) -> list:
+        """Recent exchanges for a session, oldest first"""
+        key = (user_id, session_id)
+        if key not in self._sessions and db is not None:
+            chats = await db["ai_chats"].find(
+                {"user_id": user_id, "session_id": session_id},
+                {"message": 1, "response": 1, "timestamp": 1}
+            ).sort("timestamp", -1).limit(self.max_turns).to_list(self.max_turns)
+
+            session = self._touch(key)
+            for chat in reversed(chats):
+                session["turns"].append({"user": chat["message"], "assistant": chat["response"]})
+        else:
+            session = self._touch(key)
+
+        self._evict()
+        return list(session["turns"])
+
+    def append(self, user_id: str, user_message: str, ai_response: str, session_id: str = DEFAULT_SESSION):
+        """Record one exchange"""
+        session = self._touch((user_id, session_id))
+        session["turns"].append({"user": user_message, "assistant": ai_response})
+        self._evict()
+
+    def clear(self, user_id: Optional[str] = None, session_id: Optional[str] = None):
+        """Forget one session, every session of a user, or everything"""
+        if user_id is None:
+            self._sessions.clear()
+            return
+        for key in list(self._sessions):
+            if key[0] == user_id and (session_id is None or key[1] == session_id):
+                del self._sessions[key]
+
+    def build_history(self, turns: list) -> str:
+        """
+        Render turns for the prompt within the token budget
+
+        The newest turns are kept verbatim; older ones that do not fit are
+        collapsed into a one-line summary of what the user asked.
+        """
+        kept = []
+        used = 0
+        for turn in reversed(turns):
+            cost = estimate_tokens(turn["user"]) + estimate_tokens(turn["assistant"])
+            if used + cost > self.token_budget:
+                break
+            kept.append(turn)
+            used += cost
+        kept.reverse()
+
+        lines = []
+        dropped = turns[:len(turns) - len(kept)]
+        if dropped:
+            topics = "; ".join(" ".join(turn["user"].split()[:8]) for turn in dropped[-5:])
+            lines.append(f"(Earlier in this conversation the user asked about: {topics})")
+        for turn in kept:
+            lines.append(f"User: {turn['user']}")
+            lines.append(f"Assistant: {turn['assistant']}")
+        return "\n".join(lines)
+
+    def get_history(self, user_id: str, session_id: str = DEFAULT_SESSION) -> list:
+        """Cached messages for a session in role/content form"""
+        session = self._sessions.get((user_id, session_id))
+        if session is None:
+            return []
+        messages = []
+        for turn in session["turns"]:
+            messages.append({"role": "user", "content": turn["user"]})
+            messages.append({"role": "assistant", "content": turn["assistant"]})
+        return messages
+
+
+conversation_store = ConversationStore()
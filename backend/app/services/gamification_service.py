@@ -3,7 +3,19 @@ Gamification Service
 Manage XP, levels, badges, streaks, and achievements
 """
 
-from datetime import datetime, timedelta
+from datetime import datetime
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from app.services.user_stats import user_stats
+from app.services.xp_ledger import xp_ledger
+from app.utils.activity_bitmap import ActivityBitmap, BITS_FIELD
+from app.utils.badge_engine import BadgeRuleEngine
+from app.utils.level_system import level_curve
+
+# Duplicate key error code (badge already awarded by a concurrent check)
+DUPLICATE_KEY = 11000
+
+# Read-modify-write rounds before giving up on a contended streak update
+STREAK_WRITE_ATTEMPTS = 3
 
 class GamificationService:
     """Advanced gamification system"""
@@ -66,94 +78,111 @@ class GamificationService:
         }
     }
     
-    # XP per level
-    XP_PER_LEVEL = 1000
+    # Badge criteria: badge_id -> (stat, threshold)
+    BADGE_RULES = {
+        "first_quest": ("quests_completed", 1),
+        "three_quests": ("quests_completed", 3),
+        "ten_quests": ("quests_completed", 10),
+        "thousand_xp": ("total_xp", 1000),
+        "level_five": ("level", 5),
+        "level_ten": ("level", 10),
+        "seven_day_streak": ("current_streak", 7),
+        "thirty_day_streak": ("current_streak", 30),
+    }
+    
+    # Rules compiled once and indexed by the stat they depend on
+    BADGE_ENGINE = BadgeRuleEngine(BADGE_RULES)
+    
+    # Level curve shared with the rest of the app
+    LEVEL_CURVE = level_curve
     
     def get_level_from_xp(self, total_xp: int) -> int:
         """Calculate level from total XP"""
-        return (total_xp // self.XP_PER_LEVEL) + 1
+        return self.LEVEL_CURVE.level_for(total_xp)
     
     def get_xp_for_level(self, level: int) -> int:
         """Get required XP to reach a level"""
-        return (level - 1) * self.XP_PER_LEVEL
+        return self.LEVEL_CURVE.xp_for_level(level)
     
     def get_xp_progress_to_next_level(self, total_xp: int) -> dict:
         """Get progress towards next level"""
-        current_level = self.get_level_from_xp(total_xp)
-        current_level_xp = self.get_xp_for_level(current_level)
-        next_level_xp = self.get_xp_for_level(current_level + 1)
-        
-        xp_in_current_level = total_xp - current_level_xp
-        xp_needed_for_level = next_level_xp - current_level_xp
-        progress_percentage = (xp_in_current_level / xp_needed_for_level) * 100
+        progress = self.LEVEL_CURVE.progress(total_xp)
         
         return {
-            "current_level": current_level,
-            "current_level_xp": current_level_xp,
-            "next_level_xp": next_level_xp,
-            "xp_in_level": xp_in_current_level,
-            "xp_needed": xp_needed_for_level,
-            "progress_percentage": progress_percentage
+            "current_level": progress["current_level"],
+            "current_level_xp": progress["level_start_xp"],
+            "next_level_xp": progress["level_end_xp"],
+            "xp_in_level": progress["progress_xp"],
+            "xp_needed": progress["needed_xp"],
+            "progress_percentage": progress["progress_percentage"]
         }
     
-    async def check_new_badges(self, db, user_id: str) -> list:
-        """Check if user earned new badges"""
+    def _badge_stats(self, snapshot: dict, user_id: str, affected: set) -> dict:
+        """The stats the affected badge rules depend on, from the user's snapshot"""
+        stats = {}
+        if affected & {"total_xp", "level"}:
+            total_xp = xp_ledger.projected_total(user_id, snapshot.get("total_xp", 0))
+            stats["total_xp"] = total_xp
+            stats["level"] = self.get_level_from_xp(total_xp)
+        if "quests_completed" in affected:
+            stats["quests_completed"] = snapshot.get("quests_completed", 0)
+        if "current_streak" in affected:
+            stats["current_streak"] = snapshot.get("current_streak", 0)
+        return stats
+    
+    async def check_new_badges(self, db, user_id: str, changed: list = None) -> list:
+        """
+        Check if user earned new badges
+        
+        Args:
+            changed: Stats that changed (total_xp, quests_completed,
+                current_streak); only rules depending on them are loaded
+                and evaluated. None checks every badge.
+        """
         try:
-            # Get user data
-            user = await db["users"].find_one({"_id": user_id})
-            if not user:
+            affected = self.BADGE_ENGINE.affected_stats(changed)
+            if not affected:
                 return []
             
-            # Get user badges
-            earned_badges = await db["user_badges"].find(
-                {"user_id": user_id}
-            ).to_list(100)
-            earned_badge_ids = [b["badge_id"] for b in earned_badges]
-            
-            new_badges = []
-            total_xp = user.get("total_xp", 0)
-            level = self.get_level_from_xp(total_xp)
-            
-            # Get quest progress
-            quest_progress = await db["user_quest_progress"].find(
-                {"user_id": user_id}
-            ).to_list(100)
-            completed_quests = [q for q in quest_progress if q["status"] == "completed"]
+            # Stats and earned badges come from one snapshot read
+            snapshot = await user_stats.get(db, user_id)
+            if snapshot is None:
+                return []
+            stats = self._badge_stats(snapshot, user_id, affected)
+            earned_badge_ids = snapshot.get("badge_ids", [])
             
-            # Get streaks
-            streak_doc = await db["user_streaks"].find_one({"user_id": user_id})
-            current_streak = streak_doc.get("current_streak", 0) if streak_doc else 0
+            now = datetime.utcnow()
+            new_badge_docs = []
+            for badge_id in self.BADGE_ENGINE.newly_earned(stats, earned_badge_ids, changed):
+                badge_info = self.BADGES.get(badge_id, {})
+                new_badge_docs.append({
+                    "user_id": user_id,
+                    "badge_id": badge_id,
+                    "name": badge_info.get("name"),
+                    "description": badge_info.get("description"),
+                    "icon": badge_info.get("icon"),
+                    "category": badge_info.get("category"),
+                    "earned_at": now
+                })
             
-            # Check each badge criteria
-            badge_checks = {
-                "first_quest": len(completed_quests) >= 1,
-                "three_quests": len(completed_quests) >= 3,
-                "ten_quests": len(completed_quests) >= 10,
-                "thousand_xp": total_xp >= 1000,
-                "level_five": level >= 5,
-                "level_ten": level >= 10,
-                "seven_day_streak": current_streak >= 7,
-                "thirty_day_streak": current_streak >= 30,
-            }
+            if not new_badge_docs:
+                return []
             
-            # Award badges
-            for badge_id, criteria_met in badge_checks.items():
-                if criteria_met and badge_id not in earned_badge_ids:
-                    badge_info = self.BADGES.get(badge_id, {})
-                    
-                    badge_doc = {
-                        "user_id": user_id,
-                        "badge_id": badge_id,
-                        "name": badge_info.get("name"),
-                        "description": badge_info.get("description"),
-                        "icon": badge_info.get("icon"),
-                        "category": badge_info.get("category"),
-                        "earned_at": datetime.utcnow()
-                    }
-                    
-                    await db["user_badges"].insert_one(badge_doc)
-                    new_badges.append(badge_id)
+            # Award all new badges in one write
+            new_badges = [doc["badge_id"] for doc in new_badge_docs]
+            try:
+                await db["user_badges"].insert_many(new_badge_docs, ordered=False)
+            except BulkWriteError as e:
+                duplicates = {
+                    new_badge_docs[err["index"]]["badge_id"]
+                    for err in e.details.get("writeErrors", [])
+                    if err.get("code") == DUPLICATE_KEY
+                }
+                if len(duplicates) != len(e.details.get("writeErrors", [])):
+                    raise
+                new_badges = [b for b in new_badges if b not in duplicates]
             
+            await user_stats.badges_awarded(db, user_id, new_badges)
             return new_badges
         
         except Exception as e:
@@ -161,64 +190,72 @@ class GamificationService:
             return []
     
     async def update_streak(self, db, user_id: str) -> dict:
-        """Update user's activity streak"""
+        """
+        Record today's activity and update the user's streak
+
+        Activity is kept as a per-day bitmap; recording a day that is
+        already set changes nothing, so repeated calls are harmless
+        """
         try:
             today = datetime.utcnow().date()
             
-            # Get current streak
-            streak_doc = await db["user_streaks"].find_one({"user_id": user_id})
-            
-            if not streak_doc:
-                # First activity
-                streak_doc = {
-                    "user_id": user_id,
-                    "current_streak": 1,
-                    "longest_streak": 1,
-                    "last_activity": datetime.utcnow(),
-                    "streak_broken_at": None
+            for _ in range(STREAK_WRITE_ATTEMPTS):
+                streak_doc = await db["user_streaks"].find_one({"user_id": user_id})
+                
+                if streak_doc and streak_doc.get(BITS_FIELD) is not None:
+                    activity = ActivityBitmap.from_document(streak_doc)
+                elif streak_doc:
+                    # Record from before activity bitmaps: seed with its streak
+                    activity = ActivityBitmap.from_streak(
+                        streak_doc.get("last_activity"), streak_doc.get("current_streak", 0)
+                    )
+                else:
+                    activity = ActivityBitmap()
+                
+                if not activity.add(today) and streak_doc and streak_doc.get(BITS_FIELD) is not None:
+                    # Check if same day (no double counting)
+                    return {
+                        "streak": activity.current_streak(today),
+                        "message": "Already active today"
+                    }
+                
+                current_streak = activity.current_streak(today)
+                longest_streak = max(activity.longest_streak(), (streak_doc or {}).get("longest_streak", 0))
+                now = datetime.utcnow()
+                fields = {
+                    **activity.to_fields(),
+                    "current_streak": current_streak,
+                    "longest_streak": longest_streak,
+                    "last_activity": now
                 }
-                await db["user_streaks"].insert_one(streak_doc)
-                return {"streak": 1, "message": "Streak started!"}
-            
-            last_activity = streak_doc["last_activity"].date()
-            current_streak = streak_doc.get("current_streak", 0)
-            longest_streak = streak_doc.get("longest_streak", 0)
-            
-            # Check if same day (no double counting)
-            if last_activity == today:
+                
+                if not streak_doc:
+                    # First activity
+                    try:
+                        await db["user_streaks"].insert_one({"user_id": user_id, **fields, "streak_broken_at": None})
+                    except DuplicateKeyError:
+                        # A concurrent first activity created it; go through the compare-and-set
+                        continue
+                else:
+                    # Only applies if nobody else updated the bitmap since it was read
+                    result = await db["user_streaks"].update_one(
+                        {"_id": streak_doc["_id"], BITS_FIELD: streak_doc.get(BITS_FIELD)},
+                        {"$set": fields}
+                    )
+                    if result.matched_count == 0:
+                        continue
+                
+                await user_stats.streak_updated(db, user_id, current_streak, longest_streak, now)
+                
+                if not streak_doc:
+                    return {"streak": 1, "message": "Streak started!"}
                 return {
                     "streak": current_streak,
-                    "message": "Already active today"
-                }
-            
-            # Check if consecutive day
-            yesterday = today - timedelta(days=1)
-            if last_activity == yesterday:
-                # Continue streak
-                current_streak += 1
-                if current_streak > longest_streak:
-                    longest_streak = current_streak
-            else:
-                # Streak broken, restart
-                current_streak = 1
-            
-            # Update
-            await db["user_streaks"].update_one(
-                {"user_id": user_id},
-                {
-                    "$set": {
-                        "current_streak": current_streak,
-                        "longest_streak": longest_streak,
-                        "last_activity": datetime.utcnow()
-                    }
+                    "longest_streak": longest_streak,
+                    "message": f"Streak: {current_streak} days! 🔥"
                 }
-            )
             
-            return {
-                "streak": current_streak,
-                "longest_streak": longest_streak,
-                "message": f"Streak: {current_streak} days! 🔥"
-            }
+            return {"success": False, "error": "Streak update conflicted, try again"}
         
         except Exception as e:
             return {"success": False, "error": str(e)}
@@ -226,29 +263,16 @@ class GamificationService:
     async def get_user_stats(self, db, user_id: str) -> dict:
         """Get comprehensive gamification stats"""
         try:
-            user = await db["users"].find_one({"_id": user_id})
-            if not user:
+            snapshot = await user_stats.get(db, user_id)
+            if not snapshot:
                 return {"success": False, "error": "User not found"}
             
-            total_xp = user.get("total_xp", 0)
+            total_xp = xp_ledger.projected_total(user_id, snapshot.get("total_xp", 0))
             level = self.get_level_from_xp(total_xp)
             level_progress = self.get_xp_progress_to_next_level(total_xp)
             
-            # Get badges
-            badges = await db["user_badges"].find(
-                {"user_id": user_id}
-            ).to_list(100)
-            
-            # Get quests
-            quest_progress = await db["user_quest_progress"].find(
-                {"user_id": user_id}
-            ).to_list(100)
-            completed_quests = len([q for q in quest_progress if q["status"] == "completed"])
-            
-            # Get streak
-            streak_doc = await db["user_streaks"].find_one({"user_id": user_id})
-            current_streak = streak_doc.get("current_streak", 0) if streak_doc else 0
-            longest_streak = streak_doc.get("longest_streak", 0) if streak_doc else 0
+            badge_ids = snapshot.get("badge_ids", [])
+            badges = [{"badge_id": badge_id, **self.BADGES.get(badge_id, {})} for badge_id in badge_ids]
             
             return {
                 "success": True,
@@ -258,9 +282,10 @@ class GamificationService:
                     "level_progress": level_progress,
                     "badges_count": len(badges),
                     "badges": badges,
-                    "quests_completed": completed_quests,
-                    "current_streak": current_streak,
-                    "longest_streak": longest_streak
+                    "quests_completed": snapshot.get("quests_completed", 0),
+                    "tasks_completed": snapshot.get("tasks_completed", 0),
+                    "current_streak": snapshot.get("current_streak", 0),
+                    "longest_streak": snapshot.get("longest_streak", 0)
                 }
             }
         
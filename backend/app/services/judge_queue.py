@@ -0,0 +1,372 @@
+"""
+Judge Queue
+MongoDB-backed job queue for submission evaluation, claimed atomically by
+out-of-process workers
+"""
+
+import asyncio
+import os
+import socket
+from datetime import datetime, timedelta
+from typing import Optional
+import httpx
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from app.core.config import settings
+
+JOBS_COLLECTION = "judge_jobs"
+
+# Lower priority value is claimed first
+LANES = {
+    "first_attempt": 0,
+    "rerun": 10,
+    "bulk": 20,
+}
+
+ACTIVE_STATUSES = ("queued", "running")
+
+# Duplicate key error code (the submission already has an active job)
+DUPLICATE_KEY = 11000
+
+# Insert attempts when racing other enqueues of the same submission
+ENQUEUE_ATTEMPTS = 3
+
+
+class LeaseLost(Exception):
+    """The worker's lease on a job expired; another worker owns it now"""
+
+
+class JudgeQueue:
+    """Enqueue, claim, lease and settle submission evaluation jobs"""
+
+    def __init__(
+        self,
+        db: AsyncIOMotorDatabase,
+        lease_seconds: int = settings.JUDGE_QUEUE_LEASE_SECONDS,
+        max_attempts: int = settings.JUDGE_QUEUE_MAX_ATTEMPTS
+    ):
+        self.db = db
+        self.jobs = db[JOBS_COLLECTION]
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+    async def enqueue(self, submission_id: str, user_id, lane: str = "first_attempt") -> dict:
+        """Queue a submission unless it already has a queued or running job"""
+        if lane not in LANES:
+            raise ValueError(f"Unknown judge lane: {lane}")
+
+        # Re-judge jobs (with a run_id) are tracked by their run and don't count
+        active_filter = {
+            "submission_id": submission_id,
+            "status": {"$in": list(ACTIVE_STATUSES)},
+            "run_id": {"$exists": False}
+        }
+        for _ in range(ENQUEUE_ATTEMPTS):
+            active = await self.jobs.find_one(active_filter)
+            if active:
+                return active
+
+            job = self.new_job(submission_id, user_id, lane)
+            try:
+                result = await self.jobs.insert_one(job)
+            except DuplicateKeyError:
+                # A concurrent request queued it first (unique active-job index)
+                continue
+            job["_id"] = result.inserted_id
+            return job
+        raise RuntimeError(f"Could not queue submission {submission_id}: job kept changing state")
+
+    def new_job(self, submission_id: str, user_id, lane: str, **extra) -> dict:
+        """Job document for ``enqueue_many``; ``extra`` fields ride along to the worker"""
+        return {
+            "submission_id": submission_id,
+            "user_id": user_id,
+            "lane": lane,
+            "priority": LANES[lane],
+            "status": "queued",
+            "attempts": 0,
+            "worker_id": None,
+            "lease_expires_at": None,
+            "result": None,
+            "error": None,
+            "created_at": datetime.utcnow(),
+            "started_at": None,
+            "finished_at": None,
+            **extra,
+        }
+
+    async def enqueue_many(self, jobs: list) -> int:
+        """
+        Insert prepared jobs in one round trip, without the active-job
+        check; jobs the unique active-job index rejects are skipped
+        """
+        if not jobs:
+            return 0
+        try:
+            result = await self.jobs.insert_many(jobs, ordered=False)
+        except BulkWriteError as e:
+            if any(error["code"] != DUPLICATE_KEY for error in e.details["writeErrors"]):
+                raise
+            return e.details["nInserted"]
+        return len(result.inserted_ids)
+
+    async def claim(self, worker_id: str) -> Optional[dict]:
+        """Atomically take the highest-priority, oldest queued job"""
+        now = datetime.utcnow()
+        return await self.jobs.find_one_and_update(
+            {"status": "queued"},
+            {
+                "$set": {
+                    "status": "running",
+                    "worker_id": worker_id,
+                    "started_at": now,
+                    "lease_expires_at": now + timedelta(seconds=self.lease_seconds),
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("priority", ASCENDING), ("created_at", ASCENDING)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def _owned(self, job: dict) -> dict:
+        return {"_id": job["_id"], "status": "running", "worker_id": job["worker_id"]}
+
+    async def heartbeat(self, job: dict) -> bool:
+        """Extend the lease on a running job; False if the job was lost"""
+        result = await self.jobs.update_one(
+            self._owned(job),
+            {"$set": {"lease_expires_at": datetime.utcnow() + timedelta(seconds=self.lease_seconds)}}
+        )
+        return result.modified_count == 1
+
+    async def complete(self, job: dict, result: dict) -> bool:
+        """Record a finished evaluation"""
+        update = await self.jobs.update_one(
+            self._owned(job),
+            {"$set": {
+                "status": "done",
+                "result": result,
+                "lease_expires_at": None,
+                "finished_at": datetime.utcnow(),
+            }}
+        )
+        return update.modified_count == 1
+
+    async def fail(self, job: dict, error: str) -> bool:
+        """Requeue a failed job, or give up once it is out of attempts"""
+        retry = job["attempts"] < self.max_attempts
+        update = await self.jobs.update_one(
+            self._owned(job),
+            {"$set": {
+                "status": "queued" if retry else "failed",
+                "worker_id": None,
+                "lease_expires_at": None,
+                "error": error,
+                "finished_at": None if retry else datetime.utcnow(),
+            }}
+        )
+        return update.modified_count == 1
+
+    async def recover_orphans(self) -> int:
+        """
+        Requeue running jobs whose lease expired (their worker crashed or
+        hung); jobs that already used every attempt are marked failed
+        """
+        now = datetime.utcnow()
+        expired = {"status": "running", "lease_expires_at": {"$lt": now}}
+
+        requeued = await self.jobs.update_many(
+            {**expired, "attempts": {"$lt": self.max_attempts}},
+            {"$set": {"status": "queued", "worker_id": None, "lease_expires_at": None}}
+        )
+        abandoned = await self.jobs.update_many(
+            {**expired, "attempts": {"$gte": self.max_attempts}},
+            {"$set": {
+                "status": "failed",
+                "worker_id": None,
+                "lease_expires_at": None,
+                "error": "Worker lost the job too many times",
+                "finished_at": now,
+            }}
+        )
+        return requeued.modified_count + abandoned.modified_count
+
+    async def get_job(self, submission_id: str) -> Optional[dict]:
+        """Most recent job for a submission"""
+        jobs = await self.jobs.find({"submission_id": submission_id}).sort(
+            "created_at", -1
+        ).limit(1).to_list(1)
+        return jobs[0] if jobs else None
+
+    async def position(self, job: dict) -> int:
+        """Number of queued jobs that will be claimed before this one"""
+        return await self.jobs.count_documents({
+            "status": "queued",
+            "$or": [
+                {"priority": {"$lt": job["priority"]}},
+                {"priority": job["priority"], "created_at": {"$lt": job["created_at"]}},
+            ]
+        })
+
+
+async def notify_result(db: AsyncIOMotorDatabase, job: dict, result: dict):
+    """
+    Push hook for finished evaluations: an in-app notification for the
+    user, plus a POST to JUDGE_WEBHOOK_URL when one is configured
+    """
+    status = result.get("status")
+    test_results = result.get("test_results") or {}
+    message = f"{test_results.get('passed', 0)}/{test_results.get('total_tests', 0)} tests passed"
+    if result.get("xp_awarded"):
+        message += f" (+{result['xp_awarded']} XP)"
+
+    await db["notifications"].insert_one({
+        "user_id": job["user_id"],
+        "title": "Submission passed" if status == "passed" else "Submission failed",
+        "message": message,
+        "type": "system",
+        "is_read": False,
+        "action_url": f"/submissions/{job['submission_id']}",
+        "created_at": datetime.utcnow(),
+    })
+
+    if settings.JUDGE_WEBHOOK_URL:
+        payload = {
+            "submission_id": job["submission_id"],
+            "user_id": str(job["user_id"]),
+            "status": status,
+            "xp_awarded": result.get("xp_awarded", 0),
+            "passed": test_results.get("passed", 0),
+            "total_tests": test_results.get("total_tests", 0),
+        }
+        try:
+            async with httpx.AsyncClient(timeout=5.0) as client:
+                await client.post(settings.JUDGE_WEBHOOK_URL, json=payload)
+        except httpx.HTTPError as e:
+            print(f"⚠️  Judge webhook failed for {job['submission_id']}: {e}")
+
+
+class JudgeWorker:
+    """
+    Claims jobs and evaluates them with bounded concurrency
+
+    Each of ``concurrency`` slots loops claim -> evaluate -> settle,
+    renewing its lease while the evaluation runs. A sweeper requeues
+    jobs orphaned by crashed workers.
+    """
+
+    def __init__(
+        self,
+        db: AsyncIOMotorDatabase,
+        concurrency: int = settings.JUDGE_WORKER_CONCURRENCY,
+        poll_interval: float = settings.JUDGE_QUEUE_POLL_SECONDS,
+        worker_id: Optional[str] = None
+    ):
+        self.db = db
+        self.queue = JudgeQueue(db)
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.stats = {"completed": 0, "failed": 0, "recovered": 0, "lost": 0}
+
+    async def _keep_lease(self, job: dict):
+        while True:
+            await asyncio.sleep(self.queue.lease_seconds / 3)
+            if not await self.queue.heartbeat(job):
+                return
+
+    async def process(self, job: dict):
+        """Evaluate one claimed job and settle it"""
+        # Imported here: both services enqueue through this module
+        from app.services.submission_service import SubmissionService
+        from app.services.rejudge_service import RejudgeService
+
+        rejudge = job.get("run_id") is not None
+        lease = asyncio.create_task(self._keep_lease(job))
+        try:
+            if rejudge:
+                result = await RejudgeService(self.db).judge_item(job)
+            else:
+                result = await SubmissionService(self.db).evaluate_submission(job["submission_id"], job=job)
+        except LeaseLost as e:
+            # The job was requeued; whoever holds it now writes the result
+            print(f"⚠️  Judge job {job['_id']} abandoned: {e}")
+            self.stats["lost"] += 1
+            return
+        except Exception as e:
+            print(f"❌ Judge job {job['_id']} failed: {e}")
+            self.stats["failed"] += 1
+            try:
+                if await self.queue.fail(job, str(e)) and rejudge and job["attempts"] >= self.queue.max_attempts:
+                    await RejudgeService(self.db).record_failure(job, str(e))
+            except Exception as settle_error:
+                # Unless fail() went through, the lease runs out and the sweeper requeues the job
+                print(f"❌ Could not record failure of judge job {job['_id']}: {settle_error}")
+            return
+        finally:
+            lease.cancel()
+
+        try:
+            if not await self.queue.complete(job, result):
+                return
+            self.stats["completed"] += 1
+            if rejudge:
+                await RejudgeService(self.db).item_done(job, result)
+                return
+        except Exception as e:
+            print(f"❌ Could not settle judge job {job['_id']}: {e}")
+            return
+        try:
+            await notify_result(self.db, job, result)
+        except Exception as e:
+            print(f"⚠️  Could not notify for {job['submission_id']}: {e}")
+
+    async def _slot(self):
+        while True:
+            try:
+                job = await self.queue.claim(self.worker_id)
+            except Exception as e:
+                print(f"⚠️  Could not claim a judge job: {e}")
+                job = None
+            if job is None:
+                await asyncio.sleep(self.poll_interval)
+                continue
+            await self.process(job)
+
+    async def _sweep(self):
+        while True:
+            try:
+                self.stats["recovered"] += await self.queue.recover_orphans()
+            except Exception as e:
+                print(f"⚠️  Orphaned job sweep failed: {e}")
+            await asyncio.sleep(self.queue.lease_seconds / 2)
+
+    async def run(self):
+        """Run every slot until cancelled"""
+        from app.judge import judge_engine
+
+        if settings.JUDGE_WARM_POOL:
+            await judge_engine.start_warm_pools()
+        print(f"✅ Judge worker {self.worker_id} running {self.concurrency} slots")
+        try:
+            await asyncio.gather(self._sweep(), *(self._slot() for _ in range(self.concurrency)))
+        finally:
+            await judge_engine.stop_warm_pools()
+
+
+def format_job(job: Optional[dict]) -> Optional[dict]:
+    """Public view of a job for polling"""
+    if job is None:
+        return None
+    return {
+        "id": str(job["_id"]),
+        "submission_id": job["submission_id"],
+        "lane": job["lane"],
+        "status": job["status"],
+        "attempts": job["attempts"],
+        "error": job.get("error"),
+        "created_at": job["created_at"],
+        "started_at": job.get("started_at"),
+        "finished_at": job.get("finished_at"),
+    }
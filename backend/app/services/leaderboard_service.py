@@ -1,26 +1,128 @@
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from bson import ObjectId
+from typing import Optional
 from app.utils.json_encoder import convert_objectid
+from app.utils.level_system import level_curve
+from app.utils.ranking import RankedSkipList
+from app.services.xp_event_service import XpEventService, WINDOWS
+
+# Fields needed to render a leaderboard row
+LEADERBOARD_PROJECTION = {
+    "username": 1,
+    "level": 1,
+    "total_xp": 1,
+    "current_streak": 1,
+    "avatar_url": 1,
+    "badges": 1,
+    "is_active": 1,
+}
+
+
+class LeaderboardIndex:
+    """
+    Process-local all-time leaderboard
+
+    Warmed from ``users`` at startup and kept current by the XP ledger,
+    which pushes projected totals on every grant. Top-N and rank lookups
+    are O(log n) and never touch MongoDB.
+    """
+
+    def __init__(self):
+        self._ranks = RankedSkipList()
+        self._entries = {}
+        self.warmed = False
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _key(entry: dict) -> tuple:
+        return (-entry["total_xp"], entry["_id"])
+
+    async def warm(self, db: AsyncIOMotorDatabase) -> int:
+        """Load every active user into the index"""
+        self._ranks = RankedSkipList()
+        self._entries = {}
+        async for user in db["users"].find({"is_active": True}, LEADERBOARD_PROJECTION):
+            self.upsert(user)
+        self.warmed = True
+        return len(self._entries)
+
+    def upsert(self, user: dict):
+        """Insert or refresh a user from a (projected) user document"""
+        user_id = str(user["_id"])
+        self.discard(user_id)
+        if user.get("is_active") is not True:
+            return
+
+        total_xp = user.get("total_xp", 0)
+        entry = convert_objectid({
+            "_id": user_id,
+            "username": user.get("username"),
+            "level": level_curve.level_for(total_xp),
+            "total_xp": total_xp,
+            "current_streak": user.get("current_streak", 0),
+            "avatar_url": user.get("avatar_url"),
+            "badges": user.get("badges", []),
+        })
+        self._entries[user_id] = entry
+        self._ranks.insert(self._key(entry))
+
+    def discard(self, user_id: str):
+        """Drop a user from the index if present"""
+        entry = self._entries.pop(user_id, None)
+        if entry is not None:
+            self._ranks.remove(self._key(entry))
+
+    def get(self, user_id: str) -> Optional[dict]:
+        return self._entries.get(user_id)
+
+    def top(self, limit: int) -> list:
+        """Highest ranked users, best first"""
+        return [
+            {"rank": idx + 1, **self._entries[user_id]}
+            for idx, (_, user_id) in enumerate(self._ranks.slice(0, limit))
+        ]
+
+    def rank_of(self, user_id: str) -> Optional[int]:
+        """1-based rank; users tied on XP share a rank"""
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        return self._ranks.rank((-entry["total_xp"], "")) + 1
+
+
+leaderboard_index = LeaderboardIndex()
+
 
 class LeaderboardService:
     def __init__(self, db: AsyncIOMotorDatabase):
         self.db = db
         self.users_collection = db["users"]
+        self.index = leaderboard_index
 
     async def get_leaderboard(self, type: str = "all_time", limit: int = 50) -> list:
         """Get leaderboard"""
         try:
+            if type in WINDOWS:
+                return await XpEventService(self.db).get_window_leaderboard(type, limit)
+
+            if self.index.warmed:
+                return self.index.top(limit)
+
             users = await self.users_collection.find({
                 "is_active": True
             }).sort("total_xp", -1).limit(limit).to_list(limit)
-            
+
+            # Stored levels lag behind XP grants; derive them in one batch
+            levels = level_curve.levels_for([user.get("total_xp", 0) for user in users])
             leaderboard = []
             for idx, user in enumerate(users):
                 leaderboard.append(convert_objectid({
                     "rank": idx + 1,
                     "_id": user["_id"],
                     "username": user["username"],
-                    "level": user.get("level", 1),
+                    "level": int(levels[idx]),
                     "total_xp": user.get("total_xp", 0),
                     "current_streak": user.get("current_streak", 0),
                     "avatar_url": user.get("avatar_url"),
@@ -34,6 +136,19 @@ class LeaderboardService:
     async def get_user_rank(self, user_id: str, type: str = "all_time") -> dict:
         """Get specific user's rank"""
         try:
+            if type in WINDOWS:
+                return await XpEventService(self.db).get_window_rank(user_id, type)
+
+            entry = self.index.get(user_id) if self.index.warmed else None
+            if entry:
+                return {
+                    "user_id": user_id,
+                    "rank": self.index.rank_of(user_id),
+                    "username": entry["username"],
+                    "level": entry["level"],
+                    "total_xp": entry["total_xp"]
+                }
+
             user = await self.users_collection.find_one({"_id": ObjectId(user_id)})
             if not user:
                 raise ValueError("User not found")
@@ -47,7 +162,7 @@ class LeaderboardService:
                 "user_id": user_id,
                 "rank": rank + 1,
                 "username": user["username"],
-                "level": user.get("level", 1),
+                "level": level_curve.level_for(user.get("total_xp", 0)),
                 "total_xp": user.get("total_xp", 0)
             }
         except Exception as e:
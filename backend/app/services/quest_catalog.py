@@ -0,0 +1,181 @@
+"""
+Quest Catalog
+Quest content loaded once per process from a data file or MongoDB, with
+precomputed lookups, a content version hash and hot reload
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+from typing import Optional
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from app.core.config import settings
+
+DEFAULT_CATALOG_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "quests.json"
+)
+CATALOG_COLLECTION = "quest_catalog"
+
+# Quest fields kept in the listing view; task bodies are left out
+SUMMARY_FIELDS = ("id", "title", "description", "category", "difficulty", "estimated_time", "order", "total_xp")
+
+
+def content_version(quests: list) -> str:
+    """Stable hash of the catalog content"""
+    encoded = json.dumps(quests, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()[:12]
+
+
+def quest_summary(quest: dict) -> dict:
+    """Listing view of a quest: its card fields and task count"""
+    summary = {field: quest.get(field) for field in SUMMARY_FIELDS}
+    summary["task_count"] = len(quest["tasks"])
+    return summary
+
+
+class QuestCatalog:
+    """
+    Read-only quest content with O(1) lookups
+
+    Every index is built together and swapped in with one assignment,
+    so readers never see a half-reloaded catalog.
+    """
+
+    def __init__(
+        self,
+        source: str = settings.QUEST_CATALOG_SOURCE,
+        path: str = settings.QUEST_CATALOG_PATH or DEFAULT_CATALOG_PATH,
+        reload_seconds: float = settings.QUEST_CATALOG_RELOAD_SECONDS
+    ):
+        self.source = source
+        self.path = path
+        self.reload_seconds = reload_seconds
+        self._index = self._build([])
+        self._mtime = None
+        self._db: Optional[AsyncIOMotorDatabase] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _build(quests: list) -> dict:
+        ordered = sorted(quests, key=lambda quest: quest.get("order", 0))
+        by_category = {}
+        tasks = {}
+        task_quests = {}
+        for quest in ordered:
+            by_category.setdefault(quest["category"], []).append(quest)
+            for task in quest["tasks"]:
+                tasks[(quest["id"], task["id"])] = task
+                task_quests[task["id"]] = quest
+        return {
+            "quests": ordered,
+            "summaries": [quest_summary(quest) for quest in ordered],
+            "by_id": {quest["id"]: quest for quest in ordered},
+            "by_category": by_category,
+            "tasks": tasks,
+            "task_quests": task_quests,
+            "version": content_version(ordered),
+        }
+
+    # ---- loading ----
+
+    def load(self, quests: list) -> bool:
+        """Replace the catalog content; returns whether the version changed"""
+        index = self._build(quests)
+        changed = index["version"] != self._index["version"]
+        self._index = index
+        return changed
+
+    def load_file(self, path: Optional[str] = None) -> bool:
+        path = path or self.path
+        mtime = os.path.getmtime(path)
+        with open(path, encoding="utf-8") as f:
+            quests = json.load(f)
+        self._mtime = mtime
+        return self.load(quests)
+
+    async def load_db(self, db: AsyncIOMotorDatabase) -> bool:
+        quests = await db[CATALOG_COLLECTION].find({}, {"_id": 0}).to_list(None)
+        return self.load(quests)
+
+    async def save_db(self, db: AsyncIOMotorDatabase) -> int:
+        """Publish the current content to MongoDB (for the ``mongodb`` source)"""
+        await db[CATALOG_COLLECTION].delete_many({"_id": {"$nin": list(self._index["by_id"])}})
+        for quest in self.quests:
+            await db[CATALOG_COLLECTION].replace_one({"_id": quest["id"]}, quest, upsert=True)
+        return len(self.quests)
+
+    async def reload(self, db: Optional[AsyncIOMotorDatabase] = None) -> bool:
+        """Re-read the configured source; returns whether the content changed"""
+        if self.source == "mongodb":
+            return await self.load_db(db or self._db)
+        return self.load_file()
+
+    def file_changed(self) -> bool:
+        return self.source == "file" and os.path.getmtime(self.path) != self._mtime
+
+    # ---- hot reload ----
+
+    async def start(self, db: AsyncIOMotorDatabase):
+        """Load from the configured source and poll it for changes"""
+        self._db = db
+        await self.reload(db)
+        if self.reload_seconds > 0 and self._task is None:
+            self._task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.reload_seconds)
+            try:
+                if self.source == "mongodb" or self.file_changed():
+                    if await self.reload():
+                        print(f"✅ Quest catalog reloaded (version {self.version})")
+            except Exception as e:
+                # Keep serving the last good catalog
+                print(f"❌ Error reloading quest catalog: {e}")
+
+    # ---- lookups ----
+
+    @property
+    def quests(self) -> list:
+        """Every quest, in ``order``"""
+        return self._index["quests"]
+
+    @property
+    def summaries(self) -> list:
+        """Listing view of every quest, in ``order``"""
+        return self._index["summaries"]
+
+    @property
+    def version(self) -> str:
+        return self._index["version"]
+
+    def get_quest(self, quest_id: str) -> Optional[dict]:
+        return self._index["by_id"].get(quest_id)
+
+    def get_task(self, quest_id: str, task_id: str) -> Optional[dict]:
+        return self._index["tasks"].get((quest_id, task_id))
+
+    def find_task(self, task_id: str) -> tuple:
+        """(quest, task) for a task id, or (None, None)"""
+        quest = self._index["task_quests"].get(task_id)
+        if quest is None:
+            return None, None
+        return quest, self._index["tasks"][(quest["id"], task_id)]
+
+    def by_category(self, category: str) -> list:
+        return self._index["by_category"].get(category, [])
+
+
+quest_catalog = QuestCatalog()
+if quest_catalog.source == "file":
+    quest_catalog.load_file()
@@ -0,0 +1,305 @@
+"""
+Rejudge Service
+Admin bulk re-grading of every submission for a task: fanned out to the
+judge workers, tracked per run, with a dry-run diff and XP corrections
+applied in bulk once every submission has been judged
+"""
+
+from datetime import datetime, timedelta
+from typing import Optional
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne, ReturnDocument
+from app.services.judge_queue import JudgeQueue
+from app.services.submission_service import SubmissionService
+from app.services.xp_ledger import xp_ledger
+
+RUNS_COLLECTION = "rejudge_runs"
+ITEMS_COLLECTION = "rejudge_items"
+
+# Submissions read and jobs inserted (or results written) per round trip
+SCAN_BATCH_SIZE = 1000
+
+# An apply running longer than this is presumed dead and may be resumed
+APPLY_STALE_SECONDS = 600
+
+
+def _stored_xp(old_xp: int):
+    """Filter value for a submission's xp_awarded as judge_item read it (missing counted as 0)"""
+    return {"$in": [0, None]} if not old_xp else old_xp
+
+
+class RejudgeService:
+    """Start, track and apply bulk re-judge runs"""
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+        self.runs = db[RUNS_COLLECTION]
+        self.items = db[ITEMS_COLLECTION]
+        self.submissions_collection = db["submissions"]
+        self.queue = JudgeQueue(db)
+
+    async def start(self, task_id: str, dry_run: bool = True, requested_by: Optional[str] = None) -> dict:
+        """
+        Queue every submission of a task on the bulk lane
+
+        Submissions are streamed with a cursor and their jobs inserted in
+        batches; the workers do the judging.
+        """
+        result = await self.runs.insert_one({
+            "task_id": task_id,
+            "dry_run": dry_run,
+            "status": "scanning",
+            "total": 0,
+            "judged": 0,
+            "changed": 0,
+            "failed": 0,
+            "summary": None,
+            "requested_by": requested_by,
+            "created_at": datetime.utcnow(),
+            "finished_at": None,
+        })
+        run_id = str(result.inserted_id)
+
+        total = 0
+        batch = []
+        cursor = self.submissions_collection.find(
+            {"task_id": task_id},
+            {"user_id": 1}
+        ).batch_size(SCAN_BATCH_SIZE)
+        async for submission in cursor:
+            batch.append(self.queue.new_job(str(submission["_id"]), submission["user_id"], "bulk", run_id=run_id))
+            if len(batch) >= SCAN_BATCH_SIZE:
+                total += await self.queue.enqueue_many(batch)
+                batch = []
+        total += await self.queue.enqueue_many(batch)
+
+        await self.runs.update_one(
+            {"_id": result.inserted_id},
+            {"$set": {"total": total, "status": "judging"}}
+        )
+        # Covers tasks without submissions and jobs finished during the scan
+        await self._maybe_finish(run_id)
+        return await self.get_progress(run_id)
+
+    async def judge_item(self, job: dict) -> dict:
+        """Re-grade one submission of a run and record the diff (called by the judge workers)"""
+        submission = await self.submissions_collection.find_one({"_id": ObjectId(job["submission_id"])})
+        if not submission:
+            raise ValueError("Submission not found")
+
+        result = await SubmissionService(self.db).judge(submission)
+        old_xp = submission.get("xp_awarded") or 0
+        changed = result["status"] != submission.get("status") or result["xp_awarded"] != old_xp
+
+        await self.items.update_one(
+            {"run_id": job["run_id"], "submission_id": job["submission_id"]},
+            {"$set": {
+                "user_id": submission["user_id"],
+                "old_status": submission.get("status"),
+                "new_status": result["status"],
+                "old_xp": old_xp,
+                "new_xp": result["xp_awarded"],
+                "xp_delta": result["xp_awarded"] - old_xp,
+                "changed": changed,
+                "test_results": result["test_results"],
+                "judged_at": datetime.utcnow(),
+            }},
+            upsert=True
+        )
+        return {"status": result["status"], "changed": changed}
+
+    async def item_done(self, job: dict, result: dict):
+        """Count a settled job towards its run"""
+        inc = {"judged": 1}
+        if result["changed"]:
+            inc["changed"] = 1
+        await self.runs.update_one({"_id": ObjectId(job["run_id"])}, {"$inc": inc})
+        await self._maybe_finish(job["run_id"])
+
+    async def record_failure(self, job: dict, error: str):
+        """Count a job that ran out of attempts; its submission is left as is"""
+        await self.items.update_one(
+            {"run_id": job["run_id"], "submission_id": job["submission_id"]},
+            {"$set": {"user_id": job["user_id"], "changed": False, "error": error, "judged_at": datetime.utcnow()}},
+            upsert=True
+        )
+        await self.runs.update_one({"_id": ObjectId(job["run_id"])}, {"$inc": {"judged": 1, "failed": 1}})
+        await self._maybe_finish(job["run_id"])
+
+    async def _maybe_finish(self, run_id: str):
+        # Only the caller that flips the run to "applying" applies it
+        run = await self.runs.find_one_and_update(
+            {"_id": ObjectId(run_id), "status": "judging", "$expr": {"$gte": ["$judged", "$total"]}},
+            {"$set": {"status": "applying", "apply_started_at": datetime.utcnow()}},
+            return_document=ReturnDocument.AFTER
+        )
+        if run:
+            await self.apply(run)
+
+    async def resume(self, run_id: str) -> dict:
+        """Apply a run again whose apply step failed, or that is stuck "applying" (its process died)"""
+        now = datetime.utcnow()
+        run = await self.runs.find_one_and_update(
+            {"_id": ObjectId(run_id), "$or": [
+                {"status": "apply_failed"},
+                {"status": "applying", "apply_started_at": {"$lt": now - timedelta(seconds=APPLY_STALE_SECONDS)}},
+            ]},
+            {"$set": {"status": "applying", "apply_started_at": now, "error": None}},
+            return_document=ReturnDocument.AFTER
+        )
+        if not run:
+            raise ValueError("Rejudge run not found or not waiting to be applied")
+        await self.apply(run)
+        return await self.get_progress(run_id)
+
+    async def apply(self, run: dict) -> dict:
+        """
+        Summarize a finished run and, unless it is a dry run, write the
+        new results in bulk and grant the XP corrections through the ledger
+
+        Safe to run again after a failure: items already written are
+        skipped, and the run is left "apply_failed" for ``resume``.
+        """
+        try:
+            if not run["dry_run"]:
+                await self._write_results(str(run["_id"]))
+            summary = await self._summarize(run)
+        except Exception as e:
+            await self.runs.update_one(
+                {"_id": run["_id"], "status": "applying"},
+                {"$set": {"status": "apply_failed", "error": str(e)}}
+            )
+            raise
+
+        await self.runs.update_one(
+            {"_id": run["_id"]},
+            {"$set": {"status": "done", "summary": summary, "finished_at": datetime.utcnow()}}
+        )
+        return summary
+
+    async def _write_results(self, run_id: str):
+        """
+        Write judged items over their submissions, a batch at a time
+
+        Each write only applies while the submission still holds the XP
+        the item was judged against; a submission re-run in the meantime
+        keeps its newer result and gets no correction. Only the writes
+        that matched are granted their XP delta.
+        """
+        pending = {"run_id": run_id, "error": {"$exists": False}, "applied": {"$exists": False}}
+        while True:
+            items = await self.items.find(pending).limit(SCAN_BATCH_SIZE).to_list(SCAN_BATCH_SIZE)
+            if not items:
+                return
+            ids = [ObjectId(item["submission_id"]) for item in items]
+
+            # Written by an earlier, interrupted apply of this run
+            written = set(await self.submissions_collection.distinct("_id", {"_id": {"$in": ids}, "rejudged_by": run_id}))
+            now = datetime.utcnow()
+            updates = [
+                UpdateOne(
+                    {"_id": ObjectId(item["submission_id"]), "xp_awarded": _stored_xp(item["old_xp"])},
+                    {"$set": {
+                        "status": item["new_status"],
+                        "test_results": item["test_results"],
+                        "xp_awarded": item["new_xp"],
+                        "rejudged_by": run_id,
+                        "updated_at": now,
+                    }}
+                )
+                for item in items if ObjectId(item["submission_id"]) not in written
+            ]
+            if updates:
+                await self.submissions_collection.bulk_write(updates, ordered=False)
+            applied = set(await self.submissions_collection.distinct("_id", {"_id": {"$in": ids}, "rejudged_by": run_id}))
+
+            applied_ids = [item["submission_id"] for item in items if ObjectId(item["submission_id"]) in applied]
+            skipped_ids = [item["submission_id"] for item in items if ObjectId(item["submission_id"]) not in applied]
+            if applied_ids:
+                await self.items.update_many({"run_id": run_id, "submission_id": {"$in": applied_ids}}, {"$set": {"applied": True}})
+            if skipped_ids:
+                await self.items.update_many({"run_id": run_id, "submission_id": {"$in": skipped_ids}}, {"$set": {"applied": False}})
+
+            # Marked before granting: a failure from here on loses a
+            # correction rather than granting it twice on resume
+            deltas = {}
+            for item in items:
+                if ObjectId(item["submission_id"]) in applied and item["xp_delta"]:
+                    deltas[item["user_id"]] = deltas.get(item["user_id"], 0) + item["xp_delta"]
+            await xp_ledger.grant_many(self.db, [
+                {"user_id": ObjectId(user_id), "amount": amount, "source": "rejudge", "ref": run_id}
+                for user_id, amount in deltas.items() if amount
+            ])
+
+    async def _summarize(self, run: dict) -> dict:
+        run_id = str(run["_id"])
+        summary = {
+            "judged": run["judged"],
+            "failed": run["failed"],
+            "changed": 0,
+            "newly_passed": 0,
+            "newly_failed": 0,
+            "xp_added": 0,
+            "xp_removed": 0,
+            "users_affected": 0,
+            "skipped": 0,
+        }
+        users = {}
+        query = {"run_id": run_id, "changed": True, "error": {"$exists": False}}
+        async for item in self.items.find(query, {"test_results": 0}):
+            if not run["dry_run"] and not item.get("applied"):
+                # Submission re-run while the run was judging
+                summary["skipped"] += 1
+                continue
+            summary["changed"] += 1
+            if item["new_status"] == "passed":
+                summary["newly_passed"] += 1
+            elif item["old_status"] == "passed":
+                summary["newly_failed"] += 1
+            if item["xp_delta"] > 0:
+                summary["xp_added"] += item["xp_delta"]
+            elif item["xp_delta"] < 0:
+                summary["xp_removed"] -= item["xp_delta"]
+            if item["xp_delta"]:
+                users[item["user_id"]] = users.get(item["user_id"], 0) + item["xp_delta"]
+        summary["users_affected"] = sum(1 for amount in users.values() if amount)
+        return summary
+
+    async def get_progress(self, run_id: str) -> dict:
+        """Progress and, once finished, the summary of a run"""
+        run = await self.runs.find_one({"_id": ObjectId(run_id)})
+        if not run:
+            raise ValueError("Rejudge run not found")
+        return {
+            "id": run_id,
+            "task_id": run["task_id"],
+            "dry_run": run["dry_run"],
+            "status": run["status"],
+            "total": run["total"],
+            "judged": run["judged"],
+            "changed": run["changed"],
+            "failed": run["failed"],
+            "percent": round(100 * run["judged"] / run["total"], 1) if run["total"] else 100.0,
+            "summary": run["summary"],
+            "error": run.get("error"),
+            "created_at": run["created_at"],
+            "finished_at": run["finished_at"],
+        }
+
+    async def get_diff(self, run_id: str, limit: int = 100, skip: int = 0) -> list:
+        """Submissions whose status or XP changes in a run"""
+        items = await self.items.find(
+            {"run_id": run_id, "changed": True},
+            {"test_results": 0}
+        ).sort("submission_id", 1).skip(skip).limit(limit).to_list(limit)
+        return [
+            {
+                "submission_id": item["submission_id"],
+                "user_id": item["user_id"],
+                "old_status": item["old_status"],
+                "new_status": item["new_status"],
+                "xp_delta": item["xp_delta"],
+            }
+            for item in items
+        ]
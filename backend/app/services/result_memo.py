@@ -0,0 +1,125 @@
+"""
+Test Result Memo
+Reuse stored test_results for submissions whose normalized source was
+already judged against the same version of a task's test suite
+"""
+
+import ast
+import hashlib
+import json
+from datetime import datetime
+from typing import Optional
+from app.judge import get_runner, normalize_test_cases
+
+RESULTS_COLLECTION = "judge_results"
+
+# Outcomes that depend on host load rather than on the code
+UNSTABLE_STATUSES = ("timeout", "cpu_limit")
+
+
+def _normalize_text(code: str) -> str:
+    """Unify line endings and drop trailing whitespace and blank edges"""
+    lines = [line.rstrip() for line in code.replace("\r\n", "\n").replace("\r", "\n").split("\n")]
+    return "\n".join(lines).strip("\n")
+
+
+def canonical_language(language: str) -> str:
+    """Runner language for an alias (``py`` -> ``python``), else lowercased"""
+    try:
+        return get_runner(language).language
+    except ValueError:
+        return (language or "").lower()
+
+
+def normalize_source(code: str, language: str) -> str:
+    """
+    Canonical form of a submission for memoization
+
+    Python is compared by AST, so formatting and comments do not matter;
+    code that does not parse (and other languages) is compared as text
+    with whitespace-only differences removed.
+    """
+    if canonical_language(language) == "python":
+        try:
+            return ast.dump(ast.parse(code))
+        except (SyntaxError, ValueError):
+            pass
+    return _normalize_text(code)
+
+
+def suite_version(test_cases, limits) -> str:
+    """
+    Version of a task's test suite: its explicit ``version`` when set,
+    otherwise a hash of the cases. The judge limits are included since
+    they change results too.
+    """
+    explicit = test_cases.get("version") if isinstance(test_cases, dict) else None
+    payload = {
+        "cases": explicit if explicit is not None else normalize_test_cases(test_cases),
+        "limits": [limits.cpu_seconds, limits.wall_seconds, limits.memory_mb, limits.output_bytes],
+    }
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+def result_key(task_id: str, language: str, code: str, version: str) -> str:
+    """Hash of (task, language, normalized source, test-suite version)"""
+    payload = [task_id, canonical_language(language), normalize_source(code, language), version]
+    encoded = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def is_memoizable(test_results: dict) -> bool:
+    """Only results that would come out the same on a rerun are stored"""
+    if test_results.get("error"):
+        return False
+    return all(case["status"] not in UNSTABLE_STATUSES for case in test_results.get("test_cases", []))
+
+
+class ResultMemo:
+    """MongoDB-backed test_results memo with hit/miss counters"""
+
+    def __init__(self):
+        self.stats = {"hits": 0, "misses": 0, "stores": 0}
+
+    async def get(self, db, key: str) -> Optional[dict]:
+        doc = await db[RESULTS_COLLECTION].find_one_and_update(
+            {"_id": key},
+            {"$inc": {"hits": 1}},
+            projection={"test_results": 1}
+        )
+        if doc is None:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        return doc["test_results"]
+
+    async def set(self, db, key: str, task_id: str, language: str, version: str, test_results: dict):
+        if not is_memoizable(test_results):
+            return
+        self.stats["stores"] += 1
+        await db[RESULTS_COLLECTION].update_one(
+            {"_id": key},
+            {
+                "$set": {
+                    "task_id": task_id,
+                    "language": canonical_language(language),
+                    "suite_version": version,
+                    "test_results": test_results,
+                    "created_at": datetime.utcnow(),
+                },
+                "$setOnInsert": {"hits": 0},
+            },
+            upsert=True
+        )
+
+    async def invalidate_task(self, db, task_id: str, keep_version: Optional[str] = None) -> int:
+        """Drop a task's stored results (except ``keep_version``'s)"""
+        query = {"task_id": task_id}
+        if keep_version is not None:
+            query["suite_version"] = {"$ne": keep_version}
+        result = await db[RESULTS_COLLECTION].delete_many(query)
+        return result.deleted_count
+
+
+result_memo = ResultMemo()
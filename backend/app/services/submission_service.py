@@ -1,6 +1,17 @@
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from bson import ObjectId
 from datetime import datetime
+from typing import Optional
+from app.services.xp_ledger import xp_ledger
+from app.judge import judge_engine
+from app.services.judge_queue import JudgeQueue, LeaseLost, format_job
+from app.services.result_memo import result_memo, result_key, suite_version
+
+# XP for a submission that passes every test case
+SUBMISSION_XP = 50
+
+# Conditional result writes tried before giving up on a contended submission
+RESULT_WRITE_ATTEMPTS = 3
 
 class SubmissionService:
     def __init__(self, db: AsyncIOMotorDatabase):
@@ -8,6 +19,7 @@ class SubmissionService:
         self.submissions_collection = db["submissions"]
         self.users_collection = db["users"]
         self.tasks_collection = db["tasks"]
+        self.queue = JudgeQueue(db)
 
     async def create_submission(self, user_id: str, task_id: str, code: str, language: str) -> dict:
         """Create code submission"""
@@ -26,7 +38,11 @@ class SubmissionService:
             }
             
             result = await self.submissions_collection.insert_one(submission)
-            return {"submission_id": str(result.inserted_id), "status": "pending"}
+            submission_id = str(result.inserted_id)
+            
+            # Evaluated out of process by the judge workers
+            job = await self.queue.enqueue(submission_id, user_id)
+            return {"submission_id": submission_id, "status": "pending", "job_id": str(job["_id"])}
         except Exception as e:
             raise ValueError(f"Error creating submission: {str(e)}")
 
@@ -59,8 +75,51 @@ class SubmissionService:
         except Exception as e:
             raise ValueError(f"Error fetching submissions: {str(e)}")
 
-    async def evaluate_submission(self, submission_id: str) -> dict:
-        """Evaluate submission and run tests"""
+    async def request_evaluation(self, submission_id: str) -> dict:
+        """Queue a submission for judging; already-judged ones go to the re-run lane"""
+        try:
+            submission = await self.submissions_collection.find_one(
+                {"_id": ObjectId(submission_id)},
+                {"user_id": 1, "status": 1}
+            )
+            
+            if not submission:
+                raise ValueError("Submission not found")
+            
+            lane = "first_attempt" if submission["status"] == "pending" else "rerun"
+            job = await self.queue.enqueue(submission_id, submission["user_id"], lane=lane)
+            return {"submission_id": submission_id, "status": "queued", "job": format_job(job)}
+        except Exception as e:
+            raise ValueError(f"Error queueing submission: {str(e)}")
+
+    async def get_evaluation_status(self, submission_id: str) -> dict:
+        """Poll a submission's judge job and, once judged, its results"""
+        try:
+            submission = await self.get_submission(submission_id)
+            job = await self.queue.get_job(submission_id)
+            
+            status = {
+                "submission_id": submission_id,
+                "status": submission["status"],
+                "job": format_job(job),
+            }
+            if job and job["status"] == "queued":
+                status["queue_position"] = await self.queue.position(job)
+            if job and job["status"] == "done":
+                status["test_results"] = submission["test_results"]
+                status["xp_awarded"] = submission["xp_awarded"]
+            return status
+        except Exception as e:
+            raise ValueError(f"Error fetching evaluation status: {str(e)}")
+
+    async def evaluate_submission(self, submission_id: str, job: Optional[dict] = None) -> dict:
+        """
+        Evaluate submission and run tests (called by the judge workers)
+        
+        The result is only written while ``job``'s lease is still held,
+        and only over the submission state XP was computed against, so
+        overlapping evaluations cannot grant the same XP twice.
+        """
         try:
             submission = await self.submissions_collection.find_one({
                 "_id": ObjectId(submission_id)
@@ -69,55 +128,87 @@ class SubmissionService:
             if not submission:
                 raise ValueError("Submission not found")
             
-            # Run code validation (mock for now)
-            test_results = self._run_tests(submission["code"], submission["language"])
-            
-            status = "passed" if test_results.get("all_passed") else "failed"
-            xp_awarded = 50 if status == "passed" else 0
+            result = await self.judge(submission)
             
-            # Update submission
-            await self.submissions_collection.update_one(
-                {"_id": ObjectId(submission_id)},
-                {"$set": {
-                    "status": status,
-                    "test_results": test_results,
-                    "xp_awarded": xp_awarded,
-                    "updated_at": datetime.utcnow()
-                }}
-            )
+            for _ in range(RESULT_WRITE_ATTEMPTS):
+                if job is not None and not await self.queue.heartbeat(job):
+                    raise LeaseLost(f"Lost the judge job for submission {submission_id}")
+                
+                # Update submission, unless another evaluation got there first
+                old_xp = submission.get("xp_awarded")
+                update = await self.submissions_collection.update_one(
+                    {"_id": ObjectId(submission_id), "xp_awarded": old_xp},
+                    {"$set": {
+                        **result,
+                        "updated_at": datetime.utcnow()
+                    }}
+                )
+                if update.modified_count == 1:
+                    break
+                submission = await self.submissions_collection.find_one(
+                    {"_id": ObjectId(submission_id)},
+                    {"user_id": 1, "xp_awarded": 1}
+                )
+                if not submission:
+                    raise ValueError("Submission not found")
+            else:
+                raise ValueError("Submission kept changing while its result was saved")
             
-            # Award XP if passed
-            if status == "passed" and xp_awarded > 0:
-                await self.users_collection.update_one(
-                    {"_id": ObjectId(submission["user_id"])},
-                    {"$inc": {"total_xp": xp_awarded}}
+            # Award XP; a re-evaluation only grants (or takes back) the difference
+            xp_delta = result["xp_awarded"] - (old_xp or 0)
+            if xp_delta:
+                await xp_ledger.grant(
+                    self.db,
+                    ObjectId(submission["user_id"]),
+                    xp_delta,
+                    "submission",
+                    ref=submission_id
                 )
             
-            return {
-                "status": status,
-                "test_results": test_results,
-                "xp_awarded": xp_awarded
-            }
+            return result
+        except LeaseLost:
+            raise
         except Exception as e:
             raise ValueError(f"Error evaluating submission: {str(e)}")
 
-    def _run_tests(self, code: str, language: str) -> dict:
-        """Run tests on code (mock implementation)"""
-        # Mock test results
+    async def judge(self, submission: dict) -> dict:
+        """Run a submission's tests in the sandbox without saving anything"""
+        test_cases = await self._get_test_cases(submission["task_id"])
+        test_results = await self._run_tests(
+            submission["code"],
+            submission["language"],
+            test_cases,
+            task_id=submission["task_id"]
+        )
+        
+        status = "passed" if test_results.get("all_passed") else "failed"
         return {
-            "total_tests": 5,
-            "passed": 5,
-            "failed": 0,
-            "all_passed": True,
-            "test_cases": [
-                {"name": "Test 1", "status": "passed"},
-                {"name": "Test 2", "status": "passed"},
-                {"name": "Test 3", "status": "passed"},
-                {"name": "Test 4", "status": "passed"},
-                {"name": "Test 5", "status": "passed"},
-            ]
+            "status": status,
+            "test_results": test_results,
+            "xp_awarded": SUBMISSION_XP if status == "passed" else 0
         }
 
+    async def _get_test_cases(self, task_id: str):
+        """Load a task's test cases (None when the task has none)"""
+        task_key = ObjectId(task_id) if ObjectId.is_valid(task_id) else task_id
+        task = await self.tasks_collection.find_one({"_id": task_key}, {"test_cases": 1})
+        return (task or {}).get("test_cases")
+
+    async def _run_tests(self, code: str, language: str, test_cases=None, task_id: str = None) -> dict:
+        """
+        Run code against the test cases in isolated subprocesses, reusing
+        stored results for source already judged on this test-suite version
+        """
+        version = suite_version(test_cases, judge_engine.limits)
+        key = result_key(task_id, language, code, version)
+        cached = await result_memo.get(self.db, key)
+        if cached is not None:
+            return {**cached, "cached": True}
+        
+        test_results = await judge_engine.run(code, language, test_cases)
+        await result_memo.set(self.db, key, task_id, language, version, test_results)
+        return test_results
+
     def _format_submission(self, submission: dict) -> dict:
         """Format submission response"""
         return {
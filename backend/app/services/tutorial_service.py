@@ -1,4 +1,6 @@
 from datetime import datetime
+from app.services.quest_catalog import content_version
+from app.services.xp_ledger import xp_ledger
 
 class TutorialService:
     """Manage tutorials and learning"""
@@ -535,8 +537,22 @@ git branch -d feature/new-feature
         }
     ]
     
-    async def get_all_tutorials(self):
-        """Get all tutorials"""
+    # ETag version of the tutorial content
+    TUTORIALS_VERSION = content_version(TUTORIALS)
+    
+    # Listing view: no lesson content, code example or quiz
+    TUTORIAL_SUMMARIES = [
+        {
+            **{field: tut[field] for field in ("id", "title", "description", "difficulty", "xp_reward", "order")},
+            "quiz_questions": len(tut["quiz"])
+        }
+        for tut in TUTORIALS
+    ]
+    
+    async def get_all_tutorials(self, fields: str = "full"):
+        """Get all tutorials (``fields="summary"`` for the listing view)"""
+        if fields == "summary":
+            return self.TUTORIAL_SUMMARIES
         return self.TUTORIALS
     
     async def get_tutorial(self, tutorial_id: str):
@@ -583,14 +599,14 @@ git branch -d feature/new-feature
             await db["tutorial_progress"].insert_one(progress)
             
             # Update user XP
-            await db["users"].update_one(
-                {"_id": user_id},
-                {"$inc": {"total_xp": xp_earned}}
+            user_total_xp = await xp_ledger.grant(
+                db, user_id, xp_earned, "tutorial", ref=tutorial_id
             )
             
             return {
                 "success": True,
                 "xp_earned": xp_earned,
+                "user_total_xp": user_total_xp,
                 "message": "Tutorial completed!",
                 "quiz_score": quiz_score
             }
@@ -2,6 +2,7 @@ from motor.motor_asyncio import AsyncIOMotorDatabase
 from bson import ObjectId
 from datetime import datetime
 from app.utils.json_encoder import convert_objectid
+from app.services.xp_ledger import xp_ledger
 
 class UserService:
     def __init__(self, db: AsyncIOMotorDatabase):
@@ -77,16 +78,9 @@ class UserService:
     async def add_xp(self, user_id: str, xp: int) -> dict:
         """Add XP to user"""
         try:
-            user = await self.users_collection.find_one({"_id": ObjectId(user_id)})
-            new_xp = user.get("total_xp", 0) + xp
-            
-            await self.users_collection.update_one(
-                {"_id": ObjectId(user_id)},
-                {"$set": {
-                    "total_xp": new_xp,
-                    "updated_at": datetime.utcnow()
-                }}
-            )
+            new_xp = await xp_ledger.grant(self.db, ObjectId(user_id), xp, "manual")
+            if new_xp is None:
+                raise ValueError("User not found")
             
             return {"xp_added": xp, "total_xp": new_xp}
         except Exception as e:
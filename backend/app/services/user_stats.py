@@ -0,0 +1,287 @@
+"""
+User Stats Snapshot
+Materialized per-user gamification profile (XP, level, badges, quest and
+task counts, streaks) kept current by every write path, so profile reads
+are one find_one; rebuilt from the source collections to repair drift
+"""
+
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+from app.core.config import settings
+from app.utils.activity_bitmap import ActivityBitmap, BITS_FIELD
+from app.utils.level_system import level_curve, get_level_from_xp
+
+STATS_COLLECTION = "user_stats"
+
+# Counters compared by the reconciliation job
+SNAPSHOT_FIELDS = (
+    "username", "total_xp", "level", "badge_ids", "quests_started", "quests_completed",
+    "tasks_completed", "current_streak", "longest_streak", "code_submissions",
+)
+
+# Ledger batch ids remembered per snapshot (as on users, see xp_ledger)
+XP_BATCH_HISTORY = 20
+
+# The app's level curve, evaluated server-side
+LEVEL_EXPRESSION = level_curve.mongo_expression("$total_xp")
+
+
+def _id_forms(user_id) -> list:
+    """A user id as stored across collections: string and, if valid, ObjectId"""
+    forms = [str(user_id)]
+    if ObjectId.is_valid(str(user_id)):
+        forms.append(ObjectId(str(user_id)))
+    return forms
+
+
+def _xp_update(amount: int, now: datetime, batch_id: Optional[str] = None) -> list:
+    update = {
+        "total_xp": {"$add": [{"$ifNull": ["$total_xp", 0]}, amount]},
+        "updated_at": now
+    }
+    if batch_id:
+        update["xp_batches"] = {"$slice": [
+            {"$concatArrays": [{"$ifNull": ["$xp_batches", []]}, [batch_id]]},
+            -XP_BATCH_HISTORY
+        ]}
+    return [{"$set": update}, {"$set": {"level": LEVEL_EXPRESSION}}]
+
+
+class UserStatsService:
+    """
+    Read, incrementally update and rebuild ``user_stats`` snapshots
+
+    Snapshots can also be kept in a process-local LRU; that is only
+    enabled while cache sync is running, since other workers' writes
+    reach it through the change feed.
+    """
+
+    def __init__(self, cache_size: int = settings.USER_STATS_CACHE_SIZE):
+        self.cache_size = cache_size
+        self.cache_enabled = False
+        self._cache = OrderedDict()
+        self.stats = {"reads": 0, "cache_hits": 0, "rebuilds": 0}
+
+    # ---- local cache ----
+
+    def enable_cache(self, enabled: bool = True):
+        self.cache_enabled = enabled
+        self._cache.clear()
+
+    def _remember(self, snapshot: dict):
+        if not self.cache_enabled:
+            return
+        self._cache[snapshot["_id"]] = snapshot
+        self._cache.move_to_end(snapshot["_id"])
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def invalidate(self, user_id):
+        self._cache.pop(str(user_id), None)
+
+    def patch(self, snapshot: dict):
+        """Replace a cached snapshot with a newer copy (uncached users are left out)"""
+        if snapshot["_id"] in self._cache:
+            self._cache[snapshot["_id"]] = snapshot
+
+    def clear_cache(self):
+        self._cache.clear()
+
+    # ---- reads ----
+
+    async def get(self, db: AsyncIOMotorDatabase, user_id) -> Optional[dict]:
+        """Snapshot for a user, built from the sources on first use"""
+        self.stats["reads"] += 1
+        snapshot = self._cache.get(str(user_id))
+        if snapshot is not None:
+            self._cache.move_to_end(str(user_id))
+            self.stats["cache_hits"] += 1
+            return snapshot
+        snapshot = await db[STATS_COLLECTION].find_one({"_id": str(user_id)})
+        if snapshot is None:
+            snapshot = await self.build(db, user_id)
+        if snapshot is not None:
+            self._remember(snapshot)
+        return snapshot
+
+    async def get_by_username(self, db: AsyncIOMotorDatabase, username: str) -> Optional[dict]:
+        self.stats["reads"] += 1
+        snapshot = await db[STATS_COLLECTION].find_one({"username": username})
+        if snapshot is None:
+            user = await db["users"].find_one({"username": username}, {"_id": 1})
+            if user:
+                snapshot = await self.build(db, user["_id"])
+        return snapshot
+
+    # ---- incremental updates (called by the write paths) ----
+
+    # Updates only touch existing snapshots: a missing one is built from
+    # the sources on first read, which already include the change
+
+    async def _update(self, db: AsyncIOMotorDatabase, user_id, update: dict):
+        update.setdefault("$set", {})["updated_at"] = datetime.utcnow()
+        self.invalidate(user_id)
+        await db[STATS_COLLECTION].update_one({"_id": str(user_id)}, update)
+
+    async def apply_xp(self, db: AsyncIOMotorDatabase, amounts: list, batch_id: Optional[str] = None):
+        """
+        Fold flushed XP grants in; ``amounts`` holds user_id/amount dicts
+
+        Snapshots built from ``users`` after the ledger batch ``batch_id``
+        was written already include it (they copy the user's batch ids)
+        and are skipped.
+        """
+        if not amounts:
+            return
+        now = datetime.utcnow()
+        for item in amounts:
+            self.invalidate(item["user_id"])
+        counted = {"xp_batches": {"$ne": batch_id}} if batch_id else {}
+        await db[STATS_COLLECTION].bulk_write(
+            [
+                UpdateOne({"_id": str(item["user_id"]), **counted}, _xp_update(item["amount"], now, batch_id))
+                for item in amounts
+            ],
+            ordered=False
+        )
+
+    async def badges_awarded(self, db: AsyncIOMotorDatabase, user_id, badge_ids: list):
+        if badge_ids:
+            await self._update(db, user_id, {"$addToSet": {"badge_ids": {"$each": badge_ids}}})
+
+    async def quest_started(self, db: AsyncIOMotorDatabase, user_id):
+        await self._update(db, user_id, {"$inc": {"quests_started": 1}})
+
+    async def task_completed(self, db: AsyncIOMotorDatabase, user_id, quest_completed: bool):
+        inc = {"tasks_completed": 1}
+        if quest_completed:
+            inc["quests_completed"] = 1
+        await self._update(db, user_id, {"$inc": inc})
+
+    async def streak_updated(self, db: AsyncIOMotorDatabase, user_id, current: int, longest: int, last_activity: datetime):
+        await self._update(db, user_id, {"$set": {
+            "current_streak": current,
+            "longest_streak": longest,
+            "last_activity": last_activity,
+        }})
+
+    async def submission_recorded(self, db: AsyncIOMotorDatabase, user_id):
+        await self._update(db, user_id, {"$inc": {"code_submissions": 1}})
+
+    # ---- reconciliation ----
+
+    async def compute(self, db: AsyncIOMotorDatabase, user_id) -> Optional[dict]:
+        """Snapshot computed from the source collections (None if no such user)"""
+        ids = {"$in": _id_forms(user_id)}
+        user = await db["users"].find_one({"_id": ids}, {"username": 1, "total_xp": 1, "created_at": 1, "xp_batches": 1})
+        if not user:
+            return None
+
+        badge_ids = await db["user_badges"].distinct("badge_id", {"user_id": ids})
+        quest_counts = await db["user_quest_progress"].aggregate([
+            {"$match": {"user_id": ids}},
+            {"$group": {
+                "_id": None,
+                "started": {"$sum": 1},
+                "completed": {"$sum": {"$cond": [{"$eq": ["$status", "completed"]}, 1, 0]}},
+                "tasks": {"$sum": {"$size": {"$filter": {
+                    "input": {"$objectToArray": {"$ifNull": ["$task_progress", {}]}},
+                    "cond": {"$eq": ["$$this.v.status", "completed"]}
+                }}}}
+            }}
+        ]).to_list(1)
+        quests = quest_counts[0] if quest_counts else {"started": 0, "completed": 0, "tasks": 0}
+        streak = await db["user_streaks"].find_one({"user_id": ids}) or {}
+        submissions = await db["code_submissions"].count_documents({"user_id": ids})
+        if streak.get(BITS_FIELD) is not None:
+            # The bitmap is authoritative; stored counters lag behind missed days
+            activity = ActivityBitmap.from_document(streak)
+            streak = {
+                **streak,
+                "current_streak": activity.current_streak(),
+                "longest_streak": max(activity.longest_streak(), streak.get("longest_streak", 0)),
+            }
+
+        total_xp = user.get("total_xp", 0)
+        return {
+            "_id": str(user_id),
+            "username": user.get("username"),
+            "created_at": user.get("created_at"),
+            "total_xp": total_xp,
+            "level": get_level_from_xp(total_xp),
+            "badge_ids": sorted(badge_ids),
+            "quests_started": quests["started"],
+            "quests_completed": quests["completed"],
+            "tasks_completed": quests["tasks"],
+            "current_streak": streak.get("current_streak", 0),
+            "longest_streak": streak.get("longest_streak", 0),
+            "last_activity": streak.get("last_activity"),
+            "code_submissions": submissions,
+            # Ledger batches already included in total_xp
+            "xp_batches": user.get("xp_batches", []),
+            "updated_at": datetime.utcnow(),
+        }
+
+    async def build(self, db: AsyncIOMotorDatabase, user_id) -> Optional[dict]:
+        """
+        Create a missing snapshot from the sources
+
+        Only inserts: a snapshot created (and possibly updated by the
+        incremental writers) since the first read is kept, and the stored
+        one is returned either way.
+        """
+        snapshot = await self.compute(db, user_id)
+        if snapshot is None:
+            return None
+        try:
+            await db[STATS_COLLECTION].insert_one(snapshot)
+            self.stats["rebuilds"] += 1
+        except DuplicateKeyError:
+            pass
+        return await db[STATS_COLLECTION].find_one({"_id": snapshot["_id"]})
+
+    async def rebuild(self, db: AsyncIOMotorDatabase, user_id) -> Optional[dict]:
+        """
+        Replace a user's snapshot with one computed from the sources (repair
+        only: it overwrites incremental updates that land while it runs)
+        """
+        snapshot = await self.compute(db, user_id)
+        if snapshot is None:
+            return None
+        self.stats["rebuilds"] += 1
+        self.invalidate(snapshot["_id"])
+        await db[STATS_COLLECTION].replace_one({"_id": snapshot["_id"]}, snapshot, upsert=True)
+        return snapshot
+
+    async def reconcile(self, db: AsyncIOMotorDatabase, fix: bool = True) -> dict:
+        """
+        Recompute every user's snapshot and report (and by default repair)
+        the ones that drifted from the source collections
+        """
+        report = {"users": 0, "drifted": 0, "fields": {}}
+        async for user in db["users"].find({}, {"_id": 1}):
+            report["users"] += 1
+            expected = await self.compute(db, user["_id"])
+            current = await db[STATS_COLLECTION].find_one({"_id": expected["_id"]}) or {}
+            drifted = [
+                field for field in SNAPSHOT_FIELDS
+                if (sorted(current.get(field) or []) if field == "badge_ids" else current.get(field)) != expected[field]
+            ]
+            if not drifted:
+                continue
+            report["drifted"] += 1
+            for field in drifted:
+                report["fields"][field] = report["fields"].get(field, 0) + 1
+            if fix:
+                self.invalidate(expected["_id"])
+                await db[STATS_COLLECTION].replace_one({"_id": expected["_id"]}, expected, upsert=True)
+                self.stats["rebuilds"] += 1
+        return report
+
+
+user_stats = UserStatsService()
@@ -4,6 +4,7 @@ Manages the complete user journey through the platform
 """
 
 from datetime import datetime
+from app.services.user_stats import user_stats
 
 class WorkflowService:
     """Manage user workflow through quests and tasks"""
@@ -24,8 +25,8 @@ class WorkflowService:
     async def get_user_workflow_state(self, db, user_id: str) -> dict:
         """Get user's current workflow state"""
         try:
-            # Get user
-            user = await db["users"].find_one({"_id": user_id})
+            # Get user profile
+            user = await user_stats.get(db, user_id)
             if not user:
                 return {
                     "success": False,
@@ -71,7 +72,7 @@ class WorkflowService:
                 "state": current_state,
                 "user": {
                     "total_xp": user.get("total_xp", 0),
-                    "level": (user.get("total_xp", 0) // 1000) + 1
+                    "level": user.get("level", 1)
                 },
                 "quest_progress": quest_progress,
                 "current_task": current_task,
@@ -199,6 +200,7 @@ class WorkflowService:
             }
             
             result = await db["code_submissions"].insert_one(submission)
+            await user_stats.submission_recorded(db, user_id)
             
             # Update workflow
             await db["user_workflows"].update_one(
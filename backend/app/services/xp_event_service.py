@@ -0,0 +1,179 @@
+"""
+XP Event Service
+Append-only XP ledger with incrementally maintained weekly/monthly totals
+"""
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from datetime import datetime
+from typing import Optional
+
+# Leaderboard windows backed by pre-aggregated buckets
+WINDOWS = ("weekly", "monthly")
+
+# Ledger batch ids remembered per bucket (see xp_ledger.XP_BATCH_HISTORY)
+BATCH_HISTORY = 20
+
+# Duplicate key error code
+DUPLICATE_KEY = 11000
+
+
+def _raise_unless_duplicates(error: BulkWriteError):
+    """Re-raise a bulk write error unless every failure is an already-applied duplicate"""
+    if error.details.get("writeConcernErrors") or any(
+        e["code"] != DUPLICATE_KEY for e in error.details.get("writeErrors", [])
+    ):
+        raise error
+
+
+def window_periods(at: datetime) -> dict:
+    """Bucket keys for every window containing ``at`` (ISO week, calendar month)"""
+    iso_year, iso_week, _ = at.isocalendar()
+    return {
+        "weekly": f"{iso_year}-W{iso_week:02d}",
+        "monthly": f"{at.year}-{at.month:02d}",
+    }
+
+
+class XpEventService:
+    """Record XP grants and answer windowed leaderboards"""
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+        self.events_collection = db["xp_events"]
+        self.windows_collection = db["xp_windows"]
+
+    async def record_many(self, grants: list, batch_id: Optional[str] = None) -> int:
+        """
+        Append a batch of XP events and fold them into the window buckets
+
+        With a ``batch_id`` (and an ``event_id`` per grant) the call can be
+        repeated after a failure: events already stored and buckets that
+        already counted the batch are left alone.
+
+        Args:
+            grants: Dicts with user_id, amount, source, ref, at, optional
+                event_id and the user ``profile`` (username, avatar_url,
+                level) at grant time
+            batch_id: Identifier of the ledger flush the grants belong to
+
+        Returns:
+            Number of events in the batch
+        """
+        if not grants:
+            return 0
+
+        events = []
+        buckets = {}
+        for grant in grants:
+            user_id = str(grant["user_id"])
+            periods = window_periods(grant["at"])
+            event = {
+                "user_id": user_id,
+                "amount": grant["amount"],
+                "source": grant["source"],
+                "ref": grant.get("ref"),
+                "periods": periods,
+                "created_at": grant["at"],
+            }
+            if grant.get("event_id") is not None:
+                event["_id"] = grant["event_id"]
+            events.append(event)
+
+            profile = grant.get("profile") or {}
+            for window, period in periods.items():
+                bucket = buckets.setdefault((window, period, user_id), {"xp": 0})
+                bucket["xp"] += grant["amount"]
+                bucket["profile"] = profile
+                bucket["at"] = grant["at"]
+
+        try:
+            await self.events_collection.insert_many(events, ordered=False)
+        except BulkWriteError as e:
+            _raise_unless_duplicates(e)
+
+        # A bucket that already has the batch doesn't match; its upsert then
+        # hits the unique bucket index, which means "already counted"
+        counted = {"batches": {"$ne": batch_id}} if batch_id else {}
+        try:
+            await self.windows_collection.bulk_write(
+                [
+                    UpdateOne(
+                        {"window": window, "period": period, "user_id": user_id, **counted},
+                        {
+                            "$inc": {"xp": bucket["xp"]},
+                            "$set": {
+                                "username": bucket["profile"].get("username"),
+                                "avatar_url": bucket["profile"].get("avatar_url"),
+                                "level": bucket["profile"].get("level", 1),
+                                "updated_at": bucket["at"],
+                            },
+                            **({"$push": {"batches": {"$each": [batch_id], "$slice": -BATCH_HISTORY}}} if batch_id else {}),
+                        },
+                        upsert=True
+                    )
+                    for (window, period, user_id), bucket in buckets.items()
+                ],
+                ordered=False
+            )
+        except BulkWriteError as e:
+            _raise_unless_duplicates(e)
+
+        return len(events)
+
+    async def get_window_leaderboard(
+        self,
+        window: str,
+        limit: int = 50,
+        at: Optional[datetime] = None
+    ) -> list:
+        """Top users by XP earned in the current week or month"""
+        if window not in WINDOWS:
+            raise ValueError(f"Unknown leaderboard window: {window}")
+
+        period = window_periods(at or datetime.utcnow())[window]
+        buckets = await self.windows_collection.find(
+            {"window": window, "period": period}
+        ).sort("xp", -1).limit(limit).to_list(limit)
+
+        return [
+            {
+                "rank": idx + 1,
+                "_id": bucket["user_id"],
+                "username": bucket.get("username"),
+                "level": bucket.get("level", 1),
+                "total_xp": bucket.get("xp", 0),
+                "avatar_url": bucket.get("avatar_url"),
+                "period": period,
+            }
+            for idx, bucket in enumerate(buckets)
+        ]
+
+    async def get_window_rank(
+        self,
+        user_id: str,
+        window: str,
+        at: Optional[datetime] = None
+    ) -> dict:
+        """A user's rank by XP earned in the current week or month"""
+        if window not in WINDOWS:
+            raise ValueError(f"Unknown leaderboard window: {window}")
+
+        period = window_periods(at or datetime.utcnow())[window]
+        bucket = await self.windows_collection.find_one(
+            {"window": window, "period": period, "user_id": user_id}
+        )
+        xp = bucket.get("xp", 0) if bucket else 0
+
+        ahead = await self.windows_collection.count_documents(
+            {"window": window, "period": period, "xp": {"$gt": xp}}
+        )
+
+        return {
+            "user_id": user_id,
+            "rank": ahead + 1,
+            "username": bucket.get("username") if bucket else None,
+            "total_xp": xp,
+            "period": period,
+        }
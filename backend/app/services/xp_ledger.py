@@ -0,0 +1,256 @@
+"""
+XP Ledger
+Single entry point for XP grants. Grants are queued, coalesced per user
+and flushed to MongoDB in bulk on a short interval or size threshold.
+"""
+
+import asyncio
+from datetime import datetime
+from typing import Optional
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from bson import ObjectId
+from pymongo import UpdateOne
+from app.core.config import settings
+from app.services.leaderboard_service import leaderboard_index, LEADERBOARD_PROJECTION
+from app.services.user_stats import user_stats
+from app.services.xp_event_service import XpEventService
+
+# Batch ids remembered per user. Flushes are serialized and a batch whose
+# user write failed stops the flush, so it is retried before anything newer
+# reaches the users and a short history is enough
+XP_BATCH_HISTORY = 20
+
+
+class XpLedger:
+    """Write-coalescing XP grant queue"""
+
+    def __init__(
+        self,
+        flush_interval: float = settings.XP_LEDGER_FLUSH_INTERVAL,
+        max_batch: int = settings.XP_LEDGER_BATCH_SIZE
+    ):
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._db: Optional[AsyncIOMotorDatabase] = None
+        self._pending = []
+        # Flushed batches whose user or event writes have not gone through yet
+        self._unacked = []
+        # One flush at a time: overlapping ones would write the same batches
+        self._flush_lock = asyncio.Lock()
+        # Projected totals for users with unflushed grants
+        self._totals = {}
+        self._profiles = {}
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"grants": 0, "flushes": 0, "user_writes": 0}
+
+    def start(self, db: AsyncIOMotorDatabase):
+        """Start the background flush loop"""
+        self._db = db
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush loop and write out anything still queued"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"❌ Error flushing XP ledger: {e}")
+
+    def projected_total(self, user_id, default: int = 0) -> int:
+        """Total XP including grants that have not been flushed yet"""
+        return self._totals.get(str(user_id), default)
+
+    async def _load_profile(self, db: AsyncIOMotorDatabase, user_id) -> Optional[dict]:
+        entry = leaderboard_index.get(str(user_id))
+        if entry:
+            return {**entry, "_id": user_id, "is_active": True}
+        return await db["users"].find_one({"_id": user_id}, LEADERBOARD_PROJECTION)
+
+    async def grant(
+        self,
+        db: AsyncIOMotorDatabase,
+        user_id,
+        amount: int,
+        source: str,
+        ref: Optional[str] = None
+    ) -> Optional[int]:
+        """
+        Queue an XP grant
+
+        Args:
+            db: Database the grant is written to
+            user_id: Value of the user's ``_id`` (ObjectId or string)
+            amount: XP to add (negative for corrections)
+            source: Where the XP came from (quest_task, tutorial, submission, ...)
+            ref: Identifier of the thing that earned the XP
+
+        Returns:
+            Projected total XP after the grant, or None if the user does not exist
+        """
+        self._db = db
+        key = str(user_id)
+
+        if key not in self._totals:
+            profile = await self._load_profile(db, user_id)
+            if not profile:
+                return None
+            # Another grant may have loaded the user while we were waiting
+            if key not in self._totals:
+                self._totals[key] = profile.get("total_xp", 0)
+                self._profiles[key] = profile
+
+        total = self._queue(user_id, amount, source, ref)
+
+        if self._task is None or len(self._pending) >= self.max_batch:
+            await self.flush()
+
+        return total
+
+    def _queue(self, user_id, amount: int, source: str, ref: Optional[str]) -> int:
+        key = str(user_id)
+        total = self._totals[key] + amount
+        self._totals[key] = total
+        profile = {**self._profiles[key], "total_xp": total}
+        self._profiles[key] = profile
+        leaderboard_index.upsert(profile)
+
+        self._pending.append({
+            "event_id": ObjectId(),
+            "user_id": user_id,
+            "amount": amount,
+            "source": source,
+            "ref": ref,
+            "profile": profile,
+            "at": datetime.utcnow(),
+        })
+        self.stats["grants"] += 1
+        return total
+
+    async def grant_many(self, db: AsyncIOMotorDatabase, grants: list) -> int:
+        """
+        Queue many grants and write them with a single flush
+
+        Args:
+            db: Database the grants are written to
+            grants: Dicts with user_id, amount, source and optional ref
+
+        Returns:
+            Number of grants queued (grants for missing users are skipped)
+        """
+        self._db = db
+        missing = list({str(g["user_id"]): g["user_id"] for g in grants if str(g["user_id"]) not in self._totals}.values())
+        if missing:
+            async for profile in db["users"].find({"_id": {"$in": missing}}, LEADERBOARD_PROJECTION):
+                key = str(profile["_id"])
+                if key not in self._totals:
+                    self._totals[key] = profile.get("total_xp", 0)
+                    self._profiles[key] = profile
+
+        queued = 0
+        for grant in grants:
+            if str(grant["user_id"]) in self._totals:
+                self._queue(grant["user_id"], grant["amount"], grant["source"], grant.get("ref"))
+                queued += 1
+
+        await self.flush()
+        return queued
+
+    async def flush(self) -> int:
+        """
+        Write all queued grants; returns the number of grants flushed
+
+        Each flush is a batch with its own id, recorded on every user it
+        updated, so a batch whose write failed (wholly, partly, or with an
+        unknown outcome) is retried as is without adding any XP twice.
+        Callers that arrive while a flush is running wait for it, then
+        flush whatever was queued in the meantime.
+        """
+        async with self._flush_lock:
+            return await self._flush()
+
+    async def _flush(self) -> int:
+        if self._pending:
+            batch, self._pending = self._pending, []
+            self._unacked.append({"id": str(ObjectId()), "grants": batch, "users_written": False})
+        if not self._unacked:
+            return 0
+
+        db = self._db
+        flushed = 0
+        for batch in list(self._unacked):
+            if not batch["users_written"]:
+                per_user = await self._write_users(db, batch)
+                batch["users_written"] = True
+                flushed += len(batch["grants"])
+                self._release(per_user)
+
+                try:
+                    await user_stats.apply_xp(db, list(per_user.values()), batch_id=batch["id"])
+                except Exception as e:
+                    # The reconciliation job repairs the snapshot
+                    print(f"❌ Error updating user stats: {e}")
+
+            try:
+                await XpEventService(db).record_many(batch["grants"], batch_id=batch["id"])
+            except Exception as e:
+                # Kept until it goes through: the windows must match users.total_xp
+                print(f"❌ Error recording XP events (will retry): {e}")
+                continue
+            self._unacked.remove(batch)
+
+        return flushed
+
+    async def _write_users(self, db: AsyncIOMotorDatabase, batch: dict) -> dict:
+        per_user = {}
+        for grant in batch["grants"]:
+            key = str(grant["user_id"])
+            if key in per_user:
+                per_user[key]["amount"] += grant["amount"]
+            else:
+                per_user[key] = {"user_id": grant["user_id"], "amount": grant["amount"]}
+
+        # Users that already have this batch id took its XP on an earlier try
+        now = datetime.utcnow()
+        await db["users"].bulk_write(
+            [
+                UpdateOne(
+                    {"_id": item["user_id"], "xp_batches": {"$ne": batch["id"]}},
+                    {
+                        "$inc": {"total_xp": item["amount"]},
+                        "$set": {"updated_at": now},
+                        "$push": {"xp_batches": {"$each": [batch["id"]], "$slice": -XP_BATCH_HISTORY}},
+                    }
+                )
+                for item in per_user.values()
+            ],
+            ordered=False
+        )
+        self.stats["flushes"] += 1
+        self.stats["user_writes"] += len(per_user)
+        return per_user
+
+    def _release(self, per_user: dict):
+        """Drop projected totals that are fully written"""
+        still_pending = {str(g["user_id"]) for g in self._pending}
+        for batch in self._unacked:
+            if not batch["users_written"]:
+                still_pending.update(str(g["user_id"]) for g in batch["grants"])
+        for key in per_user:
+            if key not in still_pending:
+                self._totals.pop(key, None)
+                self._profiles.pop(key, None)
+
+
+xp_ledger = XpLedger()
@@ -13,6 +13,7 @@ from app.utils.streak_tracker import (
     increment_streak,
     reset_streak,
 )
+from app.utils.activity_bitmap import ActivityBitmap
 from app.utils.validators import (
     validate_email,
     validate_username,
@@ -29,6 +30,7 @@ __all__ = [
     "is_streak_alive",
     "increment_streak",
     "reset_streak",
+    "ActivityBitmap",
     "validate_email",
     "validate_username",
     "validate_password",
@@ -0,0 +1,159 @@
+"""
+Activity Bitmap - one bit per UTC day a user was active
+
+Bit ``i`` is the day ``origin + i``. The bitmap is a Python int while in
+use and little-endian bytes (BSON binary) when stored, so streaks, active
+day counts and heatmaps are shifts, masks and popcounts instead of scans
+over activity history.
+"""
+
+from datetime import date, datetime, timedelta
+from typing import Iterable, Optional
+
+# Document fields holding a stored bitmap
+ORIGIN_FIELD = "activity_origin"
+BITS_FIELD = "activity_bits"
+
+
+def _day(value) -> date:
+    return value.date() if isinstance(value, datetime) else value
+
+
+class ActivityBitmap:
+    """Per-day activity flags with bitwise streak and window queries"""
+
+    def __init__(self, origin: Optional[date] = None, bits: int = 0):
+        self.origin = _day(origin) if origin is not None else None
+        self.bits = bits if self.origin is not None else 0
+
+    # ---- storage ----
+
+    @classmethod
+    def from_bytes(cls, origin, data: Optional[bytes]) -> "ActivityBitmap":
+        if origin is None or not data:
+            return cls()
+        return cls(origin, int.from_bytes(bytes(data), "little"))
+
+    @classmethod
+    def from_document(cls, doc: Optional[dict]) -> "ActivityBitmap":
+        doc = doc or {}
+        return cls.from_bytes(doc.get(ORIGIN_FIELD), doc.get(BITS_FIELD))
+
+    @classmethod
+    def from_streak(cls, last_activity, current_streak: int) -> "ActivityBitmap":
+        """Bitmap for a legacy streak record: ``current_streak`` days ending at ``last_activity``"""
+        bitmap = cls()
+        if last_activity is not None and current_streak > 0:
+            last = _day(last_activity)
+            bitmap.origin = last - timedelta(days=current_streak - 1)
+            bitmap.bits = (1 << current_streak) - 1
+        return bitmap
+
+    def to_bytes(self) -> bytes:
+        return self.bits.to_bytes((self.bits.bit_length() + 7) // 8, "little")
+
+    def to_fields(self) -> dict:
+        """Fields to $set on the owning document"""
+        origin = datetime.combine(self.origin, datetime.min.time()) if self.origin else None
+        return {ORIGIN_FIELD: origin, BITS_FIELD: self.to_bytes()}
+
+    # ---- updates ----
+
+    def _index(self, day) -> int:
+        return (_day(day) - self.origin).days
+
+    def add(self, day) -> bool:
+        """Mark ``day`` active; False when it already was (nothing changed)"""
+        day = _day(day)
+        if self.origin is None:
+            self.origin, self.bits = day, 1
+            return True
+        index = self._index(day)
+        if index < 0:
+            # Earlier than anything recorded: move the origin back
+            self.bits <<= -index
+            self.origin, index = day, 0
+        if self.bits >> index & 1:
+            return False
+        self.bits |= 1 << index
+        return True
+
+    def add_many(self, days: Iterable) -> int:
+        """Mark several days active; returns how many were new"""
+        return sum(self.add(day) for day in days)
+
+    def merge(self, other: "ActivityBitmap") -> "ActivityBitmap":
+        """Union of two bitmaps"""
+        if other.origin is None:
+            return ActivityBitmap(self.origin, self.bits)
+        if self.origin is None:
+            return ActivityBitmap(other.origin, other.bits)
+        origin = min(self.origin, other.origin)
+        return ActivityBitmap(
+            origin,
+            (self.bits << (self.origin - origin).days) | (other.bits << (other.origin - origin).days)
+        )
+
+    # ---- queries ----
+
+    def is_active(self, day) -> bool:
+        if self.origin is None:
+            return False
+        index = self._index(day)
+        return index >= 0 and bool(self.bits >> index & 1)
+
+    @property
+    def last_active_day(self) -> Optional[date]:
+        if not self.bits:
+            return None
+        return self.origin + timedelta(days=self.bits.bit_length() - 1)
+
+    def streak_ending(self, day) -> int:
+        """Length of the run of active days ending at ``day`` (0 if inactive)"""
+        if self.origin is None:
+            return 0
+        index = self._index(day)
+        if index < 0:
+            return 0
+        # Highest inactive day at or before ``day`` ends the run
+        gaps = ~self.bits & ((1 << (index + 1)) - 1)
+        return index + 1 if not gaps else index - (gaps.bit_length() - 1)
+
+    def current_streak(self, today=None) -> int:
+        """Streak still alive on ``today``: ending today, or yesterday if today is not yet active"""
+        today = _day(today) if today is not None else datetime.utcnow().date()
+        return self.streak_ending(today) or self.streak_ending(today - timedelta(days=1))
+
+    def longest_streak(self) -> int:
+        """Longest run of active days (each AND with the shifted copy shortens every run by one)"""
+        bits, longest = self.bits, 0
+        while bits:
+            bits &= bits >> 1
+            longest += 1
+        return longest
+
+    def _window(self, start, end) -> int:
+        """Bits for ``start``..``end`` inclusive, bit 0 being ``start``"""
+        start, end = _day(start), _day(end)
+        if self.origin is None or end < start:
+            return 0
+        offset = self._index(start)
+        bits = self.bits >> offset if offset >= 0 else self.bits << -offset
+        return bits & ((1 << ((end - start).days + 1)) - 1)
+
+    def active_days(self, start, end) -> int:
+        """Number of active days in ``start``..``end`` inclusive"""
+        return self._window(start, end).bit_count()
+
+    def active_days_last(self, days: int, today=None) -> int:
+        """Active days among the last ``days`` days, today included"""
+        today = _day(today) if today is not None else datetime.utcnow().date()
+        return self.active_days(today - timedelta(days=days - 1), today)
+
+    def heatmap(self, start, end) -> list:
+        """One 0/1 flag per day in ``start``..``end`` inclusive"""
+        start, end = _day(start), _day(end)
+        if end < start:
+            return []
+        flags = format(self._window(start, end), "b").zfill((end - start).days + 1)
+        return [int(flag) for flag in reversed(flags)]
@@ -0,0 +1,77 @@
+"""
+Badge Engine - Evaluate only the badge rules affected by a stat change
+"""
+
+from bisect import bisect_right
+from typing import Iterable, Optional
+
+# Stats whose value is derived from another stat
+DEPENDENT_STATS = {
+    "total_xp": ("level",),
+}
+
+
+class BadgeRuleEngine:
+    """
+    Threshold badge rules indexed by the stat they depend on
+
+    Each stat keeps a sorted threshold array, so finding every badge a
+    value qualifies for is a single bisect. Callers pass the stats that
+    changed and only rules on those stats (and stats derived from them)
+    are looked at.
+    """
+
+    def __init__(self, rules: dict, dependents: dict = DEPENDENT_STATS):
+        """
+        Args:
+            rules: badge_id -> (stat, threshold)
+            dependents: stat -> stats derived from it
+        """
+        self.dependents = dependents
+        self._thresholds = {}
+        self._badge_ids = {}
+        for badge_id, (stat, threshold) in sorted(rules.items(), key=lambda rule: rule[1][1]):
+            self._thresholds.setdefault(stat, []).append(threshold)
+            self._badge_ids.setdefault(stat, []).append(badge_id)
+
+    @property
+    def stats(self) -> tuple:
+        """Every stat at least one rule depends on"""
+        return tuple(self._thresholds)
+
+    def affected_stats(self, changed: Optional[Iterable[str]] = None) -> set:
+        """Stats that need re-evaluating after ``changed`` stats moved"""
+        if changed is None:
+            return set(self._thresholds)
+
+        affected = set()
+        for stat in changed:
+            affected.add(stat)
+            affected.update(self.dependents.get(stat, ()))
+        return affected & set(self._thresholds)
+
+    def earned_for(self, stat: str, value) -> list:
+        """Badge ids whose threshold on ``stat`` is met by ``value``"""
+        thresholds = self._thresholds.get(stat)
+        if not thresholds:
+            return []
+        return self._badge_ids[stat][:bisect_right(thresholds, value)]
+
+    def evaluate(self, stats: dict, changed: Optional[Iterable[str]] = None) -> list:
+        """Badge ids met by ``stats``, considering only rules affected by ``changed``"""
+        affected = self.affected_stats(changed)
+        earned = []
+        for stat in self._thresholds:
+            if stat in affected and stat in stats:
+                earned.extend(self.earned_for(stat, stats[stat]))
+        return earned
+
+    def newly_earned(
+        self,
+        stats: dict,
+        previously_earned: Iterable[str],
+        changed: Optional[Iterable[str]] = None
+    ) -> list:
+        """Badge ids met by ``stats`` that are not already earned"""
+        previously_earned = set(previously_earned)
+        return [b for b in self.evaluate(stats, changed) if b not in previously_earned]
@@ -2,6 +2,9 @@
 Badge System - Track achievements
 """
 
+from app.utils.badge_engine import BadgeRuleEngine
+from app.utils.level_system import get_level_from_xp
+
 # All available badges in the system
 BADGES = {
     "first-steps": {
@@ -116,6 +119,13 @@ BADGES = {
 }
 
 
+# Rules indexed by the stat they depend on
+BADGE_ENGINE = BadgeRuleEngine({
+    badge_id: (badge["criteria"]["type"], badge["criteria"]["value"])
+    for badge_id, badge in BADGES.items()
+})
+
+
 def get_all_badges() -> dict:
     """Get all badges in system"""
     return BADGES
@@ -126,61 +136,38 @@ def get_badge_info(badge_id: str) -> dict:
     return BADGES.get(badge_id, None)
 
 
-def check_badges_earned(user: dict) -> list:
+def get_user_badge_stats(user: dict) -> dict:
+    """Map a user document onto the stats badge criteria are defined on"""
+    total_xp = user.get("total_xp", 0)
+    return {
+        "quest_count": user.get("quests_completed", 0),
+        "streak_days": user.get("current_streak", 0),
+        "total_xp": total_xp,
+        "level": get_level_from_xp(total_xp),
+    }
+
+
+def check_badges_earned(user: dict, changed: list = None) -> list:
     """
     Check which badges user has earned based on their stats
     
     Args:
         user: User document from database
+        changed: Stats that changed (quest_count, streak_days, total_xp,
+            level); only badges depending on them are checked. None
+            checks every badge.
     
     Returns:
         List of badge IDs earned
     """
-    earned = []
-    
-    for badge_id, badge_info in BADGES.items():
-        criteria = badge_info["criteria"]
-        met = False
-        
-        # Check quest count criteria
-        if criteria["type"] == "quest_count":
-            quests_completed = user.get("quests_completed", 0)
-            if quests_completed >= criteria["value"]:
-                met = True
-        
-        # Check streak days criteria
-        elif criteria["type"] == "streak_days":
-            current_streak = user.get("current_streak", 0)
-            if current_streak >= criteria["value"]:
-                met = True
-        
-        # Check total XP criteria
-        elif criteria["type"] == "total_xp":
-            total_xp = user.get("total_xp", 0)
-            if total_xp >= criteria["value"]:
-                met = True
-        
-        # Check level criteria
-        elif criteria["type"] == "level":
-            from app.utils.level_system import get_level_from_xp
-            user_level = get_level_from_xp(user.get("total_xp", 0))
-            if user_level >= criteria["value"]:
-                met = True
-        
-        # Add to earned if criteria met
-        if met:
-            earned.append(badge_id)
-    
-    return earned
+    return BADGE_ENGINE.evaluate(get_user_badge_stats(user), changed)
 
 
-def get_new_badges(user: dict, previously_earned: list) -> list:
+def get_new_badges(user: dict, previously_earned: list, changed: list = None) -> list:
     """
     Get newly earned badges since last check
     
     Returns:
         List of NEW badge IDs just earned
     """
-    currently_earned = check_badges_earned(user)
-    new_badges = [b for b in currently_earned if b not in previously_earned]
-    return new_badges
+    return BADGE_ENGINE.newly_earned(get_user_badge_stats(user), previously_earned, changed)
@@ -0,0 +1,102 @@
+"""
+Level Curve - XP thresholds for every level, precomputed once
+
+A curve is a cumulative threshold table: ``thresholds[i]`` is the total XP
+needed to reach level ``i + 1``. Lookups bisect it (O(log n)); batches go
+through NumPy's searchsorted when NumPy is installed.
+"""
+
+from bisect import bisect_right
+from typing import Iterable, Optional
+
+try:
+    import numpy as np
+except ImportError:  # batch lookups fall back to bisect per value
+    np = None
+
+
+class LevelCurve:
+    """Cumulative XP thresholds with single and batch level lookups"""
+
+    def __init__(self, thresholds: Iterable[int], name: str = "table"):
+        thresholds = [int(xp) for xp in thresholds]
+        if not thresholds or thresholds[0] != 0:
+            raise ValueError("Level thresholds must start at 0 XP")
+        if any(b <= a for a, b in zip(thresholds, thresholds[1:])):
+            raise ValueError("Level thresholds must be strictly increasing")
+        self.name = name
+        self.thresholds = thresholds
+        self.max_level = len(thresholds)
+        self._array = np.asarray(thresholds, dtype=np.int64) if np is not None else None
+
+    # ---- constructors ----
+
+    @classmethod
+    def linear(cls, xp_per_level: int, max_level: int) -> "LevelCurve":
+        """Same XP for every level"""
+        return cls((level * xp_per_level for level in range(max_level)), name="linear")
+
+    @classmethod
+    def table(cls, thresholds: Iterable[int]) -> "LevelCurve":
+        """Hand-tuned cumulative thresholds"""
+        return cls(thresholds, name="table")
+
+    @classmethod
+    def exponential(cls, base_xp: int, growth: float, max_level: int) -> "LevelCurve":
+        """Each level costs ``growth`` times the previous one, starting at ``base_xp``"""
+        thresholds = [0]
+        for level in range(1, max_level):
+            thresholds.append(thresholds[-1] + max(1, round(base_xp * growth ** (level - 1))))
+        return cls(thresholds, name="exponential")
+
+    # ---- lookups ----
+
+    def level_for(self, total_xp: int) -> int:
+        """Level reached with ``total_xp`` (at least 1, at most max_level)"""
+        return max(bisect_right(self.thresholds, total_xp), 1)
+
+    def levels_for(self, xp_values):
+        """
+        Levels for many XP totals in one call
+
+        Returns a NumPy array when NumPy is installed (and is given an
+        array or list), otherwise a list.
+        """
+        if self._array is not None:
+            levels = np.searchsorted(self._array, np.asarray(xp_values, dtype=np.int64), side="right")
+            return np.maximum(levels, 1)
+        return [self.level_for(xp) for xp in xp_values]
+
+    def xp_for_level(self, level: int) -> int:
+        """Total XP needed to reach ``level`` (clamped to the curve)"""
+        return self.thresholds[min(max(level, 1), self.max_level) - 1]
+
+    def next_level_xp(self, level: int) -> Optional[int]:
+        """Total XP needed for the level after ``level``; None at the cap"""
+        if level >= self.max_level:
+            return None
+        return self.thresholds[max(level, 1)]
+
+    def progress(self, total_xp: int) -> dict:
+        """Where ``total_xp`` sits within its level"""
+        level = self.level_for(total_xp)
+        start = self.xp_for_level(level)
+        end = self.next_level_xp(level)
+        needed = (end - start) if end is not None else 0
+        progress = total_xp - start
+        return {
+            "current_level": level,
+            "current_xp": total_xp,
+            "level_start_xp": start,
+            "level_end_xp": end if end is not None else start,
+            "progress_xp": progress,
+            "needed_xp": needed,
+            "progress_percentage": round(progress / needed * 100, 1) if needed else 100.0,
+        }
+
+    def mongo_expression(self, field: str = "$total_xp") -> dict:
+        """Aggregation expression computing the level of ``field`` server-side"""
+        return {"$max": [
+            {"$size": {"$filter": {"input": self.thresholds, "cond": {"$lte": ["$$this", field]}}}},
+            1
+        ]}
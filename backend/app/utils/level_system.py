@@ -2,6 +2,23 @@
 Level System - Calculate levels from XP
 """
 
+from app.core.config import settings
+from app.utils.level_curve import LevelCurve
+from app.utils.xp_calculator import LEVEL_TABLE
+
+XP_PER_LEVEL = 1000
+MAX_LEVEL = 100
+
+# Curves selectable with the LEVEL_CURVE setting
+CURVES = {
+    "linear": LevelCurve.linear(XP_PER_LEVEL, MAX_LEVEL),
+    "table": LevelCurve.table(LEVEL_TABLE),
+    "exponential": LevelCurve.exponential(base_xp=100, growth=1.05, max_level=MAX_LEVEL),
+}
+
+# The curve every level computation in the app goes through
+level_curve = CURVES[settings.LEVEL_CURVE]
+
 def get_level_from_xp(total_xp: int) -> int:
     """
     Calculate player level from total XP
@@ -12,16 +29,15 @@ def get_level_from_xp(total_xp: int) -> int:
     Level 3: 2000 - 2999 XP
     ... and so on
     
-    Each level requires 1000 XP
+    Each level requires 1000 XP, up to level 100 (with the default
+    linear curve)
     """
-    if total_xp < 0:
-        return 1
-    
-    # Every 1000 XP = 1 level
-    level = (total_xp // 1000) + 1
-    
-    # Maximum level 100
-    return min(level, 100)
+    return level_curve.level_for(total_xp)
+
+
+def get_levels_from_xp(xp_values):
+    """Levels for many XP totals in one call (see LevelCurve.levels_for)"""
+    return level_curve.levels_for(xp_values)
 
 
 def get_xp_for_level(level: int) -> int:
@@ -33,9 +49,7 @@ def get_xp_for_level(level: int) -> int:
     Level 2: 1000 XP
     Level 3: 2000 XP
     """
-    if level <= 1:
-        return 0
-    return (level - 1) * 1000
+    return level_curve.xp_for_level(level)
 
 def get_level_info(total_xp: int) -> dict:
     progress_data = get_xp_progress(total_xp)
@@ -59,28 +73,7 @@ def get_xp_progress(total_xp: int) -> dict:
         "progress_percentage": 50.0
     }
     """
-    current_level = get_level_from_xp(total_xp)
-    current_level_xp = get_xp_for_level(current_level)
-    next_level_xp = get_xp_for_level(current_level + 1)
-    
-    # XP earned in this level
-    progress = total_xp - current_level_xp
-    
-    # XP needed to next level
-    needed = next_level_xp - current_level_xp
-    
-    # Percentage complete
-    percentage = (progress / needed) * 100 if needed > 0 else 0
-    
-    return {
-        "current_level": current_level,
-        "current_xp": total_xp,
-        "level_start_xp": current_level_xp,
-        "level_end_xp": next_level_xp,
-        "progress_xp": progress,
-        "needed_xp": needed,
-        "progress_percentage": round(percentage, 1)
-    }
+    return level_curve.progress(total_xp)
 
 
 
@@ -0,0 +1,150 @@
+"""
+Ranking - Order-statistics structure for leaderboards
+"""
+
+import random
+
+MAX_LEVELS = 32
+
+
+class _Top:
+    """Sentinel key that sorts after every real key"""
+
+    def __lt__(self, other):
+        return False
+
+    def __le__(self, other):
+        return False
+
+    def __gt__(self, other):
+        return True
+
+    def __ge__(self, other):
+        return True
+
+
+class _Node:
+    __slots__ = ("key", "next", "width")
+
+    def __init__(self, key, levels: int):
+        self.key = key
+        self.next = [None] * levels
+        self.width = [1] * levels
+
+
+class RankedSkipList:
+    """
+    Indexable skip list
+
+    Keeps keys sorted and tracks link widths so that insert, remove,
+    rank (number of keys strictly lower) and positional lookups are all
+    O(log n) on average.
+    """
+
+    def __init__(self, max_levels: int = MAX_LEVELS):
+        self.max_levels = max_levels
+        self._nil = _Node(_Top(), 0)
+        self._head = _Node(None, max_levels)
+        self._head.next = [self._nil] * max_levels
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _random_levels(self) -> int:
+        levels = 1
+        while levels < self.max_levels and random.random() < 0.5:
+            levels += 1
+        return levels
+
+    def insert(self, key):
+        """Insert a key (duplicates are allowed)"""
+        chain = [None] * self.max_levels
+        steps_at_level = [0] * self.max_levels
+        node = self._head
+        for level in reversed(range(self.max_levels)):
+            while node.next[level].key <= key:
+                steps_at_level[level] += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+
+        levels = self._random_levels()
+        new_node = _Node(key, levels)
+        steps = 0
+        for level in range(levels):
+            prev = chain[level]
+            new_node.next[level] = prev.next[level]
+            prev.next[level] = new_node
+            new_node.width[level] = prev.width[level] - steps
+            prev.width[level] = steps + 1
+            steps += steps_at_level[level]
+        for level in range(levels, self.max_levels):
+            chain[level].width[level] += 1
+        self._size += 1
+
+    def remove(self, key):
+        """Remove one occurrence of a key, raising KeyError if absent"""
+        chain = [None] * self.max_levels
+        node = self._head
+        for level in reversed(range(self.max_levels)):
+            while node.next[level].key < key:
+                node = node.next[level]
+            chain[level] = node
+
+        target = chain[0].next[0]
+        if target is self._nil or target.key != key:
+            raise KeyError(key)
+
+        for level in range(len(target.next)):
+            prev = chain[level]
+            prev.width[level] += target.width[level] - 1
+            prev.next[level] = target.next[level]
+        for level in range(len(target.next), self.max_levels):
+            chain[level].width[level] -= 1
+        self._size -= 1
+
+    def rank(self, key) -> int:
+        """Number of keys strictly lower than ``key``"""
+        position = 0
+        node = self._head
+        for level in reversed(range(self.max_levels)):
+            while node.next[level].key < key:
+                position += node.width[level]
+                node = node.next[level]
+        return position
+
+    def __getitem__(self, index: int):
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("RankedSkipList index out of range")
+
+        remaining = index + 1
+        node = self._head
+        for level in reversed(range(self.max_levels)):
+            while node.width[level] <= remaining:
+                remaining -= node.width[level]
+                node = node.next[level]
+        return node.key
+
+    def slice(self, start: int = 0, count: int = None):
+        """Iterate ``count`` keys in order starting at position ``start``"""
+        if start >= self._size:
+            return
+        if count is None:
+            count = self._size - start
+
+        remaining = start + 1
+        node = self._head
+        for level in reversed(range(self.max_levels)):
+            while node.width[level] <= remaining:
+                remaining -= node.width[level]
+                node = node.next[level]
+
+        while count > 0 and node is not self._nil:
+            yield node.key
+            node = node.next[0]
+            count -= 1
+
+    def __iter__(self):
+        return self.slice(0)
@@ -1,3 +1,9 @@
+from app.utils.level_curve import LevelCurve
+
+# Cumulative XP for levels 1-10 of the quick-start table curve
+LEVEL_TABLE = [0, 100, 250, 500, 1000, 2000, 3500, 5500, 8000, 12000]
+TABLE_CURVE = LevelCurve.table(LEVEL_TABLE)
+
 def calculate_xp(difficulty: str, time_taken: float) -> int:
     """
     Calculate XP based on difficulty and time taken
@@ -18,21 +24,4 @@ def calculate_xp(difficulty: str, time_taken: float) -> int:
 
 def calculate_level(total_xp: int) -> int:
     """Calculate level from total XP"""
-    levels = [
-        (0, 1),
-        (100, 2),
-        (250, 3),
-        (500, 4),
-        (1000, 5),
-        (2000, 6),
-        (3500, 7),
-        (5500, 8),
-        (8000, 9),
-        (12000, 10),
-    ]
-    
-    for xp_required, level in reversed(levels):
-        if total_xp >= xp_required:
-            return level
-    
-    return 1
+    return TABLE_CURVE.level_for(total_xp)
@@ -0,0 +1,93 @@
+import argparse
+import asyncio
+from datetime import date, datetime
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+import sys
+import os
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.utils.activity_bitmap import ActivityBitmap
+
+# Collection -> (timestamp field, filter) for records marking a day of the
+# user's own activity. XP corrections (admin re-judges, negative grants)
+# are not something the user did that day.
+ACTIVITY_SOURCES = {
+    "xp_events": ("created_at", {"amount": {"$gt": 0}, "source": {"$ne": "rejudge"}}),
+    "code_submissions": ("timestamp", {}),
+}
+
+async def active_days(db) -> dict:
+    """user_id -> set of days with any recorded activity"""
+    days = {}
+    for collection, (field, match) in ACTIVITY_SOURCES.items():
+        async for row in db[collection].aggregate([
+            {"$match": {**match, field: {"$type": "date"}}},
+            {"$group": {"_id": {
+                "user_id": "$user_id",
+                "day": {"$dateToString": {"format": "%Y-%m-%d", "date": f"${field}"}}
+            }}},
+        ], allowDiskUse=True):
+            user_days = days.setdefault(str(row["_id"]["user_id"]), set())
+            user_days.add(date.fromisoformat(row["_id"]["day"]))
+    return days
+
+async def backfill_activity_bitmaps(dry_run: bool):
+    """Build per-day activity bitmaps for user_streaks from activity history"""
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    try:
+        db = client[settings.DATABASE_NAME]
+        await db.command("ping")
+        print("✅ Connected to MongoDB")
+
+        history = await active_days(db)
+        print(f"✅ Found activity for {len(history)} users")
+
+        operations = []
+        async for streak_doc in db["user_streaks"].find({}):
+            user_id = str(streak_doc["user_id"])
+            # Keep what is already recorded, including legacy streak counters
+            if streak_doc.get("activity_bits") is not None:
+                activity = ActivityBitmap.from_document(streak_doc)
+            else:
+                activity = ActivityBitmap.from_streak(streak_doc.get("last_activity"), streak_doc.get("current_streak", 0))
+            activity.add_many(history.pop(user_id, ()))
+            operations.append(UpdateOne({"_id": streak_doc["_id"]}, {"$set": {
+                **activity.to_fields(),
+                "current_streak": activity.current_streak(),
+                "longest_streak": max(activity.longest_streak(), streak_doc.get("longest_streak", 0)),
+            }}))
+
+        # Users with history but no streak record yet
+        for user_id, days in history.items():
+            activity = ActivityBitmap()
+            activity.add_many(days)
+            operations.append(UpdateOne({"user_id": user_id}, {"$set": {
+                **activity.to_fields(),
+                "current_streak": activity.current_streak(),
+                "longest_streak": activity.longest_streak(),
+                "last_activity": datetime.combine(activity.last_active_day, datetime.min.time()),
+            }}, upsert=True))
+
+        if dry_run:
+            print(f"✅ Would update {len(operations)} streak records")
+        elif operations:
+            result = await db["user_streaks"].bulk_write(operations, ordered=False)
+            print(f"✅ Updated {result.modified_count} and created {result.upserted_count} streak records")
+            print("💡 Run scripts/reconcile_user_stats.py to refresh user_stats snapshots")
+    except Exception as e:
+        print(f"❌ Error backfilling activity bitmaps: {e}")
+        import traceback
+        traceback.print_exc()
+    finally:
+        client.close()
+        print("✅ MongoDB connection closed")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build user_streaks activity bitmaps from activity history")
+    parser.add_argument("--dry-run", action="store_true", help="Only count the records that would change")
+    args = parser.parse_args()
+    asyncio.run(backfill_activity_bitmaps(args.dry_run))
@@ -0,0 +1,51 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.judge import JudgeEngine, WarmPythonPool
+
+# A typical beginner exercise: read two numbers, print their sum
+SUBMISSION = "a, b = map(int, input().split())\nprint(a + b)\n"
+TEST_CASES = {"cases": [
+    {"input": f"{i} {i * 2}\n", "expected_output": str(i * 3)} for i in range(3)
+]}
+
+async def measure(engine: JudgeEngine, submissions: int) -> float:
+    """Judge ``submissions`` copies of the exercise; returns submissions/sec"""
+    started = time.perf_counter()
+    results = await asyncio.gather(*(
+        engine.run(SUBMISSION, "python", TEST_CASES) for _ in range(submissions)
+    ))
+    elapsed = time.perf_counter() - started
+    assert all(r["all_passed"] for r in results), "benchmark submission failed"
+    return submissions / elapsed
+
+async def benchmark_judge(submissions: int, concurrency: int):
+    """Compare cold interpreter starts with the warm zygote pool"""
+    cold = JudgeEngine(max_concurrency=concurrency)
+    cold_rate = await measure(cold, submissions)
+    print(f"❄️  Cold start: {cold_rate:8.1f} submissions/sec")
+
+    warm = JudgeEngine(max_concurrency=concurrency)
+    pool = WarmPythonPool(size=concurrency)
+    await pool.start()
+    warm.pools["python"] = pool
+    try:
+        warm_rate = await measure(warm, submissions)
+    finally:
+        await pool.stop()
+    print(f"🔥 Warm pool:  {warm_rate:8.1f} submissions/sec")
+    print(f"✅ Speed-up: {warm_rate / cold_rate:.1f}x "
+          f"({submissions} submissions x {len(TEST_CASES['cases'])} cases, concurrency {concurrency})")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark judge throughput, cold vs warm")
+    parser.add_argument("--submissions", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    asyncio.run(benchmark_judge(args.submissions, args.concurrency))
@@ -0,0 +1,70 @@
+import argparse
+import asyncio
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING
+import sys
+import os
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.utils.activity_bitmap import ActivityBitmap, BITS_FIELD
+
+async def dedupe_user_streaks(dry_run: bool):
+    """Merge duplicate user_streaks records and make user_id unique"""
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    try:
+        db = client[settings.DATABASE_NAME]
+        streaks = db["user_streaks"]
+        await db.command("ping")
+        print("✅ Connected to MongoDB")
+
+        merged = 0
+        async for group in streaks.aggregate([
+            {"$group": {"_id": "$user_id", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+            {"$match": {"count": {"$gt": 1}}},
+        ], allowDiskUse=True):
+            docs = await streaks.find({"_id": {"$in": group["ids"]}}).sort("last_activity", -1).to_list(None)
+            keep, extras = docs[0], docs[1:]
+
+            # Union of every record's active days (legacy ones by their streak)
+            activity = ActivityBitmap()
+            for doc in docs:
+                if doc.get(BITS_FIELD) is not None:
+                    activity = activity.merge(ActivityBitmap.from_document(doc))
+                else:
+                    activity = activity.merge(ActivityBitmap.from_streak(doc.get("last_activity"), doc.get("current_streak", 0)))
+
+            merged += len(extras)
+            if dry_run:
+                continue
+            await streaks.update_one({"_id": keep["_id"]}, {"$set": {
+                **activity.to_fields(),
+                "current_streak": activity.current_streak(),
+                "longest_streak": max([activity.longest_streak()] + [doc.get("longest_streak", 0) for doc in docs]),
+            }})
+            await streaks.delete_many({"_id": {"$in": [doc["_id"] for doc in extras]}})
+
+        action = "Would remove" if dry_run else "Removed"
+        print(f"✅ {action} {merged} duplicate streak records")
+
+        if not dry_run:
+            indexes = await streaks.index_information()
+            if "user_id_1" in indexes and not indexes["user_id_1"].get("unique"):
+                await streaks.drop_index("user_id_1")
+            await streaks.create_index([("user_id", ASCENDING)], unique=True)
+            print("✅ user_streaks.user_id is unique")
+    except Exception as e:
+        print(f"❌ Error deduplicating user streaks: {e}")
+        import traceback
+        traceback.print_exc()
+    finally:
+        client.close()
+        print("✅ MongoDB connection closed")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merge duplicate user_streaks records and make user_id unique")
+    parser.add_argument("--dry-run", action="store_true", help="Only count the duplicates")
+    args = parser.parse_args()
+    asyncio.run(dedupe_user_streaks(args.dry_run))
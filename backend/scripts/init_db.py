@@ -8,8 +8,9 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.core.config import settings
+from app.core.indexes import ensure_indexes, audit_query_plans
 
-async def init_db():
+async def init_db(audit: bool = False):
     """Initialize database with collections"""
     try:
         # Connect to MongoDB
@@ -27,7 +28,8 @@ async def init_db():
             "users", "quests", "tasks", "user_quests", 
             "badges", "user_badges", "submissions", 
             "achievements", "notifications", "chat_history",
-            "code_reviews", "github_contributions", "analytics"
+            "code_reviews", "github_contributions", "analytics",
+            "xp_events", "xp_windows"
         ]
         
         for collection_name in collections:
@@ -38,23 +40,16 @@ async def init_db():
                 print(f"⚠️  Collection already exists: {collection_name}")
         
         # Create indexes
-        try:
-            await db["users"].create_index("email", unique=True)
-            print("✅ Created unique index on users.email")
-        except Exception as e:
-            print(f"⚠️  Index on users.email already exists")
+        created = await ensure_indexes(db)
+        for collection_name, names in created.items():
+            print(f"✅ Indexes on {collection_name}: {', '.join(names)}")
         
-        try:
-            await db["users"].create_index("username", unique=True)
-            print("✅ Created unique index on users.username")
-        except Exception as e:
-            print(f"⚠️  Index on users.username already exists")
-        
-        try:
-            await db["quests"].create_index("title")
-            print("✅ Created index on quests.title")
-        except Exception as e:
-            print(f"⚠️  Index on quests.title already exists")
+        if audit:
+            collection_scans = await audit_query_plans(db)
+            for collection_name, query, sort in collection_scans:
+                print(f"❌ COLLSCAN on {collection_name}: filter={query} sort={sort}")
+            if not collection_scans:
+                print("✅ Query plan audit passed (no COLLSCAN)")
         
         print("\n✅ Database initialized successfully!")
         
@@ -67,4 +62,4 @@ async def init_db():
         print("✅ MongoDB connection closed")
 
 if __name__ == "__main__":
-    asyncio.run(init_db())
+    asyncio.run(init_db(audit="--audit" in sys.argv))
@@ -0,0 +1,50 @@
+import argparse
+import asyncio
+import multiprocessing
+from motor.motor_asyncio import AsyncIOMotorClient
+import sys
+import os
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.services.judge_queue import JudgeWorker
+
+async def run_worker(concurrency: int):
+    """Claim and evaluate judge jobs until interrupted"""
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    try:
+        db = client[settings.DATABASE_NAME]
+        await db.command("ping")
+        await JudgeWorker(db, concurrency=concurrency).run()
+    finally:
+        client.close()
+
+def worker_process(concurrency: int):
+    try:
+        asyncio.run(run_worker(concurrency))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the submission judge worker pool")
+    parser.add_argument("--processes", type=int, default=1, help="worker processes to start")
+    parser.add_argument("--concurrency", type=int, default=settings.JUDGE_WORKER_CONCURRENCY,
+                        help="jobs evaluated at once per process")
+    args = parser.parse_args()
+
+    print(f"🚀 Starting {args.processes} judge worker process(es), {args.concurrency} slots each")
+    processes = [
+        multiprocessing.Process(target=worker_process, args=(args.concurrency,))
+        for _ in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.join()
+        print("✅ Judge workers stopped")
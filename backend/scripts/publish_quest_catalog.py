@@ -0,0 +1,33 @@
+import asyncio
+from motor.motor_asyncio import AsyncIOMotorClient
+import sys
+import os
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.services.quest_catalog import QuestCatalog
+
+async def publish_quest_catalog(path: str = None):
+    """Copy the quest data file into MongoDB for QUEST_CATALOG_SOURCE=mongodb"""
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    try:
+        db = client[settings.DATABASE_NAME]
+        await db.command("ping")
+        print("✅ Connected to MongoDB")
+
+        catalog = QuestCatalog(source="file")
+        catalog.load_file(path)
+        published = await catalog.save_db(db)
+        print(f"✅ Published {published} quests (version {catalog.version})")
+    except Exception as e:
+        print(f"❌ Error publishing quest catalog: {e}")
+        import traceback
+        traceback.print_exc()
+    finally:
+        client.close()
+        print("✅ MongoDB connection closed")
+
+if __name__ == "__main__":
+    asyncio.run(publish_quest_catalog(sys.argv[1] if len(sys.argv) > 1 else None))
@@ -0,0 +1,42 @@
+import argparse
+import asyncio
+from motor.motor_asyncio import AsyncIOMotorClient
+import sys
+import os
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.services.bulk_recompute import BATCH_SIZE, recompute_all
+
+async def recompute_user_stats(batch_size: int, dry_run: bool):
+    """Recompute level and quests_completed and award earned badges for every user"""
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    try:
+        db = client[settings.DATABASE_NAME]
+        await db.command("ping")
+        print("✅ Connected to MongoDB")
+
+        report = await recompute_all(db, batch_size=batch_size, dry_run=dry_run)
+        action = "would update" if dry_run else "updated"
+        print(f"✅ Recomputed {report['users']:,} users in {report['seconds']}s "
+              f"({report['batches']} batches), {action} {report['changed']:,}")
+        if report["skipped_badges"]:
+            print(f"⚠️  Badges left as is (no column for their criteria): {', '.join(report['skipped_badges'])}")
+        if report["changed"] and not dry_run:
+            print("💡 Run scripts/reconcile_user_stats.py to refresh user_stats snapshots")
+    except Exception as e:
+        print(f"❌ Error recomputing user stats: {e}")
+        import traceback
+        traceback.print_exc()
+    finally:
+        client.close()
+        print("✅ MongoDB connection closed")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute level and quests_completed and award earned badges for every user")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="Only count the users that would change")
+    args = parser.parse_args()
+    asyncio.run(recompute_user_stats(args.batch_size, args.dry_run))
@@ -0,0 +1,38 @@
+import argparse
+import asyncio
+from motor.motor_asyncio import AsyncIOMotorClient
+import sys
+import os
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.services.user_stats import user_stats
+
+async def reconcile_user_stats(fix: bool):
+    """Rebuild user_stats snapshots that drifted from the source collections"""
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    try:
+        db = client[settings.DATABASE_NAME]
+        await db.command("ping")
+        print("✅ Connected to MongoDB")
+
+        report = await user_stats.reconcile(db, fix=fix)
+        action = "rebuilt" if fix else "would rebuild"
+        print(f"✅ Checked {report['users']} users, {action} {report['drifted']} snapshots")
+        for field, count in sorted(report["fields"].items()):
+            print(f"   ⚠️  {field}: {count} users drifted")
+    except Exception as e:
+        print(f"❌ Error reconciling user stats: {e}")
+        import traceback
+        traceback.print_exc()
+    finally:
+        client.close()
+        print("✅ MongoDB connection closed")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild drifted user_stats snapshots")
+    parser.add_argument("--dry-run", action="store_true", help="Only report drift")
+    args = parser.parse_args()
+    asyncio.run(reconcile_user_stats(fix=not args.dry_run))
@@ -0,0 +1,64 @@
+import asyncio
+from motor.motor_asyncio import AsyncIOMotorClient
+import sys
+import os
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.services.ai_service import AIService
+from app.services.ai_cache import ai_cache
+from app.services.quest_system_service import QuestSystemService
+from app.services.tutorial_service import TutorialService
+
+async def warm_ai_cache():
+    """Pre-generate hints for every quest task and tutorial"""
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    try:
+        db = client[settings.DATABASE_NAME]
+        await db.command("ping")
+        print("✅ Connected to MongoDB")
+
+        ai_service = AIService()
+        jobs = []
+
+        for quest in QuestSystemService().QUESTS:
+            for task in quest["tasks"]:
+                jobs.append(ai_service.generate_hint(
+                    task["title"],
+                    task["description"],
+                    quest["difficulty"],
+                    db=db
+                ))
+
+        for tutorial in TutorialService.TUTORIALS:
+            jobs.append(ai_service.generate_hint(
+                tutorial["title"],
+                tutorial["description"],
+                tutorial["difficulty"],
+                db=db
+            ))
+            if tutorial.get("code_example"):
+                jobs.append(ai_service.get_code_explanation(
+                    tutorial["code_example"],
+                    "bash",
+                    db=db
+                ))
+
+        # AIService bounds how many of these run against Gemini at once
+        await asyncio.gather(*jobs)
+
+        stats = ai_cache.get_stats()
+        print(f"✅ Warmed {len(jobs)} prompts ({stats['stores']} generated, "
+              f"{stats['db_hits'] + stats['memory_hits']} already cached)")
+    except Exception as e:
+        print(f"❌ Error warming AI cache: {e}")
+        import traceback
+        traceback.print_exc()
+    finally:
+        client.close()
+        print("✅ MongoDB connection closed")
+
+if __name__ == "__main__":
+    asyncio.run(warm_ai_cache())
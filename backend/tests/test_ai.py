@@ -30,3 +30,116 @@ async def test_code_review(client):
         headers=headers
     )
     assert response.status_code in [200, 401]
+
+@pytest.mark.asyncio
+async def test_ai_cache_key_normalization():
+    """Test cache keys ignore meaningless whitespace but not content"""
+    from app.services.ai_cache import cache_key
+
+    base = cache_key("get-hint", "m", {"problem_title": "Loops", "difficulty": "beginner"}, 0.7)
+    same = cache_key("get-hint", "m", {"difficulty": "beginner", "problem_title": "Loops  \n"}, 0.71)
+    other = cache_key("get-hint", "m", {"problem_title": "Loops", "difficulty": "advanced"}, 0.7)
+    assert base == same
+    assert base != other
+
+@pytest.mark.asyncio
+async def test_ai_cache_lru_eviction():
+    """Test in-process tier evicts least recently used entries"""
+    from app.services.ai_cache import AIResponseCache
+
+    cache = AIResponseCache(max_entries=2, ttl_seconds=60)
+    await cache.set(None, "a", "get-hint", "A")
+    await cache.set(None, "b", "get-hint", "B")
+    assert await cache.get(None, "a") == "A"
+    await cache.set(None, "c", "get-hint", "C")
+
+    assert await cache.get(None, "b") is None
+    assert await cache.get(None, "c") == "C"
+    stats = cache.get_stats()
+    assert stats["memory_hits"] == 2
+    assert stats["misses"] == 1
+
+@pytest.mark.asyncio
+async def test_conversation_store_isolates_and_evicts_sessions():
+    """Test conversation buffers are per user/session and bounded"""
+    from app.services.conversation_store import ConversationStore
+
+    store = ConversationStore(max_sessions=2, max_turns=2, idle_seconds=60, token_budget=1000)
+    store.append("alice", "hi", "hello")
+    store.append("bob", "what is a loop", "a loop repeats")
+    assert store.get_history("alice") == [
+        {"role": "user", "content": "hi"},
+        {"role": "assistant", "content": "hello"},
+    ]
+
+    store.append("carol", "q", "a")
+    assert len(store) == 2
+    assert store.get_history("alice") == []
+
+    for i in range(3):
+        store.append("bob", f"question {i}", f"answer {i}")
+    assert len(await store.get_turns(None, "bob")) == 2
+
+@pytest.mark.asyncio
+async def test_conversation_history_token_budget():
+    """Test old turns are summarized once the token budget is exceeded"""
+    from app.services.conversation_store import ConversationStore
+
+    store = ConversationStore(token_budget=6)
+    turns = [
+        {"user": "explain recursion please", "assistant": "a function calling itself"},
+        {"user": "and loops?", "assistant": "they repeat"},
+    ]
+    history = store.build_history(turns)
+    assert history.startswith("(Earlier in this conversation the user asked about: explain recursion please)")
+    assert "User: and loops?" in history
+    assert "a function calling itself" not in history
+
+@pytest.mark.asyncio
+async def test_sse_event_format():
+    """Test streamed chunks are framed as server-sent events"""
+    from app.api.v1.ai import sse_event
+
+    assert sse_event({"delta": "Hi\n"}) == 'data: {"delta": "Hi\\n"}\n\n'
+    assert sse_event({}, event="done") == "event: done\ndata: {}\n\n"
+
+@pytest.mark.asyncio
+async def test_single_flight_coalesces_identical_calls():
+    """Test concurrent identical calls share one upstream call"""
+    import asyncio
+    from app.services.ai_cache import SingleFlight
+
+    flight = SingleFlight()
+    calls = []
+
+    async def upstream():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "hint"
+
+    results = await asyncio.gather(*(flight.do("k", upstream) for _ in range(5)))
+    assert results == ["hint"] * 5
+    assert len(calls) == 1
+    assert flight.get_stats() == {"leaders": 1, "coalesced": 4, "in_flight": 0}
+
+    await flight.do("k", upstream)
+    assert len(calls) == 2
+
+@pytest.mark.asyncio
+async def test_single_flight_survives_leader_cancellation():
+    """Test a cancelled caller does not cancel the shared call for others"""
+    import asyncio
+    from app.services.ai_cache import SingleFlight
+
+    flight = SingleFlight()
+
+    async def upstream():
+        await asyncio.sleep(0.02)
+        return "hint"
+
+    leader = asyncio.ensure_future(flight.do("k", upstream))
+    await asyncio.sleep(0)
+    follower = asyncio.ensure_future(flight.do("k", upstream))
+    await asyncio.sleep(0)
+    leader.cancel()
+    assert await follower == "hint"
@@ -0,0 +1,88 @@
+import pytest
+from app.utils.badge_engine import BadgeRuleEngine
+from app.utils.badges import check_badges_earned, get_new_badges
+
+
+@pytest.mark.asyncio
+async def test_engine_only_checks_affected_stats():
+    """Test a change only evaluates rules on that stat and its dependents"""
+    engine = BadgeRuleEngine({
+        "xp_small": ("total_xp", 100),
+        "xp_big": ("total_xp", 1000),
+        "level_two": ("level", 2),
+        "streak_week": ("streak_days", 7),
+    })
+    stats = {"total_xp": 1500, "level": 2, "streak_days": 10}
+
+    assert sorted(engine.evaluate(stats, changed=["total_xp"])) == ["level_two", "xp_big", "xp_small"]
+    assert engine.evaluate(stats, changed=["streak_days"]) == ["streak_week"]
+    assert engine.evaluate(stats, changed=["quest_count"]) == []
+    assert sorted(engine.evaluate(stats)) == ["level_two", "streak_week", "xp_big", "xp_small"]
+    assert sorted(engine.newly_earned(stats, ["xp_small"], changed=["total_xp"])) == ["level_two", "xp_big"]
+
+
+@pytest.mark.asyncio
+async def test_check_badges_earned():
+    """Test badge catalog evaluation from a user document"""
+    user = {"quests_completed": 5, "current_streak": 7, "total_xp": 4200}
+
+    earned = check_badges_earned(user)
+    assert set(earned) == {"first-steps", "quest-completer", "week-warrior", "century-club", "level-five"}
+    assert get_new_badges(user, ["first-steps"], changed=["streak_days"]) == ["week-warrior"]
+
+
+@pytest.mark.asyncio
+async def test_bulk_recompute_matches_per_user_evaluation():
+    """Column-wise recompute agrees with the per-user badge and level checks"""
+    pytest.importorskip("numpy")
+    from app.services.bulk_recompute import BadgeMatrix, recompute_batch
+    from app.utils.level_system import get_level_from_xp
+
+    users = [
+        {"_id": "a", "total_xp": 0, "level": 1, "badges": [], "quests_completed": 0},
+        {"_id": "b", "total_xp": 4200, "level": 1, "badges": ["hand-awarded"]},
+        {"_id": "c", "total_xp": 25000, "level": 26, "badges": []},
+    ]
+    quest_counts = {"b": 5, "c": 30}
+    # Streaks come from user_streaks, not the users row
+    streaks = {"b": 7, "c": 31}
+    operations = recompute_batch(users, quest_counts, streaks, BadgeMatrix())
+
+    updates = {op._filter["_id"]: op._doc for op in operations}
+    assert "a" not in updates
+    for user in users[1:]:
+        stats = {**user, "quests_completed": quest_counts[user["_id"]], "current_streak": streaks[user["_id"]]}
+        expected = check_badges_earned(stats)
+        assert updates[user["_id"]]["$set"]["level"] == get_level_from_xp(user["total_xp"])
+        assert sorted(updates[user["_id"]]["$addToSet"]["badges"]["$each"]) == sorted(expected)
+    assert "week-warrior" in updates["b"]["$addToSet"]["badges"]["$each"]
+
+
+def test_bulk_recompute_only_adds_badges():
+    """Earned badges are added to the list; nothing is removed or rewritten"""
+    pytest.importorskip("numpy")
+    from app.services.bulk_recompute import BadgeMatrix, recompute_batch
+
+    matrix = BadgeMatrix({
+        "xp_100": {"criteria": {"type": "total_xp", "value": 100}},
+        "streak_7": {"criteria": {"type": "streak_days", "value": 7}},
+        "night_owl": {"criteria": {"type": "late_submissions", "value": 5}},
+    })
+    assert matrix.skipped == ["night_owl"]
+
+    users = [
+        # Kept its streak badge although the streak has no row any more
+        {"_id": "a", "total_xp": 150, "level": 1, "badges": ["night_owl", "streak_7"], "quests_completed": 0},
+        # Only quests_completed moved: no updated_at bump
+        {"_id": "b", "total_xp": 150, "level": 1, "badges": ["xp_100"], "quests_completed": 0},
+        # Nothing changed
+        {"_id": "c", "total_xp": 150, "level": 1, "badges": ["xp_100", "streak_7"], "quests_completed": 0},
+    ]
+    operations = recompute_batch(users, {"b": 2}, {"c": 9}, matrix)
+    updates = {op._filter["_id"]: op._doc for op in operations}
+
+    assert set(updates) == {"a", "b"}
+    assert updates["a"]["$addToSet"] == {"badges": {"$each": ["xp_100"]}}
+    assert "badges" not in updates["a"]["$set"] and "updated_at" in updates["a"]["$set"]
+    assert "$addToSet" not in updates["b"] and "updated_at" not in updates["b"]["$set"]
+    assert updates["b"]["$set"]["quests_completed"] == 2
@@ -0,0 +1,119 @@
+import pytest
+from datetime import datetime
+from motor.motor_asyncio import AsyncIOMotorClient
+from app.core.config import settings
+from app.services.cache_sync import CacheSync, register_cache_handlers
+from app.services.leaderboard_service import leaderboard_index
+from app.services.user_stats import user_stats
+
+
+@pytest.fixture
+async def sync_db():
+    """Scratch database on the local mongod; skipped when none is running"""
+    client = AsyncIOMotorClient(settings.MONGODB_URL, serverSelectionTimeoutMS=1000)
+    try:
+        await client.admin.command("ping")
+    except Exception:
+        client.close()
+        pytest.skip("local mongod not available")
+
+    db = client[f"{settings.DATABASE_NAME}_cache_sync"]
+    yield db
+    await client.drop_database(db.name)
+    client.close()
+
+
+@pytest.mark.asyncio
+async def test_changes_patch_leaderboard_and_invalidate_stats():
+    """Other workers' writes reach the leaderboard index and stats cache"""
+    sync = CacheSync(mode="poll")
+    register_cache_handlers(sync)
+    user_stats.enable_cache()
+    try:
+        user_stats._remember({"_id": "sync-u1", "total_xp": 10})
+        sync.dispatch({
+            "op": "update",
+            "collection": "users",
+            "document_key": "sync-u1",
+            "document": {"_id": "sync-u1", "username": "ada", "total_xp": 500, "is_active": True},
+        })
+        assert leaderboard_index.get("sync-u1")["total_xp"] == 500
+        assert "sync-u1" not in user_stats._cache
+
+        user_stats._remember({"_id": "sync-u1", "total_xp": 500})
+        sync.dispatch({
+            "op": "update",
+            "collection": "user_stats",
+            "document_key": "sync-u1",
+            "document": {"_id": "sync-u1", "total_xp": 650},
+        })
+        assert user_stats._cache["sync-u1"]["total_xp"] == 650
+
+        # A users change keeps the streak patched in from user_streaks
+        sync.dispatch({
+            "op": "update",
+            "collection": "user_streaks",
+            "document_key": "streak-1",
+            "document": {"_id": "streak-1", "user_id": "sync-u1", "current_streak": 4},
+        })
+        sync.dispatch({
+            "op": "update",
+            "collection": "users",
+            "document_key": "sync-u1",
+            "document": {"_id": "sync-u1", "username": "ada", "total_xp": 700, "current_streak": 0, "is_active": True},
+        })
+        assert leaderboard_index.get("sync-u1")["current_streak"] == 4
+        assert leaderboard_index.get("sync-u1")["total_xp"] == 700
+
+        sync.dispatch({"op": "delete", "collection": "users", "document_key": "sync-u1", "document": None})
+        assert leaderboard_index.get("sync-u1") is None
+        assert sync.stats["handler_errors"] == 0
+    finally:
+        leaderboard_index.discard("sync-u1")
+        user_stats.enable_cache(False)
+
+
+@pytest.mark.asyncio
+async def test_polling_mode_on_standalone_mongod(sync_db):
+    """Without change streams, modified documents are polled once each"""
+    seen = []
+    sync = CacheSync(mode="poll", poll_seconds=60)
+    sync.subscribe("user_streaks", seen.append)
+    assert await sync.start(sync_db) == "poll"
+    try:
+        now = datetime.utcnow()
+        await sync_db["user_streaks"].insert_many([
+            {"user_id": "a", "current_streak": 1, "last_activity": now},
+            {"user_id": "b", "current_streak": 2, "last_activity": now},
+        ])
+        assert await sync.poll_once(sync_db) == 2
+        assert await sync.poll_once(sync_db) == 0
+
+        await sync_db["user_streaks"].update_one({"user_id": "a"}, {"$set": {"current_streak": 2, "last_activity": datetime.utcnow()}})
+        assert await sync.poll_once(sync_db) == 1
+        assert [change["document"]["user_id"] for change in seen] == ["a", "b", "a"]
+    finally:
+        await sync.stop()
+
+
+@pytest.mark.asyncio
+async def test_polling_pages_through_documents_sharing_a_timestamp(sync_db, monkeypatch):
+    """A bulk write stamping more than a page with one time does not stall polling"""
+    from app.services import cache_sync
+
+    monkeypatch.setattr(cache_sync, "POLL_BATCH_SIZE", 2)
+    seen = []
+    sync = CacheSync(mode="poll", poll_seconds=60)
+    sync.subscribe("users", seen.append)
+    assert await sync.start(sync_db) == "poll"
+    try:
+        now = datetime.utcnow()
+        await sync_db["users"].insert_many([{"username": f"bulk{i}", "updated_at": now} for i in range(5)])
+        assert [await sync.poll_once(sync_db) for _ in range(4)] == [2, 2, 1, 0]
+
+        await sync_db["users"].insert_one({"username": "later", "updated_at": datetime.utcnow()})
+        assert await sync.poll_once(sync_db) == 1
+        assert len({change["document_key"] for change in seen}) == 6
+        assert seen[-1]["document"]["username"] == "later"
+    finally:
+        await sync.stop()
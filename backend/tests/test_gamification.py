@@ -21,3 +21,169 @@ async def test_level_calculation():
     
     level_100 = calculate_level(100)
     assert level_100 >= 1
+
+@pytest.fixture
+async def stats_db():
+    """Scratch database on the local mongod; skipped when none is running"""
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from app.core.config import settings
+
+    client = AsyncIOMotorClient(settings.MONGODB_URL, serverSelectionTimeoutMS=1000)
+    try:
+        await client.admin.command("ping")
+    except Exception:
+        client.close()
+        pytest.skip("local mongod not available")
+
+    db = client[f"{settings.DATABASE_NAME}_user_stats"]
+    yield db
+    await client.drop_database(db.name)
+    client.close()
+
+@pytest.mark.asyncio
+async def test_user_stats_snapshot_tracks_writes_and_reconciles(stats_db):
+    """Write paths keep the snapshot current; reconcile repairs drift"""
+    from app.services.gamification_service import GamificationService
+    from app.services.user_stats import user_stats
+
+    await stats_db["users"].insert_one({"_id": "u1", "username": "ada", "total_xp": 1200})
+    await stats_db["user_badges"].insert_one({"user_id": "u1", "badge_id": "first_quest"})
+
+    snapshot = await user_stats.get(stats_db, "u1")
+    assert snapshot["level"] == 2 and snapshot["badge_ids"] == ["first_quest"]
+
+    service = GamificationService()
+    await service.update_streak(stats_db, "u1")
+    await user_stats.apply_xp(stats_db, [{"user_id": "u1", "amount": 900}])
+    snapshot = await user_stats.get_by_username(stats_db, "ada")
+    assert snapshot["current_streak"] == 1
+    assert snapshot["total_xp"] == 2100 and snapshot["level"] == 3
+
+    # The XP was only applied to the snapshot, so it drifted from users
+    report = await user_stats.reconcile(stats_db)
+    assert report["drifted"] == 1 and report["fields"] == {"total_xp": 1, "level": 1}
+    assert (await user_stats.get(stats_db, "u1"))["total_xp"] == 1200
+    assert (await user_stats.reconcile(stats_db))["drifted"] == 0
+
+@pytest.mark.asyncio
+async def test_level_curves():
+    """Linear, table and exponential curves agree with their thresholds"""
+    from app.utils.level_curve import LevelCurve
+    from app.utils.level_system import get_level_from_xp, get_xp_progress
+
+    linear = LevelCurve.linear(1000, max_level=100)
+    assert [linear.level_for(xp) for xp in (-5, 0, 999, 1000, 99000, 10**9)] == [1, 1, 1, 2, 100, 100]
+    assert linear.next_level_xp(100) is None
+    assert get_level_from_xp(2500) == 3
+    assert get_xp_progress(2500)["progress_percentage"] == 50.0
+    assert get_xp_progress(10**9)["progress_percentage"] == 100.0
+
+    table = LevelCurve.table([0, 100, 250, 500])
+    assert [table.level_for(xp) for xp in (99, 100, 249, 250, 10_000)] == [1, 2, 2, 3, 4]
+
+    exponential = LevelCurve.exponential(base_xp=100, growth=2, max_level=5)
+    assert exponential.thresholds == [0, 100, 300, 700, 1500]
+
+    xps = [0, 150, 300, 1499, 1500, -1]
+    assert [int(level) for level in exponential.levels_for(xps)] == [exponential.level_for(xp) for xp in xps]
+
+    with pytest.raises(ValueError):
+        LevelCurve.table([0, 100, 100])
+
+@pytest.mark.asyncio
+async def test_activity_bitmap_streaks():
+    """Streaks, windows and heatmaps come from the per-day bitmap"""
+    from datetime import date, timedelta
+    from app.utils.activity_bitmap import ActivityBitmap
+
+    today = date(2026, 3, 10)
+    activity = ActivityBitmap()
+    days = [today - timedelta(days=n) for n in (1, 2, 3, 10, 11, 12, 13, 14)]
+    assert activity.add_many(days) == 8
+    assert not activity.add(today - timedelta(days=1))
+
+    # Alive through yesterday, extended (not double counted) today
+    assert activity.current_streak(today) == 3
+    assert activity.add(today) and not activity.add(today)
+    assert activity.current_streak(today) == 4
+    assert activity.current_streak(today + timedelta(days=2)) == 0
+    assert activity.longest_streak() == 5
+    assert activity.active_days_last(7, today) == 4
+    assert activity.active_days_last(30, today) == 9
+
+    start = today - timedelta(days=4)
+    assert activity.heatmap(start, today) == [0, 1, 1, 1, 1]
+
+    stored = ActivityBitmap.from_bytes(activity.to_fields()["activity_origin"], activity.to_bytes())
+    assert stored.bits == activity.bits and stored.origin == activity.origin
+    assert ActivityBitmap.from_streak(today, 3).current_streak(today) == 3
+    assert stored.merge(ActivityBitmap.from_streak(today - timedelta(days=20), 2)).longest_streak() == 5
+
+@pytest.mark.asyncio
+async def test_xp_ledger_retries_batches_without_double_counting(stats_db):
+    """A batch re-sent after an unknown outcome adds its XP and events once"""
+    from datetime import datetime
+    from bson import ObjectId
+    from app.core.indexes import INDEXES
+    from app.services.xp_ledger import XpLedger
+
+    await stats_db["xp_windows"].create_indexes(INDEXES["xp_windows"])
+    user_id = ObjectId()
+    await stats_db["users"].insert_one({"_id": user_id, "username": "ledger", "total_xp": 0})
+
+    ledger = XpLedger()
+    await ledger.grant(stats_db, user_id, 30, "test")
+
+    # The same batch sent twice, as after a write whose outcome was unknown
+    grants = [{
+        "event_id": ObjectId(), "user_id": user_id, "amount": 20, "source": "test",
+        "ref": None, "profile": {"username": "ledger"}, "at": datetime.utcnow(),
+    }]
+    for _ in range(2):
+        ledger._unacked.append({"id": "batch-2", "grants": grants, "users_written": False})
+        await ledger.flush()
+    assert ledger._unacked == []
+
+    user = await stats_db["users"].find_one({"_id": user_id})
+    assert user["total_xp"] == 50
+    assert await stats_db["xp_events"].count_documents({"user_id": str(user_id)}) == 2
+    bucket = await stats_db["xp_windows"].find_one({"window": "weekly", "user_id": str(user_id)})
+    assert bucket["xp"] == 50
+
+@pytest.mark.asyncio
+async def test_xp_ledger_concurrent_grants_share_flushes(stats_db):
+    """Grants flushing at the same time (no flush loop) all go through once"""
+    import asyncio
+    from bson import ObjectId
+    from app.services.xp_ledger import XpLedger
+
+    user_id = ObjectId()
+    await stats_db["users"].insert_one({"_id": user_id, "username": "ledger", "total_xp": 0})
+
+    ledger = XpLedger()
+    await asyncio.gather(*(ledger.grant(stats_db, user_id, 10, "test") for _ in range(5)))
+    assert ledger._unacked == []
+
+    user = await stats_db["users"].find_one({"_id": user_id})
+    assert user["total_xp"] == 50
+    assert await stats_db["xp_events"].count_documents({"user_id": str(user_id)}) == 5
+
+@pytest.mark.asyncio
+async def test_lazy_snapshot_build_does_not_overwrite_or_double_count(stats_db):
+    """Lazy builds only insert, and skip ledger batches the users row already had"""
+    from bson import ObjectId
+    from app.services.user_stats import UserStatsService
+
+    service = UserStatsService()
+    user_id = ObjectId()
+    # The ledger's $inc for batch b1 landed; its apply_xp has not run yet
+    await stats_db["users"].insert_one({"_id": user_id, "username": "lazy", "total_xp": 100, "xp_batches": ["b1"]})
+
+    snapshot = await service.get(stats_db, user_id)
+    assert snapshot["total_xp"] == 100
+    await service.apply_xp(stats_db, [{"user_id": user_id, "amount": 100}], batch_id="b1")
+    assert (await service.get(stats_db, user_id))["total_xp"] == 100
+
+    # A build racing an existing snapshot keeps the stored one
+    await stats_db["user_stats"].update_one({"_id": str(user_id)}, {"$set": {"code_submissions": 7}})
+    assert (await service.build(stats_db, user_id))["code_submissions"] == 7
@@ -0,0 +1,31 @@
+import pytest
+from motor.motor_asyncio import AsyncIOMotorClient
+from app.core.config import settings
+from app.core.indexes import ensure_indexes, audit_query_plans
+
+
+@pytest.fixture
+async def audit_db():
+    """Scratch database on the local mongod; skipped when none is running"""
+    client = AsyncIOMotorClient(settings.MONGODB_URL, serverSelectionTimeoutMS=1000)
+    try:
+        await client.admin.command("ping")
+    except Exception:
+        client.close()
+        pytest.skip("local mongod not available")
+
+    db = client[f"{settings.DATABASE_NAME}_index_audit"]
+    yield db
+    await client.drop_database(db.name)
+    client.close()
+
+
+@pytest.mark.asyncio
+async def test_no_collection_scans(audit_db):
+    """Every registered service query must be served by an index"""
+    await ensure_indexes(audit_db)
+    # Running twice must be a no-op
+    await ensure_indexes(audit_db)
+
+    collection_scans = await audit_query_plans(audit_db)
+    assert collection_scans == []
@@ -0,0 +1,167 @@
+import os
+import shutil
+import pytest
+from app.core.config import settings
+from app.judge import JudgeEngine, SandboxLimits, WarmPythonPool
+
+requires_node = pytest.mark.skipif(shutil.which("node") is None, reason="node binary not installed")
+
+CASES = {"cases": [
+    {"name": "adds", "input": "2 3\n", "expected_output": "5\n"},
+    {"name": "negatives", "input": "-4 1\n", "expected_output": "-3"},
+]}
+
+def world_executable(path: str) -> bool:
+    """Whether the sandbox user can reach and run ``path``"""
+    path = os.path.realpath(path)
+    while path != "/":
+        if not os.stat(path).st_mode & 0o001:
+            return False
+        path = os.path.dirname(path)
+    return True
+
+# An interpreter under a private home (e.g. pyenv in /root) cannot be
+# exec'd once the child has switched to the sandbox uid
+SANDBOX_CAN_EXEC = os.geteuid() == 0 and world_executable(shutil.which(settings.JUDGE_PYTHON_BINARY))
+
+def make_engine(**limits):
+    if not SANDBOX_CAN_EXEC:
+        limits = {"uid": -1, "isolate_network": os.geteuid() == 0, **limits}
+    return JudgeEngine(SandboxLimits(**{"cpu_seconds": 1, "wall_seconds": 3.0, **limits}))
+
+@pytest.fixture(params=["cold", "warm"])
+async def python_engine(request):
+    """Judge engine running Python cold or through the warm zygote pool"""
+    engine = make_engine(memory_mb=128, output_bytes=1024)
+    if request.param == "warm":
+        pool = WarmPythonPool(size=2, output_bytes=1024)
+        await pool.start()
+        engine.pools["python"] = pool
+    yield engine
+    await engine.stop_warm_pools()
+
+@pytest.mark.asyncio
+async def test_judge_python_passes_and_fails_cases(python_engine):
+    """Test per-case status for correct and wrong Python programs"""
+    engine = python_engine
+    correct = "a, b = map(int, input().split())\nprint(a + b)\n"
+    result = await engine.run(correct, "python", CASES)
+    assert result["all_passed"] is True
+    assert [c["status"] for c in result["test_cases"]] == ["passed", "passed"]
+    assert all(c["time_ms"] > 0 for c in result["test_cases"])
+
+    wrong = "a, b = map(int, input().split())\nprint(a - b)\n"
+    result = await engine.run(wrong, "python", CASES)
+    assert result["passed"] == 0 and result["failed"] == 2
+    assert result["test_cases"][0]["expected_output"] == "5\n"
+
+@pytest.mark.asyncio
+async def test_judge_enforces_limits(python_engine):
+    """Test runaway programs are stopped and classified"""
+    engine = python_engine
+
+    result = await engine.run("while True:\n    pass\n", "python")
+    assert result["test_cases"][0]["status"] in ("cpu_limit", "timeout")
+
+    result = await engine.run("x = bytearray(512 * 1024 * 1024)\n", "python")
+    assert result["test_cases"][0]["status"] == "memory_limit"
+
+    result = await engine.run("while True:\n    print('spam')\n", "python")
+    assert result["test_cases"][0]["status"] == "output_limit"
+
+    result = await engine.run("import sys\nwhile True:\n    sys.stderr.write('spam\\n')\n", "python")
+    assert result["test_cases"][0]["status"] == "output_limit"
+
+    result = await engine.run("raise SystemExit(3)\n", "python")
+    assert result["test_cases"][0]["status"] == "runtime_error"
+
+    # Printing the words does not make it a memory limit
+    result = await engine.run("import sys\nsys.stderr.write('MemoryError\\n')\nsys.exit(1)\n", "python")
+    assert result["test_cases"][0]["status"] == "runtime_error"
+
+@pytest.mark.skipif(os.geteuid() != 0, reason="dropping to the sandbox uid needs root")
+@pytest.mark.asyncio
+async def test_sandbox_drops_privileges_and_network():
+    """Test submissions run as the sandbox user, with only loopback and a process cap"""
+    engine = JudgeEngine(SandboxLimits(cpu_seconds=1, wall_seconds=3.0, max_processes=4))
+    pool = WarmPythonPool(size=1)
+    await pool.start()
+    engine.pools["python"] = pool
+    code = (
+        "import os\n"
+        "print(os.getuid(), os.getgid())\n"
+        "with open('/proc/self/net/dev') as f:\n"
+        "    print([line.split(':')[0].strip() for line in f.readlines()[2:]])\n"
+        "children = 0\n"
+        "try:\n"
+        "    for _ in range(20):\n"
+        "        if os.fork() == 0:\n"
+        "            os._exit(0)\n"
+        "        children += 1\n"
+        "except OSError:\n"
+        "    pass\n"
+        "print(children < 20)\n"
+    )
+    expected = f"{settings.JUDGE_SANDBOX_UID} {settings.JUDGE_SANDBOX_GID}\n['lo']\nTrue\n"
+    try:
+        result = await engine.run(code, "python", {"cases": [{"expected_output": expected}]})
+        assert result["all_passed"] is True, result["test_cases"]
+    finally:
+        await engine.stop_warm_pools()
+
+@pytest.mark.asyncio
+async def test_judge_rejects_unsupported_language():
+    """Test unknown languages fail without running anything"""
+    result = await make_engine().run("puts 1", "cobol", CASES)
+    assert result["all_passed"] is False
+    assert "Unsupported language" in result["error"]
+
+@pytest.mark.asyncio
+async def test_warm_pool_recycles_zygotes():
+    """Test zygotes are replaced after max_jobs runs"""
+    engine = make_engine()
+    pool = WarmPythonPool(size=1, max_jobs=2)
+    await pool.start()
+    engine.pools["python"] = pool
+    try:
+        for _ in range(3):
+            result = await engine.run("print(sum(range(10)))\n", "python", {"cases": [{"expected_output": "45"}]})
+            assert result["all_passed"] is True
+        assert pool.stats["runs"] == 3
+        assert pool.stats["recycled"] == 1
+    finally:
+        await engine.stop_warm_pools()
+
+@requires_node
+@pytest.mark.asyncio
+async def test_judge_javascript_runner():
+    """Test JavaScript submissions run through node"""
+    code = (
+        "const [a, b] = require('fs').readFileSync(0, 'utf8').trim().split(' ').map(Number);\n"
+        "console.log(a + b);\n"
+    )
+    result = await make_engine().run(code, "javascript", CASES)
+    assert result["all_passed"] is True
+
+    result = await make_engine().run("while (true) {}\n", "js")
+    assert result["test_cases"][0]["status"] in ("cpu_limit", "timeout")
+
+def test_result_memo_keys():
+    """Test memo keys ignore formatting but follow code and test-suite changes"""
+    from app.services.result_memo import result_key, suite_version
+
+    limits = SandboxLimits()
+    version = suite_version(CASES, limits)
+    key = result_key("t1", "python", "a, b = map(int, input().split())\nprint(a + b)\n", version)
+
+    reformatted = "# sum\na,b = map(int,input().split())  \r\n\n\nprint( a+b )"
+    assert result_key("t1", "python", reformatted, version) == key
+    assert result_key("t1", "python", "a, b = map(int, input().split())\nprint(b + a)\n", version) != key
+    assert result_key("t2", "python", reformatted, version) != key
+
+    changed = {"cases": CASES["cases"] + [{"input": "0 0\n", "expected_output": "0"}]}
+    assert suite_version(changed, limits) != version
+    assert suite_version({**CASES, "version": 2}, limits) != suite_version({**CASES, "version": 3}, limits)
+
+    js = "console.log(1);\n"
+    assert result_key("t1", "javascript", js, version) == result_key("t1", "js", "\nconsole.log(1);   \r\n\n", version)
@@ -0,0 +1,207 @@
+import asyncio
+import pytest
+from datetime import datetime, timedelta
+from motor.motor_asyncio import AsyncIOMotorClient
+from app.core.config import settings
+from app.services.judge_queue import JudgeQueue
+
+
+@pytest.fixture
+async def queue_db():
+    """Scratch database on the local mongod; skipped when none is running"""
+    client = AsyncIOMotorClient(settings.MONGODB_URL, serverSelectionTimeoutMS=1000)
+    try:
+        await client.admin.command("ping")
+    except Exception:
+        client.close()
+        pytest.skip("local mongod not available")
+
+    db = client[f"{settings.DATABASE_NAME}_judge_queue"]
+    yield db
+    await client.drop_database(db.name)
+    client.close()
+
+
+@pytest.mark.asyncio
+async def test_claim_order_and_dedup(queue_db):
+    """First attempts are claimed before re-runs, oldest first, once each"""
+    queue = JudgeQueue(queue_db)
+    await queue.enqueue("rerun-1", "u1", lane="rerun")
+    first = await queue.enqueue("first-1", "u1")
+    await queue.enqueue("first-2", "u2")
+    assert (await queue.enqueue("first-1", "u1"))["_id"] == first["_id"]
+
+    claimed = [(await queue.claim("w"))["submission_id"] for _ in range(3)]
+    assert claimed == ["first-1", "first-2", "rerun-1"]
+    assert await queue.claim("w") is None
+
+
+@pytest.mark.asyncio
+async def test_concurrent_enqueues_share_one_job(queue_db):
+    """Racing evaluate requests end up on the same job (unique active-job index)"""
+    from app.core.indexes import INDEXES
+
+    await queue_db["judge_jobs"].create_indexes(INDEXES["judge_jobs"])
+    queue = JudgeQueue(queue_db)
+    jobs = await asyncio.gather(*(queue.enqueue("s1", "u1") for _ in range(5)))
+    assert len({job["_id"] for job in jobs}) == 1
+    assert await queue_db["judge_jobs"].count_documents({"submission_id": "s1"}) == 1
+
+    # A re-judge job for the same submission is tracked separately
+    assert await queue.enqueue_many([queue.new_job("s1", "u1", "bulk", run_id="r1")]) == 1
+    assert await queue.enqueue_many([queue.new_job("s1", "u1", "bulk", run_id="r1")]) == 0
+
+
+@pytest.mark.asyncio
+async def test_orphaned_jobs_are_recovered(queue_db):
+    """Jobs whose lease expired go back to the queue until out of attempts"""
+    queue = JudgeQueue(queue_db, max_attempts=2)
+    await queue.enqueue("s1", "u1")
+
+    for expected in ("queued", "failed"):
+        job = await queue.claim("crashed-worker")
+        await queue_db["judge_jobs"].update_one(
+            {"_id": job["_id"]},
+            {"$set": {"lease_expires_at": datetime.utcnow() - timedelta(seconds=1)}}
+        )
+        assert await queue.recover_orphans() == 1
+        assert (await queue.get_job("s1"))["status"] == expected
+
+    # A late result from the lost worker is ignored
+    assert await queue.complete(job, {"status": "passed"}) is False
+
+
+@pytest.mark.asyncio
+async def test_rejudge_queues_task_submissions_on_bulk_lane(queue_db):
+    """A re-judge run queues every submission of the task behind first attempts"""
+    from app.services.rejudge_service import RejudgeService
+
+    await queue_db["submissions"].insert_many([
+        {"user_id": "u1", "task_id": "t1", "status": "passed", "xp_awarded": 50},
+        {"user_id": "u2", "task_id": "t1", "status": "failed", "xp_awarded": 0},
+        {"user_id": "u3", "task_id": "t2", "status": "passed", "xp_awarded": 50},
+    ])
+    queue = JudgeQueue(queue_db)
+    await queue.enqueue("fresh", "u4")
+
+    progress = await RejudgeService(queue_db).start("t1", dry_run=True)
+    assert progress["status"] == "judging"
+    assert progress["total"] == 2
+
+    claimed = [await queue.claim("w") for _ in range(3)]
+    assert claimed[0]["submission_id"] == "fresh"
+    assert {job["lane"] for job in claimed[1:]} == {"bulk"}
+    assert {job["run_id"] for job in claimed[1:]} == {progress["id"]}
+
+    empty = await RejudgeService(queue_db).start("no-such-task")
+    assert empty["status"] == "done"
+    assert empty["summary"]["judged"] == 0
+
+
+@pytest.mark.asyncio
+async def test_overlapping_evaluations_grant_xp_once(queue_db, monkeypatch):
+    """Only the evaluation that writes over the state it judged grants XP"""
+    from bson import ObjectId
+    from app.services import submission_service
+    from app.services.judge_queue import LeaseLost
+    from app.services.submission_service import SubmissionService
+
+    async def judge(self, submission):
+        await asyncio.sleep(0.05)
+        return {"status": "passed", "test_results": {}, "xp_awarded": 50}
+
+    grants = []
+
+    async def grant(db, user_id, amount, source, ref=None):
+        grants.append(amount)
+
+    monkeypatch.setattr(SubmissionService, "judge", judge)
+    monkeypatch.setattr(submission_service.xp_ledger, "grant", grant)
+
+    user_id = ObjectId()
+    inserted = await queue_db["submissions"].insert_one({"user_id": str(user_id), "status": "pending", "xp_awarded": 0})
+    submission_id = str(inserted.inserted_id)
+    service = SubmissionService(queue_db)
+    await asyncio.gather(service.evaluate_submission(submission_id), service.evaluate_submission(submission_id))
+    assert grants == [50]
+
+    # A worker whose lease was taken over does not write at all
+    queue = JudgeQueue(queue_db)
+    await queue.enqueue(submission_id, str(user_id), lane="rerun")
+    job = await queue.claim("slow-worker")
+    await queue_db["judge_jobs"].update_one({"_id": job["_id"]}, {"$set": {"worker_id": "other-worker"}})
+    with pytest.raises(LeaseLost):
+        await service.evaluate_submission(submission_id, job=job)
+    assert grants == [50]
+
+
+@pytest.mark.asyncio
+async def test_settle_errors_do_not_stop_the_worker(queue_db, monkeypatch):
+    """A failing settle step is logged; the slot keeps processing jobs"""
+    from app.services.judge_queue import JudgeWorker
+    from app.services.submission_service import SubmissionService
+
+    async def evaluate(self, submission_id, job=None):
+        return {"status": "passed", "test_results": {}, "xp_awarded": 0}
+
+    async def broken(*args, **kwargs):
+        raise RuntimeError("database went away")
+
+    worker = JudgeWorker(queue_db, worker_id="w")
+    monkeypatch.setattr(SubmissionService, "evaluate_submission", evaluate)
+    monkeypatch.setattr(worker.queue, "complete", broken)
+    monkeypatch.setattr(worker.queue, "fail", broken)
+
+    await worker.queue.enqueue("s1", "u1")
+    await worker.process(await worker.queue.claim("w"))
+
+    monkeypatch.setattr(SubmissionService, "evaluate_submission", broken)
+    await worker.queue.enqueue("s2", "u1")
+    await worker.process(await worker.queue.claim("w"))
+    assert worker.stats["failed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_rejudge_apply_skips_submissions_rerun_meanwhile(queue_db, monkeypatch):
+    """Results and XP corrections only land on submissions still as judged; a failed apply resumes"""
+    from bson import ObjectId
+    from app.services import rejudge_service
+    from app.services.rejudge_service import RejudgeService
+
+    granted = []
+
+    async def grant_many(db, grants):
+        granted.extend((str(g["user_id"]), g["amount"]) for g in grants)
+        return len(grants)
+
+    monkeypatch.setattr(rejudge_service.xp_ledger, "grant_many", grant_many)
+
+    users = [str(ObjectId()) for _ in range(2)]
+    inserted = await queue_db["submissions"].insert_many([
+        {"user_id": users[0], "task_id": "t1", "status": "passed", "xp_awarded": 50},
+        {"user_id": users[1], "task_id": "t1", "status": "passed", "xp_awarded": 50},
+    ])
+    run_id = str((await queue_db["rejudge_runs"].insert_one({
+        "task_id": "t1", "dry_run": False, "status": "applying", "total": 2, "judged": 2,
+        "changed": 2, "failed": 0, "summary": None, "created_at": datetime.utcnow(), "finished_at": None,
+    })).inserted_id)
+    for user_id, submission_id in zip(users, inserted.inserted_ids):
+        await queue_db["rejudge_items"].insert_one({
+            "run_id": run_id, "submission_id": str(submission_id), "user_id": user_id,
+            "old_status": "passed", "new_status": "failed", "old_xp": 50, "new_xp": 0,
+            "xp_delta": -50, "changed": True, "test_results": {},
+        })
+    # The second user re-ran (and lost the XP) after the run judged it
+    await queue_db["submissions"].update_one({"_id": inserted.inserted_ids[1]}, {"$set": {"xp_awarded": 0}})
+
+    service = RejudgeService(queue_db)
+    run = await queue_db["rejudge_runs"].find_one({"_id": ObjectId(run_id)})
+    summary = await service.apply(run)
+    assert granted == [(users[0], -50)]
+    assert summary["changed"] == 1 and summary["skipped"] == 1
+
+    # Applying again (e.g. through resume) neither rewrites nor re-grants
+    await queue_db["rejudge_runs"].update_one({"_id": ObjectId(run_id)}, {"$set": {"status": "apply_failed"}})
+    progress = await service.resume(run_id)
+    assert progress["status"] == "done"
+    assert granted == [(users[0], -50)]
@@ -0,0 +1,62 @@
+import pytest
+import random
+from app.utils.ranking import RankedSkipList
+from app.services.leaderboard_service import LeaderboardIndex
+
+
+def _user(user_id, xp, active=True):
+    return {"_id": user_id, "username": user_id, "total_xp": xp, "is_active": active}
+
+
+@pytest.mark.asyncio
+async def test_skip_list_rank_and_index():
+    """Test skip list stays ordered under inserts and removals"""
+    ranks = RankedSkipList()
+    values = random.sample(range(10000), 500)
+    for v in values:
+        ranks.insert(v)
+    for v in values[:200]:
+        ranks.remove(v)
+
+    expected = sorted(values[200:])
+    assert len(ranks) == len(expected)
+    assert list(ranks) == expected
+    assert ranks[0] == expected[0]
+    assert ranks[-1] == expected[-1]
+    assert list(ranks.slice(10, 5)) == expected[10:15]
+    assert ranks.rank(expected[42]) == 42
+
+    with pytest.raises(KeyError):
+        ranks.remove(values[0])
+
+
+@pytest.mark.asyncio
+async def test_leaderboard_index_top_and_rank():
+    """Test leaderboard index ordering, ties and updates"""
+    index = LeaderboardIndex()
+    index.upsert(_user("alice", 300))
+    index.upsert(_user("bob", 500))
+    index.upsert(_user("carol", 300))
+    index.upsert(_user("dave", 900, active=False))
+
+    top = index.top(10)
+    assert [row["username"] for row in top] == ["bob", "alice", "carol"]
+    assert [row["rank"] for row in top] == [1, 2, 3]
+    assert index.rank_of("carol") == 2
+    assert index.rank_of("dave") is None
+
+    index.upsert(_user("carol", 800))
+    assert index.rank_of("carol") == 1
+    assert index.top(1)[0]["username"] == "carol"
+    assert len(index) == 3
+
+
+@pytest.mark.asyncio
+async def test_window_periods():
+    """Test ISO week and calendar month bucket keys"""
+    from datetime import datetime
+    from app.services.xp_event_service import window_periods
+
+    # 2027-01-01 falls in ISO week 53 of 2026
+    periods = window_periods(datetime(2027, 1, 1, 12, 0))
+    assert periods == {"weekly": "2026-W53", "monthly": "2027-01"}
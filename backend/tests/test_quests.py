@@ -20,3 +20,150 @@ async def test_create_quest(client):
     }
     response = await client.post("/api/v1/quests", json=quest_data)
     assert response.status_code in [200, 201]
+
+@pytest.mark.asyncio
+async def test_quest_catalog_hot_reload(tmp_path):
+    """Catalog lookups, version hash and reload from its data file"""
+    import json
+    from app.services.quest_catalog import QuestCatalog, quest_catalog
+
+    path = tmp_path / "quests.json"
+    quests = [dict(quest) for quest in quest_catalog.quests]
+    path.write_text(json.dumps(quests))
+    catalog = QuestCatalog(source="file", path=str(path), reload_seconds=0)
+    catalog.load_file()
+
+    quest = quests[0]
+    task = quest["tasks"][0]
+    assert catalog.version == quest_catalog.version
+    assert catalog.get_quest(quest["id"])["title"] == quest["title"]
+    assert catalog.get_task(quest["id"], task["id"]) == task
+    assert catalog.find_task(task["id"]) == (catalog.get_quest(quest["id"]), task)
+    assert catalog.get_task(quest["id"], "missing") is None
+    assert quest in catalog.by_category(quest["category"])
+    assert [q["order"] for q in catalog.quests] == sorted(q["order"] for q in quests)
+
+    assert await catalog.reload() is False
+    quest["title"] = "Renamed"
+    path.write_text(json.dumps(quests))
+    old_version = catalog.version
+    assert await catalog.reload() is True
+    assert catalog.version != old_version
+    assert catalog.get_quest(quest["id"])["title"] == "Renamed"
+
+@pytest.mark.asyncio
+async def test_quest_catalog_etag_and_compression():
+    """Catalog responses carry a strong per-encoding ETag, are gzipped and answer 304"""
+    from httpx import AsyncClient, ASGITransport
+    from app.main import app
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        first = await client.get("/quests-system/all", headers={"Accept-Encoding": "gzip"})
+        assert first.status_code == 200
+        assert first.headers["content-encoding"] == "gzip"
+        assert first.headers["vary"] == "Accept-Encoding"
+        etag = first.headers["etag"]
+        assert etag.startswith('"') and not etag.startswith("W/")
+        assert first.json()["catalog_version"] in etag
+
+        plain = await client.get("/quests-system/all", headers={"Accept-Encoding": "identity"})
+        assert "content-encoding" not in plain.headers
+        # Each content-coding has its own strong validator
+        assert plain.headers["etag"] != etag
+        assert plain.headers["etag"].strip('"') in etag
+        # httpx has already decoded the gzip body
+        assert plain.content == first.content
+
+        cached = await client.get("/quests-system/all", headers={"If-None-Match": etag, "Accept-Encoding": "gzip"})
+        assert cached.status_code == 304
+        assert cached.headers["etag"] == etag
+        assert cached.content == b""
+
+        # The gzip validator does not validate the identity body
+        other = await client.get("/quests-system/all", headers={"If-None-Match": etag, "Accept-Encoding": "identity"})
+        assert other.status_code == 200
+
+        stale = await client.get("/quests-system/all", headers={"If-None-Match": '"stale"'})
+        assert stale.status_code == 200
+
+        missing = await client.get("/quests-system/no_such_quest")
+        assert missing.status_code == 404
+
+@pytest.mark.asyncio
+async def test_summary_listings_leave_out_bodies():
+    """fields=summary drops task and lesson bodies from the listings"""
+    from httpx import AsyncClient, ASGITransport
+    from app.main import app
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        for path, key, ratio in (("/quests-system/all", "quests", 10), ("/tutorials/list", "tutorials", 5)):
+            full = await client.get(path, headers={"Accept-Encoding": "identity"})
+            summary = await client.get(path, params={"fields": "summary"}, headers={"Accept-Encoding": "identity"})
+            assert summary.status_code == 200
+            assert summary.headers["etag"] != full.headers["etag"]
+            assert [item["id"] for item in summary.json()[key]] == [item["id"] for item in full.json()[key]]
+            assert len(summary.content) < len(full.content) / ratio
+
+        quests = (await client.get("/quests-system/all", params={"fields": "summary"})).json()["quests"]
+        assert "tasks" not in quests[0] and quests[0]["task_count"] > 0
+
+        invalid = await client.get("/quests-system/all", params={"fields": "everything"})
+        assert invalid.status_code == 422
+
+@pytest.fixture
+async def quest_db():
+    """Scratch database on the local mongod; skipped when none is running"""
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from app.core.config import settings
+
+    client = AsyncIOMotorClient(settings.MONGODB_URL, serverSelectionTimeoutMS=1000)
+    try:
+        await client.admin.command("ping")
+    except Exception:
+        client.close()
+        pytest.skip("local mongod not available")
+
+    db = client[f"{settings.DATABASE_NAME}_quests"]
+    yield db
+    await client.drop_database(db.name)
+    client.close()
+
+@pytest.mark.asyncio
+async def test_complete_task_is_atomic_and_idempotent(quest_db):
+    """Concurrent completions of one task award its XP exactly once"""
+    import asyncio
+    from app.services.quest_catalog import QuestCatalog
+    from app.services.quest_system_service import QuestSystemService
+
+    catalog = QuestCatalog(reload_seconds=0)
+    catalog.load([{
+        "id": "q1", "title": "Quest", "category": "basics", "order": 1,
+        "tasks": [{"id": "t1", "xp_reward": 10}, {"id": "t2", "xp_reward": 20}]
+    }])
+    service = QuestSystemService(catalog)
+    await quest_db["users"].insert_one({"_id": "u1", "username": "u1", "total_xp": 0, "is_active": True})
+    await service.start_quest(quest_db, "u1", "q1")
+
+    results = await asyncio.gather(*(service.complete_task(quest_db, "u1", "q1", "t1") for _ in range(5)))
+    assert all(r["success"] for r in results)
+    assert sum(not r["already_completed"] for r in results) == 1
+
+    last = await service.complete_task(quest_db, "u1", "q1", "t2")
+    assert last["tasks_completed"] == 2
+    assert last["total_quest_xp"] == 30
+    assert last["quest_completed"] is True
+
+    user = await quest_db["users"].find_one({"_id": "u1"})
+    assert user["total_xp"] == 30
+    progress = await quest_db["user_quest_progress"].find_one({"user_id": "u1"})
+    assert progress["status"] == "completed" and progress["completed_at"] is not None
+
+    missing = await service.complete_task(quest_db, "u2", "q1", "t1")
+    assert missing == {"success": False, "error": "Quest not started"}
+
+    # A repeat after everything was flushed still reports the user's total
+    repeat = await service.complete_task(quest_db, "u1", "q1", "t2")
+    assert repeat["already_completed"] is True
+    assert repeat["user_total_xp"] == 30